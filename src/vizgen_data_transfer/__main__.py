@@ -15,8 +15,11 @@ import argparse
 import os
 import sys
 import logging
+import shutil
+import hashlib
 import subprocess
 import platform
+import sqlite3
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -24,6 +27,45 @@ import importlib.resources
 from collections import defaultdict
 import time
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from vizgen_data_transfer.scanner import scan_tree, scanners
+from vizgen_data_transfer.manifest import (
+    ManifestWriter,
+    diff_manifests,
+    merge_manifests,
+    read_manifest,
+    summarise_diff,
+    write_manifest,
+)
+from vizgen_data_transfer.rsync_log import parse_rsync_log, rsync_log_format
+from vizgen_data_transfer.robocopy_log import parse_robocopy_list_log
+from vizgen_data_transfer.checksum import (
+    checksum_algorithms,
+    default_algorithm,
+    executors,
+    format_checksum_line,
+    parse_checksum_line,
+    verify_tree,
+)
+from vizgen_data_transfer.hash_cache import HashCache
+from vizgen_data_transfer.merkle import (
+    compare_tree_digests,
+    tree_digests,
+    write_tree_digests,
+)
+from vizgen_data_transfer.state import RunState, source_fingerprint
+from vizgen_data_transfer.incremental import stable_files
+from vizgen_data_transfer.metrics import StageTimer, write_metrics
+from vizgen_data_transfer.profiling import StageProfiler
+from vizgen_data_transfer.adaptive import AdaptiveConcurrency
+from vizgen_data_transfer.policy import order_entries, resolve_copy_policies
+from vizgen_data_transfer.history import TransferHistory, history_file_name
+from vizgen_data_transfer.sharding import write_shards, merge_shard_logs
+from vizgen_data_transfer import native_copy
+from vizgen_data_transfer.process import run_command
+from vizgen_data_transfer.progress import ProgressReporter
+from vizgen_data_transfer.logtail import read_head_lines, read_tail_lines
 
 if sys.version_info >= (3, 11):
     import tomllib
@@ -75,6 +117,48 @@ def format_logger(log_file):
     logging.getLogger().addHandler(file_handler)
 
 
+def get_analysis_drive(config, os_name, disk=False, debug=False):
+    # analysis Z: drive or external disk G: drive on Windows
+    if "windows" in os_name:
+        if debug:
+            return config["analysis_drive_pc_debug"]
+        return config["analysis_drive_pc_disk"] if disk else config["analysis_drive_pc"]
+    if "linux" in os_name:
+        return config["analysis_drive_nix"]
+    return None
+
+
+def send_email(config, email_subject, email_content, development=False):
+    """
+    Send an email to the development or production addressees of the config file.
+    """
+    smtp_server = config["smtp_server"]
+    sender_email = config["sender_email"]
+    addressees = (
+        config["development"]["addressees"]
+        if development
+        else config["production"]["addressees"]
+    )
+
+    # Create message container - the correct MIME type is multipart/alternative.
+    msg = MIMEMultipart("alternative")
+    part1 = MIMEText(email_content, "plain")
+    msg["Subject"] = email_subject
+    msg["From"] = sender_email
+    msg["To"] = "To: " + "; ".join(str(x) for x in addressees)
+    msg.attach(part1)
+
+    logging.info(f"Sending email to: {str(addressees)}")
+
+    s = smtplib.SMTP(smtp_server)
+    maildelivery = s.sendmail(msg["From"], addressees, msg.as_string())
+
+    if not bool(maildelivery):
+        logging.info("Email sent successfully")
+    else:
+        logging.error("Email delivery failed")
+
+
 # robocopy exit codes
 # ::: https://learn.microsoft.com/en-us/windows-server/administration/windows-commands/robocopy#exit-return-codes
 robocopy_exit_codes = {
@@ -87,6 +171,17 @@ robocopy_exit_codes = {
     7: "Files were copied, a file mismatch was present, and additional files were present.",
 }
 
+# count check metric (of --ignore_python_counts) covering each kind of manifest
+# difference that fails the transfer
+manifest_diff_metrics = {"missing": "files", "size_mismatch": "bytes"}
+
+# robocopy /MT:n takes n between 1 and 128
+robocopy_max_threads = 128
+
+# defaults of the copy options that the policy of a copy type can replace. The
+# command line options default to None, to know whether they were given
+copy_option_defaults = {"backend": "auto", "threads": 1, "rsync_shards": 1}
+
 
 def validate_ignore_format(value):
     allowed_types = {"raw_data", "analysis", "output", "all"}
@@ -112,6 +207,37 @@ def validate_ignore_format(value):
     return value
 
 
+# results stored by each checkpointed stage, as (attribute, state) pairs. The
+# results of a copy type are self.<attribute>[state][copy_type], or
+# self.<attribute>[copy_type] when state is None
+checkpoint_fields = {
+    "before_counts": [
+        ("store_python_count_info", "before"),
+        ("store_manifest_files", "before"),
+        ("store_robocopy_count_info", "before"),
+        ("store_robocopy_list_returns", "before"),
+        ("store_robocopy_list_offsets", "before"),
+    ],
+    "copy": [
+        ("store_copy_returns", None),
+        ("store_manifest_files", "existing"),
+        ("store_manifest_files", "resume"),
+        ("store_log_offsets", None),
+    ],
+    "transfer": [
+        ("store_python_count_info", "after"),
+        ("store_manifest_files", "after"),
+        ("store_robocopy_count_info", "after"),
+        ("store_robocopy_list_returns", "after"),
+        ("store_robocopy_list_offsets", "after"),
+        ("store_manifest_diff", None),
+        ("store_checksum_info", None),
+        ("store_tree_digest_diff", None),
+        ("store_log_file_status", None),
+    ],
+}
+
+
 class VizgenDataTransfer:
     @staticmethod
     def win_long_path(path):
@@ -121,16 +247,56 @@ class VizgenDataTransfer:
 
     def __init__(self, args):
         self.args = args
+        self.metrics = StageTimer()
         self.run_id = args.run_id
         self.copy_type = [x.strip().lower() for x in args.copy_type]
-        self.threads = args.threads
+        # copy options given on the command line apply to every copy type
+        self.explicit_copy_options = [
+            key for key in copy_option_defaults if getattr(args, key) is not None
+        ]
+        self.threads = self.get_copy_option("threads")
+        self.max_threads = int(args.max_threads)
+        self.adaptive_interval = float(args.adaptive_interval)
         self.disk = args.disk
         self.debug = args.debug
+        self.scanner = args.scanner
+        self.scan_threads = int(args.scan_threads)
+        self.resume = args.resume
+        self.parallel_copy_types = int(args.parallel_copy_types)
+        self.rsync_shards = int(self.get_copy_option("rsync_shards"))
+        self.backend = self.get_copy_option("backend")
+        self.progress_interval = float(args.progress_interval)
+        self.after_counts = args.after_counts
+        self.single_scan = args.single_scan
+        self.checksum = args.checksum
+        self.checksum_workers = int(args.checksum_workers)
+        self.checksum_algorithm = args.checksum_algorithm
+        self.checksum_executor = args.checksum_executor
+        self.hash_cache = args.hash_cache
+        self.tree_digest = args.tree_digest
+        self.fresh = args.fresh
+        self.incremental = args.incremental
+        self.incremental_interval = float(args.incremental_interval)
+        self.profile = args.profile
+        self.run_state = None
+        self.defer_emails = False
+        self.transfer_status = None
+        self.deferred_emails = list()
 
         self.store_copy_returns = dict()
         self.store_robocopy_list_returns = defaultdict(dict)
         self.store_python_count_info = defaultdict(dict)
         self.store_robocopy_count_info = defaultdict(dict)
+        self.store_manifest_files = defaultdict(dict)
+        self.store_manifest_diff = dict()
+        self.store_log_file_status = dict()
+        self.store_log_offsets = dict()
+        self.store_rsync_sessions = dict()
+        self.store_robocopy_list_offsets = defaultdict(dict)
+        self.store_checksum_info = dict()
+        self.store_tree_digest_diff = dict()
+        self.store_adaptive_threads = dict()
+        self.store_resume_totals = dict()
 
         self.analysis_drive = None
         self.isilon_drive = None
@@ -152,8 +318,9 @@ class VizgenDataTransfer:
 
         logging.info(f"Config file: {vizgen_config}")
 
-        with open(str(vizgen_config), "rb") as f:
-            self.config = tomllib.load(f)
+        with self.metrics.stage("config_load"):
+            with open(str(vizgen_config), "rb") as f:
+                self.config = tomllib.load(f)
 
         self.robocopy_header = self.config["tool"]["options"]["robocopy_header"]
         self.robocopy_footer = self.config["tool"]["options"]["robocopy_footer"]
@@ -169,26 +336,47 @@ class VizgenDataTransfer:
         # detect operating system
         self.os_name = get_operating_system()
         # set analysis drive and isilon drive
+        self.analysis_drive = get_analysis_drive(
+            self.config, self.os_name, disk=self.disk, debug=self.debug
+        )
         if "windows" in self.os_name:
-            # set analysis Z: drive or external disk G: drive
-            self.analysis_drive = (
-                self.config["analysis_drive_pc_disk"]
-                if self.disk
-                else self.config["analysis_drive_pc"]
-            )
             self.isilon_drive = self.config["isilon_drive_pc"]
             self.log_dir = self.config["isilon_drive_logs_pc"]
-            if self.debug:
-                self.analysis_drive = self.config["analysis_drive_pc_debug"]
             self.tool_options = self.config["tool"]["options"]["robocopy"]
         elif "linux" in self.os_name:
-            self.analysis_drive = self.config["analysis_drive_nix"]
             self.isilon_drive = self.config["isilon_drive_nix"]
             self.log_dir = self.config["isilon_drive_logs_nix"]
             self.tool_options = self.config["tool"]["options"]["rsync"]
         else:
             raise ValueError("Operating System: Unknown or not currenly supported")
 
+        # copy backend, by default rsync on Linux and robocopy on Windows
+        self.backend, self.threads = self.check_copy_settings(
+            self.backend, self.threads, "--threads"
+        )
+        logging.info(f"Copy backend: {self.backend}")
+
+        # copy settings of each copy type from the config
+        self.store_copy_policies = self.get_copy_policies()
+
+        # only the checksums are cached
+        if self.hash_cache and not any(
+            policy["checksum"]
+            for copy_type, policy in self.store_copy_policies.items()
+            if copy_type in self.copy_type
+        ):
+            logging.warning(
+                "The hash cache only keeps the checksums computed by --checksum, and no checksums are verified. Ignoring --hash_cache"
+            )
+            self.hash_cache = False
+
+        # the robocopy list logs only exist on Windows
+        if self.single_scan and self.os_name != "windows":
+            logging.warning(
+                "Single scan mode uses the robocopy list logs and is only available on Windows. Using the python based scan instead"
+            )
+            self.single_scan = False
+
         self.analysis_drive_raw_data = os.path.join(
             self.analysis_drive, "merfish_raw_data", self.run_id
         )
@@ -209,6 +397,10 @@ class VizgenDataTransfer:
             self.isilon_drive, self.run_id, "output"
         )
 
+        # checksum manifest written next to the transferred data
+        self.isilon_drive_checksums = os.path.join(
+            self.isilon_drive, self.run_id, "CHECKSUMS"
+        )
         self.isilon_drive_raw_data_log = os.path.join(
             self.isilon_drive, self.run_id, "raw_data.log"
         )
@@ -242,6 +434,106 @@ class VizgenDataTransfer:
             self.log_dir, f"{self.run_id}.output.robocopy.list_after_transfer.log"
         )
 
+    def check_copy_settings(self, backend, threads, name):
+        """
+        Resolve the 'auto' backend for the operating system and check the backend and the number of copy threads given by 'name', the command line option or the policy of a copy type. Returns the backend and the threads.
+        """
+        if backend == "auto":
+            backend = "robocopy" if "windows" in self.os_name else "rsync"
+        if backend == "rsync" and "windows" in self.os_name:
+            raise ValueError("Copy backend 'rsync' is not supported on Windows")
+        if backend == "robocopy" and "linux" in self.os_name:
+            raise ValueError("Copy backend 'robocopy' is not supported on Linux")
+
+        # the number of copy threads can only change during the copy with the
+        # native copy engine, robocopy /MT is fixed when it starts
+        if str(threads).lower() == "auto":
+            threads = "auto"
+            if backend != "native":
+                logging.warning(
+                    f"Adaptive copy threads ({name} set to 'auto') are only available with the native copy engine (backend 'native'). Using 1 thread with the '{backend}' backend"
+                )
+                threads = 1
+        elif not str(threads).isdigit() or int(threads) < 1:
+            raise ValueError(
+                f"Error: {name} must be a positive number or 'auto', got: '{threads}'"
+            )
+        else:
+            threads = int(threads)
+        return backend, threads
+
+    def get_copy_option(self, key):
+        """
+        Value of a copy option of the command line, or its default when it was not given.
+        """
+        value = getattr(self.args, key)
+        return copy_option_defaults[key] if value is None else value
+
+    def get_robocopy_list_threads(self):
+        """
+        Number of robocopy /MT threads of the robocopy list step. With --threads auto the number of threads only changes during the native copy, the list uses --max_threads.
+        """
+        threads = self.max_threads if self.threads == "auto" else int(self.threads)
+        return min(max(1, threads), robocopy_max_threads)
+
+    def get_copy_policies(self):
+        """
+        Copy settings of each copy type: the command line options, replaced by the [tool.options.policy.<copy_type>] table of the copy type in the config (see policy.py).
+        """
+        tables = self.config["tool"]["options"].get("policy", dict())
+        defaults = {
+            "backend": self.get_copy_option("backend"),
+            "threads": self.get_copy_option("threads"),
+            "rsync_shards": self.rsync_shards,
+            "buffer_size": native_copy.default_buffer_size,
+            "order": "path",
+            "checksum": self.checksum,
+            "tree_digest": self.tree_digest,
+            "tool_options": self.tool_options,
+        }
+        policies = resolve_copy_policies(
+            tables,
+            defaults,
+            explicit=self.explicit_copy_options,
+            tool="robocopy" if "windows" in self.os_name else "rsync",
+        )
+
+        rsync_log_scan = list()
+        for copy_type, policy in policies.items():
+            # backend and threads of the command line, already checked
+            replaced = [
+                key
+                for key in ("backend", "threads")
+                if key in tables.get(copy_type, dict())
+                and key not in self.explicit_copy_options
+            ]
+            if not replaced:
+                policy["backend"], policy["threads"] = self.backend, self.threads
+            else:
+                policy["backend"], policy["threads"] = self.check_copy_settings(
+                    policy["backend"],
+                    policy["threads"],
+                    f"'threads' of the {copy_type} policy",
+                )
+            # after transfer counts from the rsync log need the rsync backend
+            policy["after_counts"] = self.after_counts
+            if self.after_counts == "rsync_log" and policy["backend"] != "rsync":
+                policy["after_counts"] = "scan"
+                if copy_type in self.copy_type:
+                    rsync_log_scan.append(f"{copy_type} ({policy['backend']})")
+            if copy_type in self.copy_type:
+                logging.info(
+                    f"Policy of {copy_type}{'' if copy_type in tables else ' (command line)'} - Backend: {policy['backend']}, Threads: {policy['threads']}, Rsync shards: {policy['rsync_shards']}, Buffer size (bytes): {policy['buffer_size']}, Verify: {policy['verify']}, Order: {policy['order']}, Tool options: {policy['tool_options']}"
+                )
+        if rsync_log_scan:
+            logging.warning(
+                f"After transfer counts from the rsync log are only available with the rsync backend, not for: {', '.join(rsync_log_scan)}. Scanning the destination after transfer instead"
+            )
+        return policies
+
+    def get_copy_policy(self, copy_type):
+        return self.store_copy_policies[copy_type]
+
     def check_run_folders(self):
         # input folder - Z:
         # raw_data
@@ -272,11 +564,401 @@ class VizgenDataTransfer:
 
         logging.info(f"All run folders exists for run: {self.run_id}")
 
-    def get_counts_python(self, state="before"):
+    def load_run_state(self):
+        """
+        Load the state file of the run from the logs folder. Stages finished by a previous invocation are skipped, unless --fresh is used, the source folders have changed or the previous transfer completed.
+        """
+        state_file = os.path.join(self.log_dir, f"{self.run_id}.state.json")
+        locations = [
+            locations[0]
+            for locations in map(self.get_copy_locations, self.copy_type)
+            if locations
+        ]
+        self.run_state = RunState(
+            state_file, self.run_id, source_fingerprint(locations)
+        )
+        if self.fresh:
+            logging.info(f"Option --fresh used, not resuming from state file: {state_file}")
+            return
+        reason = self.run_state.resume()
+        if reason:
+            logging.info(f"Starting the transfer from the beginning, {reason}: {state_file}")
+        else:
+            logging.info(f"Resuming from the stages completed in state file: {state_file}")
+
+    def save_checkpoint(self, stage, copy_type):
+        if self.run_state is None:
+            return
+        results = list()
+        for attribute, state in checkpoint_fields[stage]:
+            store = getattr(self, attribute)
+            store = store[state] if state else store
+            if copy_type in store:
+                results.append([attribute, state, store[copy_type]])
+        self.run_state.mark(stage, copy_type, {"results": results})
+
+    def restore_checkpoint(self, stage, copy_type):
+        """
+        Restore the results of a stage finished by a previous invocation for a copy type. Returns False when the stage has to be run, including when a manifest it produced no longer exists.
+        """
+        if self.run_state is None or not self.run_state.is_done(stage, copy_type):
+            return False
+        results = self.run_state.get(stage, copy_type)["results"]
+        for attribute, state, value in results:
+            if attribute == "store_manifest_files" and not os.path.exists(value):
+                logging.warning(
+                    f"Manifest from the state file not found, running stage '{stage}' for {copy_type} again: {value}"
+                )
+                return False
+        for attribute, state, value in results:
+            store = getattr(self, attribute)
+            store = store[state] if state else store
+            store[copy_type] = value
+        logging.info(f"Stage '{stage}' already completed for {copy_type}, skipping")
+        return True
+
+    def get_manifest_file(self, copy_type, state):
+        """
+        Location of the per-file manifest of a copy type for a given state in the central logs folder.
+        """
+        return os.path.join(
+            self.log_dir,
+            f"{self.run_id}.{copy_type}.python.manifest_{state}_transfer.tsv.gz",
+        )
+
+    def get_manifest_diff(self, copy_types=None):
+        """
+        Compare the before and after transfer manifests for each copy type and store the missing, extra and size mismatched files in self.store_manifest_diff dictionary.
+        """
+        for copy_type in copy_types or self.copy_type:
+            before = self.store_manifest_files["before"].get(copy_type)
+            after = self.store_manifest_files["after"].get(copy_type)
+            if not before or not after:
+                continue
+            summary = summarise_diff(before, after)
+            logging.info(
+                f"Manifest diff for {copy_type} - Missing files: {summary['missing']['count']}, Extra files: {summary['extra']['count']}, Size mismatched files: {summary['size_mismatch']['count']}"
+            )
+            for kind, info in summary.items():
+                for example in info["examples"]:
+                    logging.warning(f"Manifest diff for {copy_type} - {kind}: {example}")
+            self.store_manifest_diff[copy_type] = summary
+
+    def get_manifest_diff_summary(self, copy_type):
+        """
+        Manifest diff of a copy type for the transfer summary. Returns the email content and whether any file is missing or size mismatched in the destination, unless the 'files' or 'bytes' python count check of the copy type is ignored with --ignore_python_counts. Extra files in the destination are listed but are not an error.
+        """
+        email_content = str()
+        error = False
+        summary = self.store_manifest_diff.get(copy_type)
+        if not summary or not any(info["count"] for info in summary.values()):
+            return email_content, error
+        email_content += f"\n\nFile level differences for '{copy_type}' (before vs after transfer manifests):\n"
+        for kind, info in summary.items():
+            if not info["count"]:
+                continue
+            prefix = str()
+            cli_metric = manifest_diff_metrics.get(kind)
+            if cli_metric and self.is_count_check_ignored(
+                copy_type, cli_metric, self.args.ignore_python_counts
+            ):
+                msg = f"User has chosen to ignore python based count mismatch check for '{cli_metric}' metric for '{copy_type}' copy type using the option --ignore_python_counts. Hence not failing the transfer for {kind.replace('_', ' ')} files in '{copy_type}'."
+                logging.info(msg)
+                email_content += f"\nWARNING: {msg}"
+            elif cli_metric:
+                logging.error(
+                    f"Manifest diff for {copy_type} - {kind.replace('_', ' ').title()} files: {info['count']}"
+                )
+                prefix = "ERROR: "
+                error = True
+            email_content += f"\n{prefix}{kind.replace('_', ' ').title()} files: {info['count']}\n"
+            for example in info["examples"]:
+                email_content += f" - {example}\n"
+            if info["count"] > len(info["examples"]):
+                email_content += f" - ... and {info['count'] - len(info['examples'])} more\n"
+        email_content += f"Manifests: {self.store_manifest_files['before'][copy_type]}, {self.store_manifest_files['after'][copy_type]}\n"
+        return email_content, error
+
+    def get_checksum_file(self, copy_type):
+        """
+        Location of the source checksums of a copy type in the central logs folder, combined into the CHECKSUMS file of the run once all copy types are verified.
+        """
+        return os.path.join(
+            self.log_dir,
+            f"{self.run_id}.{copy_type}.{self.checksum_algorithm}.checksums.txt",
+        )
+
+    def get_hash_cache_file(self):
+        return os.path.join(self.log_dir, f"{self.run_id}.hash_cache.sqlite")
+
+    def verify_checksums(self, copy_type, max_examples=20):
+        """
+        Hash every file of the before transfer manifest in the source and the destination of a copy type, compare the digests and store the mismatched and failed files in self.store_checksum_info dictionary. The source digests are written to the checksum file of the copy type.
+        """
+        source, destination, _ = self.get_copy_locations(copy_type)
+        source_manifest = self.store_manifest_files["before"].get(copy_type)
+        if not source_manifest:
+            logging.warning(
+                f"Source manifest not found for {copy_type}, skipping checksum verification"
+            )
+            return
+
+        checksum_file = self.get_checksum_file(copy_type)
+        info = {
+            "checksum_file": checksum_file,
+            "mismatch_examples": list(),
+            "failed_examples": list(),
+        }
+        logging.info(
+            f"Verifying {self.checksum_algorithm} checksums for {copy_type} using {self.checksum_workers} {self.checksum_executor} worker(s)"
+        )
+        # digests of unchanged files are reused from previous runs of the
+        # same run_id with --hash_cache
+        cache = None
+        source_root = f"{copy_type}:source"
+        destination_root = f"{copy_type}:destination"
+        if self.hash_cache:
+            cache = HashCache(self.get_hash_cache_file())
+            logging.info(f"Using hash cache: {cache.cache_file}")
+
+        def cached_lookup(path):
+            return (
+                cache.get(source_root, path, self.checksum_algorithm),
+                cache.get(destination_root, path, self.checksum_algorithm),
+            )
+
+        lookup = cached_lookup if cache is not None else None
+
+        start = time.perf_counter()
+        with open(checksum_file, "w", encoding="utf-8", newline="\n") as f:
+
+            def on_record(record):
+                if cache is not None:
+                    cache.record(
+                        source_root,
+                        record["path"],
+                        self.checksum_algorithm,
+                        record["source_key"],
+                        record["source_digest"],
+                        record["source_cached"],
+                    )
+                    cache.record(
+                        destination_root,
+                        record["path"],
+                        self.checksum_algorithm,
+                        record["destination_key"],
+                        record["destination_digest"],
+                        record["destination_cached"],
+                    )
+                if record["source_digest"]:
+                    f.write(
+                        format_checksum_line(
+                            record["source_digest"], f"{copy_type}/{record['path']}"
+                        )
+                    )
+                if record["status"] == "mismatch":
+                    logging.warning(
+                        f"Checksum mismatch for {copy_type}: {record['path']} (source: {record['source_digest']}, destination: {record['destination_digest']})"
+                    )
+                    if len(info["mismatch_examples"]) < max_examples:
+                        info["mismatch_examples"].append(record["path"])
+                elif record["status"] == "failed":
+                    logging.warning(
+                        f"Checksum failed for {copy_type}: {record['path']} ({record['error']})"
+                    )
+                    if len(info["failed_examples"]) < max_examples:
+                        info["failed_examples"].append(
+                            f"{record['path']} ({record['error']})"
+                        )
+
+            try:
+                totals = verify_tree(
+                    source,
+                    destination,
+                    (
+                        entry.path
+                        for entry in read_manifest(source_manifest)
+                        if entry.type == "f"
+                    ),
+                    workers=self.checksum_workers,
+                    algorithm=self.checksum_algorithm,
+                    executor=self.checksum_executor,
+                    on_record=on_record,
+                    long_path=self.win_long_path,
+                    lookup=lookup,
+                )
+            finally:
+                if cache is not None:
+                    cache.close()
+        if cache is not None:
+            logging.info(
+                f"Hash cache for {copy_type} - Hits: {cache.hits}, Misses: {cache.misses}"
+            )
+        seconds = time.perf_counter() - start
+        rate = totals["size_bytes"] / (1024 * 1024) / seconds if seconds > 0 else 0
+        logging.info(
+            f"Checksum verification for {copy_type} - Matched: {totals['match']}, Mismatched: {totals['mismatch']}, Failed: {totals['failed']}, Size hashed (bytes): {totals['size_bytes']}, Time: {timedelta(seconds=round(seconds))}, Rate: {rate:.1f} MB/s"
+        )
+        info.update(totals)
+        self.store_checksum_info[copy_type] = info
+
+    def write_checksums(self):
+        """
+        Combine the checksum files of the copy types into the CHECKSUMS file of the run, next to the transferred data. It can be checked with e.g. 'sha256sum -c CHECKSUMS' from the run folder.
+
+        The entries of the copy types not verified by this transfer (for example a transfer with a subset of --copy_type) are kept from the existing CHECKSUMS file, unless they were written with another checksum algorithm. The entries of the copy types verified now are replaced.
+        """
+        copy_types = [
+            copy_type
+            for copy_type in self.copy_type
+            if copy_type in self.store_checksum_info
+        ]
+        if not copy_types:
+            return
+        digest_length = 2 * hashlib.new(self.checksum_algorithm).digest_size
+        tmp_file = f"{self.isilon_drive_checksums}.tmp"
+        with open(tmp_file, "wb") as out:
+            for copy_type in copy_types:
+                with open(
+                    self.store_checksum_info[copy_type]["checksum_file"], "rb"
+                ) as f:
+                    shutil.copyfileobj(f, out)
+            if os.path.exists(self.isilon_drive_checksums):
+                kept = dropped = 0
+                with open(
+                    self.isilon_drive_checksums,
+                    encoding="utf-8",
+                    errors="surrogateescape",
+                    newline="\n",
+                ) as f:
+                    for line in f:
+                        entry = parse_checksum_line(line)
+                        if entry is None:
+                            continue
+                        digest, path = entry
+                        if path.split("/", 1)[0] in copy_types:
+                            continue
+                        if len(digest) != digest_length:
+                            dropped += 1
+                            continue
+                        if not line.endswith("\n"):
+                            line += "\n"
+                        out.write(line.encode("utf-8", errors="surrogateescape"))
+                        kept += 1
+                if kept:
+                    logging.info(
+                        f"Checksums of {kept} files of the other copy types kept from: {self.isilon_drive_checksums}"
+                    )
+                if dropped:
+                    logging.warning(
+                        f"Checksums of {dropped} files of the other copy types not written with {self.checksum_algorithm} left out of: {self.isilon_drive_checksums}"
+                    )
+        os.replace(tmp_file, self.isilon_drive_checksums)
+        logging.info(
+            f"Checksums ({self.checksum_algorithm}) written to: {self.isilon_drive_checksums}"
+        )
+
+    def get_checksum_summary(self, copy_type):
+        """
+        Checksum verification results of a copy type for the transfer summary. Returns the email content and whether any file did not match.
+        """
+        email_content = str()
+        info = self.store_checksum_info.get(copy_type)
+        if not info:
+            return email_content, False
+        email_content += f"\n\nChecksum verification ({self.checksum_algorithm}) for '{copy_type}':\n"
+        email_content += f"Matched: {info['match']}, Mismatched: {info['mismatch']}, Failed: {info['failed']}\n"
+        error = bool(info["mismatch"] or info["failed"])
+        for kind in ("mismatch", "failed"):
+            if not info[kind]:
+                continue
+            examples = info[f"{kind}_examples"]
+            email_content += f"\nERROR: Checksum {kind} files for '{copy_type}': {info[kind]}\n"
+            for example in examples:
+                email_content += f" - {example}\n"
+            if info[kind] > len(examples):
+                email_content += f" - ... and {info[kind] - len(examples)} more\n"
+        return email_content, error
+
+    def get_tree_digest_file(self, copy_type, state):
+        return os.path.join(
+            self.log_dir,
+            f"{self.run_id}.{copy_type}.tree_digest_{state}_transfer.json.gz",
+        )
+
+    def get_tree_digest_diff(self, copy_type, max_examples=20):
+        """
+        Compute the folder digests of the before and after transfer manifests of a copy type, compare them top-down and store the folders that differ in self.store_tree_digest_diff dictionary. With --checksum and --hash_cache, the content digests of the files are part of the folder digests.
+        """
+        before = self.store_manifest_files["before"].get(copy_type)
+        after = self.store_manifest_files["after"].get(copy_type)
+        if not before or not after:
+            return
+
+        cache = None
+        if self.get_copy_policy(copy_type)["checksum"] and self.hash_cache:
+            cache = HashCache(self.get_hash_cache_file())
+
+        def content(root):
+            if cache is None:
+                return None
+
+            def lookup(path):
+                cached = cache.get(root, path, self.checksum_algorithm)
+                return cached[3] if cached else None
+
+            return lookup
+
+        try:
+            digests = dict()
+            for state, manifest_file, root in (
+                ("before", before, f"{copy_type}:source"),
+                ("after", after, f"{copy_type}:destination"),
+            ):
+                digests[state] = tree_digests(manifest_file, content=content(root))
+                write_tree_digests(
+                    self.get_tree_digest_file(copy_type, state), digests[state]
+                )
+        finally:
+            if cache is not None:
+                cache.close()
+
+        differences, visited = compare_tree_digests(digests["before"], digests["after"])
+        logging.info(
+            f"Tree digest for {copy_type} - Before: {digests['before']['']['digest']}, After: {digests['after']['']['digest']}, Folders in source: {len(digests['before'])}, Folders compared: {visited}, Folders differing: {len(differences)}"
+        )
+        examples = list()
+        for kind, path in differences:
+            info = digests["before"].get(path) or digests["after"][path]
+            example = f"{path or '.'} ({kind}, {info['file_count']} files, {info['size_bytes']} bytes below this folder)"
+            logging.warning(f"Tree digest for {copy_type} differs: {example}")
+            if len(examples) < max_examples:
+                examples.append(example)
+        self.store_tree_digest_diff[copy_type] = {
+            "count": len(differences),
+            "examples": examples,
+        }
+
+    def get_tree_digest_summary(self, copy_type):
+        """
+        Folder digest comparison of a copy type for the transfer summary. Returns the email content and whether any folder differs.
+        """
+        email_content = str()
+        diff = self.store_tree_digest_diff.get(copy_type)
+        if not diff or not diff["count"]:
+            return email_content, False
+        email_content += f"\n\nERROR: Folders that differ for '{copy_type}' (before vs after transfer folder digests): {diff['count']}\n"
+        for example in diff["examples"]:
+            email_content += f" - {example}\n"
+        if diff["count"] > len(diff["examples"]):
+            email_content += f" - ... and {diff['count'] - len(diff['examples'])} more\n"
+        return email_content, True
+
+    def get_counts_python(self, state="before", copy_types=None):
         """
         Get the count of files, folders and total size in bytes for raw_data, analysis and output folders before transfer and log that information. This information will be used to compare with the counts after transfer to check if the transfer was successful.
         """
-        for copy_type in self.copy_type:
+        for copy_type in copy_types or self.copy_type:
             source = None
             if copy_type == "raw_data":
                 source = (
@@ -300,30 +982,43 @@ class VizgenDataTransfer:
                 logging.warning(f"Unknown copy type: {copy_type}")
                 continue
 
-            total_files = 0
-            total_folders = 0
-            total_size_bytes = 0
-            total_size_gbytes = 0
-
-            for dirpath, dirnames, filenames in os.walk(source):
-                total_folders += len(dirnames)
-                total_files += len(filenames)
-                for f in filenames:
-                    fp = self.win_long_path(os.path.join(dirpath, f))
-                    total_size_bytes += os.path.getsize(fp)
-            total_size_gbytes = float(f"{total_size_bytes / (1024 * 1024 * 1024):.3f}")
-            logging.info(f"Checking location: {source}")
-            logging.info(
-                f"{state.title()} transfer - {copy_type} - Total files: {total_files}, Total folders: {total_folders}, Total size (GB): {total_size_gbytes}, Total size (bytes): {total_size_bytes}"
-            )
-            self.store_python_count_info[state][copy_type] = {
-                "files": total_files,
-                "folders": total_folders,
-                "size_bytes": total_size_bytes,
-                "size_gbytes": total_size_gbytes,
-            }
-
-    def get_counts_robocopy(self, state="before"):
+            with self.metrics.stage(f"{state}_scan", copy_type):
+                # walk the tree using the scanner selected with --scanner and
+                # record every file and folder in the manifest for this state
+                manifest_file = self.get_manifest_file(copy_type, state)
+                with ManifestWriter(manifest_file) as manifest:
+                    totals = scan_tree(
+                        source,
+                        scanner=self.scanner,
+                        workers=self.scan_threads,
+                        on_file=manifest.add_file,
+                        on_dir=manifest.add_dir,
+                        long_path=self.win_long_path,
+                    )
+                logging.info(
+                    f"Manifest {state} transfer - {copy_type}: {manifest_file}"
+                )
+                self.store_manifest_files[state][copy_type] = manifest_file
+                total_files = totals["files"]
+                total_folders = totals["folders"]
+                total_size_bytes = totals["size_bytes"]
+                total_size_gbytes = float(
+                    f"{total_size_bytes / (1024 * 1024 * 1024):.3f}"
+                )
+                logging.info(
+                    f"Checking location: {source} using scanner: {self.scanner}"
+                )
+                logging.info(
+                    f"{state.title()} transfer - {copy_type} - Total files: {total_files}, Total folders: {total_folders}, Total size (GB): {total_size_gbytes}, Total size (bytes): {total_size_bytes}"
+                )
+                self.store_python_count_info[state][copy_type] = {
+                    "files": total_files,
+                    "folders": total_folders,
+                    "size_bytes": total_size_bytes,
+                    "size_gbytes": total_size_gbytes,
+                }
+
+    def get_counts_robocopy(self, state="before", copy_types=None):
         """
         Run robocopy in list mode for locations raw_data, analysis and output locations before and after. From the end of robocopy log file for raw_data, analysis and output locations, store Total Dirs, Files, Bytes to self.store_robocopy_count_info dictionary.
 
@@ -342,7 +1037,7 @@ class VizgenDataTransfer:
 
         """
         logging.info(f"Getting robocopy list {state} transfer for run: {self.run_id}")
-        for copy_type in self.copy_type:
+        for copy_type in copy_types or self.copy_type:
             source = None
             log_file = None
             if copy_type == "raw_data":
@@ -382,47 +1077,49 @@ class VizgenDataTransfer:
                 logging.warning(f"Unknown copy type: {copy_type}")
                 continue
 
-            cmd = f'robocopy "{source}" "NULL" {self.robocopy_list} /MT:{self.threads} /LOG+:{log_file}'
-            logging.info(f"Command: {cmd}")
-            try:
-                result = subprocess.run(
-                    cmd, shell=True, capture_output=True, text=True, check=True
+            with self.metrics.stage(f"{state}_robocopy_list", copy_type):
+                # the list is appended to the log, remember where it starts
+                self.store_robocopy_list_offsets[state][copy_type] = (
+                    os.path.getsize(log_file) if os.path.exists(log_file) else 0
                 )
-                logging.info(f"STDOUT:\n{result.stdout}")
-                msg = f"Robocopy list command executed successfully for {copy_type} for run: {self.run_id} with robocopy exit code '{result.returncode}': {robocopy_exit_codes[result.returncode]}"
-                logging.info(msg)
-                self.store_robocopy_list_returns[state][copy_type] = msg
-
-            except subprocess.CalledProcessError as e:
-                logging.info(f"STDOUT:\n{e.stdout}")
-                logging.error(f"{e}")
-                logging.error(f"STDERR: {e.stderr}")
-
-                if e.returncode in robocopy_exit_codes:
-                    msg = f"Robocopy list command executed successfully for {copy_type} for run: {self.run_id} with robocopy exit code '{e.returncode}': {robocopy_exit_codes[e.returncode]}"
+                cmd = f'robocopy "{source}" "NULL" {self.robocopy_list} /MT:{self.get_robocopy_list_threads()} /LOG+:{log_file}'
+                logging.info(f"Command: {cmd}")
+                try:
+                    # output is streamed to the log as it arrives
+                    result = run_command(cmd, prefix=f"[{copy_type}] ")
+                    msg = f"Robocopy list command executed successfully for {copy_type} for run: {self.run_id} with robocopy exit code '{result.returncode}': {robocopy_exit_codes[result.returncode]}"
                     logging.info(msg)
                     self.store_robocopy_list_returns[state][copy_type] = msg
-                else:
-                    email_subject = (
-                        f"Vizgen data transfer failed for run: {self.run_id}"
-                    )
-                    email_content = (
-                        f"Vizgen data transfer failed for run: {self.run_id}"
-                    )
-                    error_msg = f"Error getting robocopy list for {copy_type} for run: {self.run_id}.\nExit code: '{e.returncode}'\nSTDERR: {e.stderr}\nError: {e}"
-                    email_content += f"\n\n{error_msg}"
-                    email_content += f"\n\nCommand executed:\n\n{executed_command}"
-                    self.send_email(email_subject, email_content)
-                    raise ValueError(email_content)
 
-    def check_robocopy_list_logs(self, state="before"):
+                except subprocess.CalledProcessError as e:
+                    logging.error(f"{e}")
+                    logging.error(f"STDERR: {e.stderr}")
+
+                    if e.returncode in robocopy_exit_codes:
+                        msg = f"Robocopy list command executed successfully for {copy_type} for run: {self.run_id} with robocopy exit code '{e.returncode}': {robocopy_exit_codes[e.returncode]}"
+                        logging.info(msg)
+                        self.store_robocopy_list_returns[state][copy_type] = msg
+                    else:
+                        email_subject = (
+                            f"Vizgen data transfer failed for run: {self.run_id}"
+                        )
+                        email_content = (
+                            f"Vizgen data transfer failed for run: {self.run_id}"
+                        )
+                        error_msg = f"Error getting robocopy list for {copy_type} for run: {self.run_id}.\nExit code: '{e.returncode}'\nSTDERR: {e.stderr}\nError: {e}"
+                        email_content += f"\n\n{error_msg}"
+                        email_content += f"\n\nCommand executed:\n\n{executed_command}"
+                        self.send_email(email_subject, email_content)
+                        raise ValueError(email_content)
+
+    def check_robocopy_list_logs(self, state="before", copy_types=None):
         """
         Check the robocopy list logs for raw_data, analysis and output locations for the Total Dirs, Files, Bytes information and store that in self.store_robocopy_count_info dictionary.
         """
         logging.info(
             f"Checking robocopy list logs {state} transfer for run: {self.run_id}"
         )
-        for copy_type in self.copy_type:
+        for copy_type in copy_types or self.copy_type:
             log_file = None
             if copy_type == "raw_data":
                 log_file = (
@@ -446,12 +1143,13 @@ class VizgenDataTransfer:
                 logging.warning(f"Unknown copy type: {copy_type}")
                 continue
 
-            with open(log_file, "r") as f:
+            with self.metrics.stage(f"{state}_robocopy_list_check", copy_type):
                 total_files = 0
                 total_folders = 0
                 total_size_bytes = 0
                 total_size_gbytes = 0
-                lines = f.readlines()
+                # only the footer is needed, read it from the end of the log
+                lines = read_tail_lines(log_file, 7)
                 if len(lines) < 7:
                     logging.error(
                         f"Robocopy list log file for {copy_type} does not have enough lines to extract Total Dirs, Files, Bytes information. Log file: {log_file}"
@@ -499,6 +1197,446 @@ class VizgenDataTransfer:
                             "size_gbytes": total_size_gbytes,
                         }
 
+    def get_robocopy_list_locations(self, copy_type, state="before"):
+        """
+        Location listed with robocopy and the robocopy list log file for a copy type, before or after transfer.
+        """
+        list_locations = {
+            "raw_data": (
+                (self.analysis_drive_raw_data, self.isilon_log_bf_raw_data)
+                if state == "before"
+                else (self.isilon_drive_raw_data, self.isilon_log_af_raw_data)
+            ),
+            "analysis": (
+                (self.analysis_drive_analysis, self.isilon_log_bf_analysis)
+                if state == "before"
+                else (self.isilon_drive_analysis, self.isilon_log_af_analysis)
+            ),
+            "output": (
+                (self.analysis_drive_output, self.isilon_log_bf_output)
+                if state == "before"
+                else (self.isilon_drive_output, self.isilon_log_af_output)
+            ),
+        }
+        return list_locations.get(copy_type)
+
+    def get_counts_robocopy_manifest(self, state="before", copy_types=None):
+        """
+        Build the manifest and the python based counts from the robocopy list log, instead of enumerating the same location a second time with get_counts_python. The totals are checked against the robocopy list footer, and the location is scanned with python if they do not agree, for example when the list log could not be parsed.
+        """
+        for copy_type in copy_types or self.copy_type:
+            locations = self.get_robocopy_list_locations(copy_type, state)
+            if locations is None:
+                logging.warning(f"Unknown copy type: {copy_type}")
+                continue
+            location, log_file = locations
+
+            stats = dict()
+            manifest_file = self.get_manifest_file(copy_type, state)
+            with self.metrics.stage(
+                f"{state}_robocopy_list_manifest", copy_type
+            ), ManifestWriter(manifest_file) as manifest:
+                for record in parse_robocopy_list_log(
+                    log_file,
+                    location,
+                    offset=self.store_robocopy_list_offsets[state].get(copy_type, 0),
+                    stats=stats,
+                ):
+                    manifest.add(record.path, record.type, record.size, record.mtime)
+
+            # the robocopy Dirs total includes the listed folder itself
+            footer = self.store_robocopy_count_info[state].get(copy_type)
+            if not footer or (
+                int(footer["files"]) != stats["files"]
+                or int(footer["folders"]) != stats["folders"] + 1
+                or int(footer["size_bytes"]) != stats["size_bytes"]
+            ):
+                logging.warning(
+                    f"Robocopy list log {state} transfer for {copy_type} does not agree with its footer (files: {stats['files']}, folders: {stats['folders']}, size (bytes): {stats['size_bytes']}), scanning the location with python instead: {log_file}"
+                )
+                self.get_counts_python(state=state, copy_types=[copy_type])
+                continue
+
+            logging.info(f"Manifest {state} transfer - {copy_type}: {manifest_file}")
+            self.store_manifest_files[state][copy_type] = manifest_file
+            total_size_gbytes = float(
+                f"{stats['size_bytes'] / (1024 * 1024 * 1024):.3f}"
+            )
+            logging.info(
+                f"{state.title()} transfer - {copy_type} (from robocopy list log) - Total files: {stats['files']}, Total folders: {stats['folders']}, Total size (GB): {total_size_gbytes}, Total size (bytes): {stats['size_bytes']}"
+            )
+            self.store_python_count_info[state][copy_type] = {
+                "files": stats["files"],
+                "folders": stats["folders"],
+                "size_bytes": stats["size_bytes"],
+                "size_gbytes": total_size_gbytes,
+            }
+
+    def get_rsync_extra_options(self, copy_type):
+        options = str()
+        # rsync reports the progress of the whole transfer with --info=progress2
+        if self.progress_interval > 0:
+            options += " --info=progress2"
+        # log the size and modification time of every file, used to derive
+        # the after transfer counts from the log
+        if self.get_copy_policy(copy_type)["after_counts"] == "rsync_log":
+            options += f' --log-file-format="{rsync_log_format}"'
+        return options
+
+    def record_destination_state(self, copy_type, destination, log_file):
+        """
+        Record the state of the destination before the copy: a manifest of the files already present and the current size of the copy log file. The after transfer counts are then derived from this manifest and the rsync log lines written after that offset. A destination that does not exist or is empty, the usual case for a new run, is recorded without scanning.
+        """
+        self.store_log_offsets[copy_type] = (
+            os.path.getsize(log_file) if os.path.exists(log_file) else 0
+        )
+        if copy_type in self.store_manifest_files["existing"]:
+            return
+        existing_manifest = self.get_manifest_file(copy_type, "existing")
+        is_empty = True
+        if os.path.isdir(destination):
+            with os.scandir(destination) as it:
+                is_empty = next(it, None) is None
+        if is_empty:
+            write_manifest(existing_manifest, [])
+        else:
+            with ManifestWriter(existing_manifest) as manifest:
+                scan_tree(
+                    destination,
+                    scanner=self.scanner,
+                    workers=self.scan_threads,
+                    on_file=manifest.add_file,
+                    on_dir=manifest.add_dir,
+                    long_path=self.win_long_path,
+                )
+        logging.info(
+            f"Destination state before transfer - {copy_type}: {existing_manifest}"
+        )
+        self.store_manifest_files["existing"][copy_type] = existing_manifest
+
+    def get_counts_from_rsync_log(self, copy_type, log_file):
+        """
+        Derive the after transfer counts of a copy type from the destination state recorded before the copy and the files and folders rsync logged during the copy, instead of walking the whole destination again. Falls back to scanning the destination when the rsync sessions in the log are not complete, e.g. when one of the rsync shards was stopped.
+        """
+        stats = dict()
+        log_manifest = self.get_manifest_file(copy_type, "rsync_log")
+        with ManifestWriter(log_manifest) as manifest:
+            for record in parse_rsync_log(
+                log_file,
+                offset=self.store_log_offsets.get(copy_type, 0),
+                stats=stats,
+                sessions=self.store_rsync_sessions.get(copy_type, 1),
+            ):
+                manifest.add(record.path, record.type, record.size, record.mtime)
+        logging.info(
+            f"Rsync log for {copy_type} - Files transferred: {stats['files']}, Folders created: {stats['folders']}, Size transferred (bytes): {stats['size_bytes']}, Sessions ended: {stats['sessions_ended']} of {self.store_rsync_sessions.get(copy_type, 1)}, Session complete: {stats['complete']}"
+        )
+        # nothing is logged when resume mode found nothing left to copy, the
+        # destination is then unchanged
+        if stats["lines"] and not stats["complete"]:
+            logging.warning(
+                f"Rsync log for {copy_type} does not hold a complete session for every rsync worker, scanning the destination for the after transfer counts: {log_file}"
+            )
+            self.get_counts_python(state="after", copy_types=[copy_type])
+            return
+
+        after_manifest = self.get_manifest_file(copy_type, "after")
+        totals = merge_manifests(
+            self.store_manifest_files["existing"][copy_type],
+            log_manifest,
+            after_manifest,
+        )
+        total_size_gbytes = float(f"{totals['size_bytes'] / (1024 * 1024 * 1024):.3f}")
+        logging.info(
+            f"After transfer - {copy_type} (from rsync log) - Total files: {totals['files']}, Total folders: {totals['folders']}, Total size (GB): {total_size_gbytes}, Total size (bytes): {totals['size_bytes']}"
+        )
+        self.store_manifest_files["after"][copy_type] = after_manifest
+        self.store_python_count_info["after"][copy_type] = {
+            "files": totals["files"],
+            "folders": totals["folders"],
+            "size_bytes": totals["size_bytes"],
+            "size_gbytes": total_size_gbytes,
+        }
+
+    def get_resume_files(self, copy_type, destination):
+        """
+        Compare the source manifest from the before transfer scan with a fresh manifest of the destination and write the relative paths of the files that are missing or size mismatched in the destination to a list file. Returns the list file and the number of files in it.
+        """
+        source_manifest = self.store_manifest_files["before"].get(copy_type)
+        if not source_manifest:
+            raise ValueError(
+                f"Source manifest not found for {copy_type} for run: {self.run_id}. Cannot resume the transfer without a before transfer scan."
+            )
+
+        # scan what has already been copied to the destination, unless the
+        # destination state was already recorded before the copy
+        destination_manifest = self.store_manifest_files["existing"].get(copy_type)
+        if not destination_manifest:
+            destination_manifest = self.get_manifest_file(copy_type, "resume")
+            with ManifestWriter(destination_manifest) as manifest:
+                scan_tree(
+                    destination,
+                    scanner=self.scanner,
+                    workers=self.scan_threads,
+                    on_file=manifest.add_file,
+                    on_dir=manifest.add_dir,
+                    long_path=self.win_long_path,
+                )
+        self.store_manifest_files["resume"][copy_type] = destination_manifest
+
+        resume_files = os.path.join(
+            self.log_dir, f"{self.run_id}.{copy_type}.resume_files.txt"
+        )
+        total_files = 0
+        total_size_bytes = 0
+        with open(resume_files, "w", encoding="utf-8", newline="\n") as f:
+            for path, size in self.iter_transfer_entries(copy_type):
+                f.write(f"{path}\n")
+                total_files += 1
+                total_size_bytes += size
+        logging.info(
+            f"Resume {copy_type} - Files left to copy: {total_files}, Size left to copy (bytes): {total_size_bytes}, File list: {resume_files}"
+        )
+        return resume_files, total_files, total_size_bytes
+
+    def iter_transfer_entries(self, copy_type):
+        """
+        Yield (relative path, size) of the files to copy for a copy type. In resume mode these are the files missing or size mismatched in the destination, otherwise all the files of the source manifest.
+        """
+        source_manifest = self.store_manifest_files["before"][copy_type]
+        destination_manifest = self.store_manifest_files["resume"].get(copy_type)
+        if destination_manifest:
+            for kind, src, dst in diff_manifests(source_manifest, destination_manifest):
+                if kind in ("missing", "size_mismatch"):
+                    yield src.path, src.size
+        else:
+            for entry in read_manifest(source_manifest):
+                if entry.type == "f":
+                    yield entry.path, entry.size
+
+    def copy_data_sharded(
+        self, copy_type, source, destination, log_file, total_files, total_size_bytes
+    ):
+        """
+        Copy a copy type with --rsync_shards parallel rsync workers. The files are partitioned into shards balanced by bytes and file count using the manifest from the before transfer scan, each worker writes its own log file and the shard logs are merged into the copy type log file once all workers have finished.
+        """
+        policy = self.get_copy_policy(copy_type)
+        shard_prefix = os.path.join(
+            self.log_dir, f"{self.run_id}.{copy_type}.rsync_shard"
+        )
+        shards = write_shards(
+            self.iter_transfer_entries(copy_type),
+            shard_prefix,
+            policy["rsync_shards"],
+            total_files=total_files,
+            total_size_bytes=total_size_bytes,
+        )
+
+        # create the folder tree up front so that the workers do not race to
+        # create the same parent folders, this also keeps empty folders
+        for entry in read_manifest(self.store_manifest_files["before"][copy_type]):
+            if entry.type == "d":
+                os.makedirs(os.path.join(destination, entry.path), exist_ok=True)
+
+        cmds = list()
+        shard_logs = list()
+        for n, shard in enumerate(shards):
+            shard_log = f"{log_file}.shard{n}"
+            shard_logs.append(shard_log)
+            cmds.append(
+                f"rsync {policy['tool_options']}{self.get_rsync_extra_options(copy_type)} --files-from={shard['file_list']} --log-file={shard_log} {source}/ {destination}"
+            )
+            logging.info(
+                f"Shard {n} for {copy_type} - Total files: {shard['files']}, Total size (bytes): {shard['size_bytes']}"
+            )
+            logging.info(f"Command: {cmds[-1]}")
+
+        progress = self.get_progress_reporter(copy_type, total_files, total_size_bytes)
+
+        def run_shard(n):
+            # each shard reports its own progress, the reporter sums them
+            def shard_line(line):
+                return progress.on_rsync_line(line, part=n)
+
+            return run_command(
+                cmds[n],
+                check=False,
+                prefix=f"[{copy_type} shard {n}] ",
+                on_line=shard_line if progress else None,
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, len(cmds)), thread_name_prefix="rsync_shard"
+        ) as executor:
+            results = list(executor.map(run_shard, range(len(cmds))))
+
+        merge_shard_logs(shard_logs, log_file)
+        # every shard ends its own session in the merged log
+        self.store_rsync_sessions[copy_type] = len(shards)
+
+        failed = list()
+        for n, result in enumerate(results):
+            if result.returncode != 0:
+                logging.error(f"Shard {n} STDERR: {result.stderr}")
+                failed.append(
+                    f"Shard {n} ({shards[n]['file_list']}) exit code: '{result.returncode}'\nSTDERR: {result.stderr}"
+                )
+
+        if progress:
+            progress.close("failed" if failed else "complete")
+
+        if failed:
+            email_subject = f"Vizgen data transfer failed for run: {self.run_id}"
+            email_content = f"Vizgen data transfer failed for run: {self.run_id}"
+            error_msg = f"Error copying {copy_type} for run: {self.run_id} with {len(shards)} rsync shards.\n" + "\n".join(failed)
+            email_content += f"\n\n{error_msg}"
+            email_content += f"\n\nCommand executed:\n\n{executed_command}"
+            self.send_email(email_subject, email_content)
+            raise ValueError(email_content)
+
+        msg = f"Successfully copied {copy_type} for run: {self.run_id} using {len(shards)} rsync shards with exit code '0'"
+        logging.info(msg)
+        self.store_copy_returns[copy_type] = msg
+
+    def get_progress_reporter(self, copy_type, total_files=None, total_size_bytes=None):
+        """
+        Progress reporter for the copy of a copy type, comparing the files and bytes done against the before transfer totals (or the resume totals). Returns None when --progress_interval is 0.
+        """
+        if self.progress_interval <= 0:
+            return None
+        if total_files is None:
+            total_files = self.store_python_count_info["before"][copy_type]["files"]
+            total_size_bytes = self.store_python_count_info["before"][copy_type][
+                "size_bytes"
+            ]
+        status_file = os.path.join(
+            self.log_dir, f"{self.run_id}.{copy_type}.progress.json"
+        )
+        logging.info(f"Progress status file for {copy_type}: {status_file}")
+        return ProgressReporter(
+            self.run_id,
+            copy_type,
+            total_files,
+            total_size_bytes,
+            status_file,
+            interval=self.progress_interval,
+        )
+
+    def get_copy_controller(self, copy_type, source):
+        """
+        Adaptive number of copy threads for a copy type with --threads auto (or threads = "auto" in the policy of the copy type), None otherwise.
+        """
+        if self.get_copy_policy(copy_type)["threads"] != "auto":
+            return None
+        controller = AdaptiveConcurrency(
+            f"{copy_type} from {source}",
+            max_workers=self.max_threads,
+            interval=self.adaptive_interval,
+        )
+        logging.info(
+            f"Adaptive copy threads for {copy_type}: starting with {controller.workers} worker(s), at most {controller.max_workers}, deciding every {controller.interval} seconds"
+        )
+        return controller
+
+    def store_copy_controller(self, copy_type, controller):
+        if not controller:
+            return
+        summary = controller.summary()
+        self.store_adaptive_threads[copy_type] = summary
+        logging.info(
+            f"Adaptive copy threads for {copy_type}: finished with {summary['final_workers']} worker(s) after {summary['intervals']} interval(s), never more than {summary['cap']}"
+        )
+
+    def copy_data_native(
+        self,
+        copy_type,
+        source,
+        destination,
+        log_file,
+        total_files=None,
+        total_size_bytes=None,
+    ):
+        """
+        Copy a copy type with the native Python copy engine using --threads worker threads, or the threads, buffer size and file order of the policy of the copy type. Every file is recorded in the copy type log file as soon as it is done, followed by a footer with the totals once the copy is complete.
+        """
+        policy = self.get_copy_policy(copy_type)
+        controller = self.get_copy_controller(copy_type, source)
+        workers = "auto" if controller else int(policy["threads"])
+        logging.info(
+            f"Native copy of {copy_type} from {source} to {destination} using {workers} thread(s), {policy['buffer_size']} bytes buffer, files in {policy['order']} order"
+        )
+
+        # create the folder tree first, this also keeps empty folders
+        for entry in read_manifest(self.store_manifest_files["before"][copy_type]):
+            if entry.type == "d":
+                os.makedirs(
+                    self.win_long_path(os.path.join(destination, *entry.path.split("/"))),
+                    exist_ok=True,
+                )
+
+        progress = self.get_progress_reporter(copy_type, total_files, total_size_bytes)
+        failed = list()
+        with open(log_file, "a", encoding="utf-8") as log:
+            log.write(
+                f"{time.strftime('%Y/%m/%d %H:%M:%S')} [{os.getpid()}] {native_copy.log_header}\n"
+            )
+            log.write(
+                f"{time.strftime('%Y/%m/%d %H:%M:%S')} [{os.getpid()}] Source: {source} Destination: {destination} Threads: {workers}\n"
+            )
+
+            def on_record(record):
+                log.write(
+                    f"{time.strftime('%Y/%m/%d %H:%M:%S')} [{os.getpid()}] {record['status']} {record['size']} {record['seconds']:.3f}s {record['method'] or '-'} {record['path']}\n"
+                )
+                if progress:
+                    progress.add(files=1, size=record["size"])
+                if record["status"] == "failed":
+                    logging.error(
+                        f"Failed to copy {record['path']} for {copy_type}: {record['error']}"
+                    )
+                    failed.append(f"{record['path']}: {record['error']}")
+
+            totals = native_copy.copy_tree(
+                source,
+                destination,
+                (
+                    path
+                    for path, size in order_entries(
+                        self.iter_transfer_entries(copy_type), policy["order"]
+                    )
+                ),
+                workers=1 if controller else workers,
+                buffer_size=policy["buffer_size"],
+                on_record=on_record,
+                long_path=self.win_long_path,
+                controller=controller,
+            )
+            self.store_copy_controller(copy_type, controller)
+            summary = f"Files copied: {totals['copied']}, Files skipped: {totals['skipped']}, Files failed: {totals['failed']}, Bytes copied: {totals['size_bytes']}"
+            log.write(
+                f"{time.strftime('%Y/%m/%d %H:%M:%S')} [{os.getpid()}] {summary}\n"
+            )
+            if not failed:
+                log.write(
+                    f"{time.strftime('%Y/%m/%d %H:%M:%S')} [{os.getpid()}] {native_copy.log_footer}\n"
+                )
+        logging.info(f"Native copy of {copy_type} - {summary}")
+        if progress:
+            progress.close("failed" if failed else "complete")
+
+        if failed:
+            email_subject = f"Vizgen data transfer failed for run: {self.run_id}"
+            email_content = f"Vizgen data transfer failed for run: {self.run_id}"
+            error_msg = f"Error copying {copy_type} for run: {self.run_id} with the native copy engine.\n{summary}\n" + "\n".join(failed[:20])
+            email_content += f"\n\n{error_msg}"
+            email_content += f"\n\nCommand executed:\n\n{executed_command}"
+            self.send_email(email_subject, email_content)
+            raise ValueError(email_content)
+
+        msg = f"Successfully copied {copy_type} for run: {self.run_id} with the native copy engine. {summary}"
+        logging.info(msg)
+        self.store_copy_returns[copy_type] = msg
+
     def copy_data(self, copy_type, source, destination, log_file):
         # robocopy command used:
         # robocopy
@@ -507,21 +1645,84 @@ class VizgenDataTransfer:
         # /J - copy using unbuffered I/O (recommended for large files).
         # /MT:8 - Creates multi-threaded copies with n threads. n must be an integer between 1 and 128. The default value for n is 8. For better performance, redirect your output using /log option.
         # /log+ - Writes the status output to the log file (overwrites the existing log file).
+        # in resume mode only hand the missing and size mismatched files to rsync
+        policy = self.get_copy_policy(copy_type)
+        files_from = None
+        total_files = None
+        total_size_bytes = None
+        if self.resume:
+            if policy["backend"] in ("rsync", "native"):
+                files_from, total_files, total_size_bytes = self.get_resume_files(
+                    copy_type, destination
+                )
+                self.store_resume_totals[copy_type] = {
+                    "files": total_files,
+                    "size_bytes": total_size_bytes,
+                }
+                if total_files == 0:
+                    msg = f"Nothing left to copy for {copy_type} for run: {self.run_id}. All files from the source are already present in the destination"
+                    logging.info(msg)
+                    self.store_copy_returns[copy_type] = msg
+                    return
+            else:
+                # robocopy has no equivalent of --files-from, it skips files
+                # that already exist in the destination by itself
+                logging.warning(
+                    f"Resume mode file lists are only supported with rsync and the native copy engine. Running the full robocopy command for {copy_type}, which skips files already present in the destination"
+                )
+
+        if policy["backend"] == "native":
+            self.copy_data_native(
+                copy_type, source, destination, log_file, total_files, total_size_bytes
+            )
+            return
+
+        # split the copy over several rsync workers
+        if self.os_name == "linux" and policy["rsync_shards"] > 1:
+            if total_files is None:
+                total_files = self.store_python_count_info["before"][copy_type]["files"]
+                total_size_bytes = self.store_python_count_info["before"][copy_type][
+                    "size_bytes"
+                ]
+            self.copy_data_sharded(
+                copy_type, source, destination, log_file, total_files, total_size_bytes
+            )
+            return
+
         cmd = None
-        if self.os_name == "linux":
-            cmd = f"rsync {self.tool_options} --log-file={log_file} {source}/* {destination}"
+        if self.os_name == "linux" and files_from:
+            cmd = f"rsync {policy['tool_options']}{self.get_rsync_extra_options(copy_type)} --files-from={files_from} --log-file={log_file} {source}/ {destination}"
+        elif self.os_name == "linux":
+            cmd = f"rsync {policy['tool_options']}{self.get_rsync_extra_options(copy_type)} --log-file={log_file} {source}/* {destination}"
         elif self.os_name == "windows":
-            cmd = f'robocopy "{source}" "{destination}" {self.tool_options} /MT:{self.threads} /LOG+:{log_file}'
+            cmd = f'robocopy "{source}" "{destination}" {policy["tool_options"]} /MT:{policy["threads"]} /LOG+:{log_file}'
         else:
             raise ValueError(f"Operating System: '{self.os_name}' currenly supported")
 
         logging.info(f"Command: {cmd}")
 
+        # live progress is read from the rsync output, robocopy writes its
+        # output to the /LOG file only
+        progress = None
+        if self.os_name == "linux":
+            progress = self.get_progress_reporter(
+                copy_type, total_files, total_size_bytes
+            )
+        elif self.progress_interval > 0:
+            logging.info(
+                f"Live progress reporting is not available for robocopy, see the log file for progress: {log_file}"
+            )
+
         try:
-            result = subprocess.run(
-                cmd, shell=True, capture_output=True, text=True, check=True
+            # output is streamed to the log as it arrives, only the last lines
+            # are kept for the error email
+            result = run_command(
+                cmd,
+                prefix=f"[{copy_type}] ",
+                on_line=progress.on_rsync_line if progress else None,
             )
-            logging.info(f"STDOUT:\n{result.stdout}")
+            if progress:
+                progress.close()
             if self.os_name == "linux":
                 msg = f"Successfully copied {copy_type} for run: {self.run_id} with exit code '{result.returncode}'"
                 logging.info(msg)
@@ -531,7 +1732,8 @@ class VizgenDataTransfer:
                 logging.info(msg)
                 self.store_copy_returns[copy_type] = msg
         except subprocess.CalledProcessError as e:
-            logging.info(f"STDOUT:\n{e.stdout}")
+            if progress:
+                progress.close("failed")
             logging.error(f"{e}")
             logging.error(f"STDERR: {e.stderr}")
             if self.os_name == "linux":
@@ -570,48 +1772,63 @@ class VizgenDataTransfer:
                     self.send_email(email_subject, email_content)
                     raise ValueError(email_content)
 
-    def check_log_file(self, log_file):
+    def check_log_file(self, log_file, copy_type=None):
         header_valid = False
         footer_valid = False
 
-        if self.os_name == "windows":
+        backend = self.backend
+        if copy_type:
+            backend = self.get_copy_policy(copy_type)["backend"]
+        if backend == "native":
+            # the native copy engine writes its header at the start of every
+            # copy and its footer only when all files were copied
+            head = read_head_lines(log_file, 1, encoding="utf-8")
+            tail = read_tail_lines(log_file, 1, encoding="utf-8")
+            header_valid = bool(head) and native_copy.log_header in head[0]
+            footer_valid = bool(tail) and native_copy.log_footer in tail[-1]
+            logging.info(
+                f"Checking native copy log file: {log_file}, header: {header_valid}, footer: {footer_valid}"
+            )
+        elif self.os_name == "windows":
             # check if third line from the top of the log file
             # header_format = "ROBOCOPY     ::     Robust File Copy for Windows"
             # check if 7th or 11th lines from the bottom of the log file
             # footer_format = "Total    Copied   Skipped  Mismatch    FAILED    Extras"
 
-            with open(log_file, "r") as f:
-                lines = f.readlines()
-                if len(lines) > 3:
-                    logging.info(
-                        f"Checking 3rd line from the top of log file: {log_file}"
-                    )
-                    logging.info(f"Required: '{self.robocopy_header}'")
-                    logging.info(f"Detected: '{lines[2].strip()}'")
-                    if self.robocopy_header in lines[2].strip():
-                        header_valid = True
-                    logging.info(f"Status:{header_valid}")
-                if len(lines) > 11:
-                    logging.info(
-                        f"Checking 11th line from the bottom of log file: {log_file}"
-                    )
+            # only the first 4 and the last 12 lines of the log are needed, the
+            # tail is read by seeking from the end of the (possibly huge) log
+            head = read_head_lines(log_file, 4)
+            tail = read_tail_lines(log_file, 12)
+            if len(head) > 3:
+                logging.info(
+                    f"Checking 3rd line from the top of log file: {log_file}"
+                )
+                logging.info(f"Required: '{self.robocopy_header}'")
+                logging.info(f"Detected: '{head[2].strip()}'")
+                if self.robocopy_header in head[2].strip():
+                    header_valid = True
+                logging.info(f"Status:{header_valid}")
+            if len(tail) > 11:
+                logging.info(
+                    f"Checking 11th line from the bottom of log file: {log_file}"
+                )
+                logging.info(f"Required: '{self.robocopy_footer}'")
+                logging.info(f"Detected: '{tail[-11].strip()}'")
+                if self.robocopy_footer in tail[-11].strip():
+                    footer_valid = True
+                logging.info(f"Status:{footer_valid}")
+            if not footer_valid:
+                logging.info(
+                    f"Checking 7th line from the bottom of log file: {log_file}"
+                )
+                if len(tail) > 7:
                     logging.info(f"Required: '{self.robocopy_footer}'")
-                    logging.info(f"Detected: '{lines[-11].strip()}'")
-                    if self.robocopy_footer in lines[-11].strip():
+                    logging.info(f"Detected: '{tail[-7].strip()}'")
+                    if self.robocopy_footer in tail[-7].strip():
                         footer_valid = True
                     logging.info(f"Status:{footer_valid}")
-                if not footer_valid:
-                    logging.info(
-                        f"Checking 7th line from the bottom of log file: {log_file}"
-                    )
-                    if len(lines) > 7:
-                        logging.info(f"Required: '{self.robocopy_footer}'")
-                        logging.info(f"Detected: '{lines[-7].strip()}'")
-                        if self.robocopy_footer in lines[-7].strip():
-                            footer_valid = True
-                        logging.info(f"Status:{footer_valid}")
 
-        if self.os_name == "linux":
+        elif self.os_name == "linux":
             # rsync log files are correctly formatted
             # hence no need to check header and footer
             header_valid = True
@@ -679,6 +1896,20 @@ class VizgenDataTransfer:
             )
             return str()
 
+    @staticmethod
+    def is_count_check_ignored(copy_type, cli_metric, ignore_counts):
+        """
+        Whether the count check of 'cli_metric' for 'copy_type' is ignored by one of the 'type:metric' patterns of --ignore_python_counts or --ignore_robocopy_counts.
+        """
+        # Define the 4 levels of "ignore" patterns
+        ignore_patterns = [
+            f"{copy_type}:{cli_metric}",  # Specific (raw_data:files)
+            f"{copy_type}:all",  # Type-wide (raw_data:all)
+            f"all:{cli_metric}",  # Metric-wide (all:files)
+            "all:all",  # Global ignore
+        ]
+        return any(pattern in ignore_counts for pattern in ignore_patterns)
+
     def check_ignore_count_options(self, copy_type, tool_name):
 
         temp_email_content = str()
@@ -710,16 +1941,8 @@ class VizgenDataTransfer:
         )
 
         for cli_metric, dict_key in metric_map.items():
-            # Define the 4 levels of "ignore" patterns
-            ignore_patterns = [
-                f"{copy_type}:{cli_metric}",  # Specific (raw_data:files)
-                f"{copy_type}:all",  # Type-wide (raw_data:all)
-                f"all:{cli_metric}",  # Metric-wide (all:files)
-                "all:all",  # Global ignore
-            ]
-
-            # If any of these patterns are in the user's ignore list, skip the check
-            if any(pattern in ignore_counts for pattern in ignore_patterns):
+            # If any of the patterns are in the user's ignore list, skip the check
+            if self.is_count_check_ignored(copy_type, cli_metric, ignore_counts):
                 # print(f"INFO: Ignoring {cli_metric} check for {copy_type} as requested.")
                 msg = f"User has chosen to ignore {tool_name.lower()} based count mismatch check for '{cli_metric}' metric for '{copy_type}' copy type using the option --ignore_{tool_name.lower()}_counts. Hence not checking for mismatch in {tool_name.lower()} based '{cli_metric}' counts between before and after transfer for '{copy_type}'."
                 logging.info(msg)
@@ -782,6 +2005,15 @@ class VizgenDataTransfer:
             )
             email_content += temp_email_content
             transfer_errors.extend(error)
+            temp_email_content, error = self.get_manifest_diff_summary(copy_type)
+            email_content += temp_email_content
+            transfer_errors.append(error)
+            temp_email_content, error = self.get_tree_digest_summary(copy_type)
+            email_content += temp_email_content
+            transfer_errors.append(error)
+            temp_email_content, error = self.get_checksum_summary(copy_type)
+            email_content += temp_email_content
+            transfer_errors.append(error)
 
             if self.os_name == "windows":
                 email_content += self.get_stats_for_transfer_summary(
@@ -807,15 +2039,15 @@ class VizgenDataTransfer:
         if "raw_data" in self.copy_type:
             email_content += f"\n - Raw directory: {self.isilon_drive_raw_data}"
             logging.info(f"Raw directory: {self.isilon_drive_raw_data}")
-            log_content += f"\n - Raw directory: {self.check_log_file(self.isilon_drive_raw_data_log)}"
+            log_content += f"\n - Raw directory: {self.get_log_file_status('raw_data', self.isilon_drive_raw_data_log)}"
         if "analysis" in self.copy_type:
             email_content += f"\n - Analysis directory: {self.isilon_drive_analysis}"
             logging.info(f"Analysis directory: {self.isilon_drive_analysis}")
-            log_content += f"\n - Analysis directory: {self.check_log_file(self.isilon_drive_analysis_log)}"
+            log_content += f"\n - Analysis directory: {self.get_log_file_status('analysis', self.isilon_drive_analysis_log)}"
         if "output" in self.copy_type:
             email_content += f"\n - Output directory: {self.isilon_drive_output}"
             logging.info(f"Output directory: {self.isilon_drive_output}")
-            log_content += f"\n - Output directory: {self.check_log_file(self.isilon_drive_output_log)}"
+            log_content += f"\n - Output directory: {self.get_log_file_status('output', self.isilon_drive_output_log)}"
 
         email_content += "\n\nData summary:"
         summary_content, transfer_error = self.get_transfer_summary()
@@ -866,10 +2098,27 @@ class VizgenDataTransfer:
         end_time = time.perf_counter()
         duration_seconds = end_time - start_time
         readable_time = str(timedelta(seconds=round(duration_seconds)))
-        msg = f"Total execution time : {readable_time}, using {self.threads} thread(s) for run: {self.run_id}"
+        threads = f"{self.threads} thread(s)"
+        # the policies of the copy types may use different threads
+        policy_threads = {
+            copy_type: str(self.get_copy_policy(copy_type)["threads"])
+            for copy_type in self.copy_type
+            if copy_type in self.store_copy_policies
+        }
+        if self.store_adaptive_threads:
+            threads = "adaptive threads, finishing with " + ", ".join(
+                f"{summary['final_workers']} for {copy_type}"
+                for copy_type, summary in self.store_adaptive_threads.items()
+            )
+        elif len(set(policy_threads.values())) > 1:
+            threads = "threads " + ", ".join(
+                f"{n} for {copy_type}" for copy_type, n in policy_threads.items()
+            )
+        msg = f"Total execution time : {readable_time}, using {threads} for run: {self.run_id}"
         logging.info(msg)
         email_content += f"\n\n{msg}\n\n"
 
+        self.transfer_status = "failed" if "failed" in email_subject else "completed"
         self.send_email(email_subject, email_content)
 
     def send_email(self, email_subject, email_content):
@@ -879,40 +2128,393 @@ class VizgenDataTransfer:
             logging.error("Config is not loaded. Cannot send email.")
             return
 
-        smtp_server = self.config["smtp_server"]
-        sender_email = self.config["sender_email"]
-        addressees = (
-            self.config["development"]["addressees"]
-            if any([self.debug, self.os_name == "linux"])
-            else self.config["production"]["addressees"]
+        # in batch mode the emails of all runs are sent as one report
+        if self.defer_emails:
+            logging.info(f"Email kept for the batch report: {email_subject}")
+            self.deferred_emails.append((email_subject, email_content))
+            return
+
+        with self.metrics.stage("email"):
+            send_email(
+                self.config,
+                email_subject,
+                email_content,
+                development=any([self.debug, self.os_name == "linux"]),
+            )
+
+    def get_metrics_file(self):
+        return os.path.join(self.log_dir, f"{self.run_id}.metrics.json")
+
+    def write_metrics(self, status="complete"):
+        """
+        Write the time spent in each stage, per copy type, with the files/s and MB/s against the before transfer counts to '<run_id>.metrics.json' in the logs folder.
+        """
+        report = self.metrics.report(
+            self.run_id,
+            self.store_python_count_info["before"],
+            info={
+                "os": self.os_name,
+                "backend": self.backend,
+                "threads": self.threads,
+                "adaptive_threads": {
+                    copy_type: summary["final_workers"]
+                    for copy_type, summary in self.store_adaptive_threads.items()
+                },
+                "copy_types": self.copy_type,
+                "disk": self.disk,
+                "scanner": self.scanner,
+                "parallel_copy_types": self.parallel_copy_types,
+                "rsync_shards": self.rsync_shards,
+                "checksum": self.checksum,
+                "resume": self.resume,
+                "resume_totals": self.store_resume_totals,
+                "policies": {
+                    copy_type: self.get_copy_policy(copy_type)
+                    for copy_type in self.copy_type
+                    if copy_type in self.store_copy_policies
+                },
+                "resumed": bool(self.run_state and self.run_state.resumed),
+            },
+            status=status,
         )
+        metrics_file = self.get_metrics_file()
+        write_metrics(metrics_file, report)
+        logging.info(f"Metrics file: {metrics_file}")
+        return report
 
-        # Create message container - the correct MIME type is multipart/alternative.
-        msg = MIMEMultipart("alternative")
-        part1 = MIMEText(email_content, "plain")
-        msg["Subject"] = email_subject
-        msg["From"] = sender_email
-        msg["To"] = "To: " + "; ".join(str(x) for x in addressees)
-        msg.attach(part1)
+    def get_profile_dir(self):
+        return os.path.join(self.log_dir, f"{self.run_id}.profile")
 
-        logging.info(f"Sending email to: {str(addressees)}")
+    def start_profile(self, profile_run=True):
+        """
+        With --profile, profile the stages of the transfer, and with profile_run=True the rest of the run in the current thread. Nothing is profiled without --profile, the stages only check that no profiler is set.
+        """
+        if not self.profile:
+            return
+        self.metrics.profiler = StageProfiler(self.get_profile_dir())
+        self.metrics.profiler.start(profile_run=profile_run)
 
-        s = smtplib.SMTP(smtp_server)
-        maildelivery = s.sendmail(msg["From"], addressees, msg.as_string())
+    def stop_profile(self):
+        if self.metrics.profiler:
+            self.metrics.profiler.stop()
+            self.metrics.profiler = None
 
-        if not bool(maildelivery):
-            logging.info("Email sent successfully")
-        else:
-            logging.error("Email delivery failed")
+    def record_history(self, report):
+        """
+        Add the metrics of the transfer to the transfer history in the logs folder, see vizgen_data_transfer_history for the report. An error writing the history does not fail the transfer.
+        """
+        history_file = os.path.join(self.log_dir, history_file_name)
+        try:
+            with TransferHistory(history_file) as history:
+                history.record(
+                    report, self.store_copy_returns, status=self.transfer_status
+                )
+            logging.info(f"Transfer added to the transfer history: {history_file}")
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Unable to add the transfer to the transfer history: {history_file}: {e}")
 
-    def transfer_run(self):
+    def get_copy_locations(self, copy_type):
+        """
+        Source, destination and copy log file for a copy type, for example:
+
+        robocopy Z:\\merfish_raw_data\\202310261058_VZGEN1_VMSC10202 L:\\202310261058_VZGEN1_VMSC10202\\raw_data
+        robocopy Z:\\merfish_analysis\\202310261058_VZGEN1_VMSC10202 L:\\202310261058_VZGEN1_VMSC10202\\analysis
+        robocopy Z:\\merfish_output\\202310261058_VZGEN1_VMSC10202 L:\\202310261058_VZGEN1_VMSC10202\\output
+        """
+        copy_locations = {
+            "raw_data": (
+                self.analysis_drive_raw_data,
+                self.isilon_drive_raw_data,
+                self.isilon_drive_raw_data_log,
+            ),
+            "analysis": (
+                self.analysis_drive_analysis,
+                self.isilon_drive_analysis,
+                self.isilon_drive_analysis_log,
+            ),
+            "output": (
+                self.analysis_drive_output,
+                self.isilon_drive_output,
+                self.isilon_drive_output_log,
+            ),
+        }
+        return copy_locations.get(copy_type)
+
+    def get_log_file_status(self, copy_type, log_file):
+        # log files already checked at the end of the copy type transfer
+        if copy_type in self.store_log_file_status:
+            return self.store_log_file_status[copy_type]
+        return self.check_log_file(log_file, copy_type)
+
+    def transfer_copy_type(self, copy_type):
+        """
+        Copy a single copy type from the analysis drive to the isilon drive, get the counts after transfer and check the copy log file.
+        """
+        locations = self.get_copy_locations(copy_type)
+        if locations is None:
+            logging.warning(f"Unknown copy type: {copy_type}")
+            return
+
+        # copy type already transferred and checked by a previous invocation
+        if self.restore_checkpoint("transfer", copy_type):
+            self.restore_checkpoint("copy", copy_type)
+            return
+        source, destination, log_file = locations
+        policy = self.get_copy_policy(copy_type)
 
-        # get counts before transfer and log that information
-        self.get_counts_python(state="before")
+        if not self.restore_checkpoint("copy", copy_type):
+            if policy["after_counts"] == "rsync_log":
+                self.record_destination_state(copy_type, destination, log_file)
+
+            logging.info(f"Copying {copy_type} from {source} to {destination}")
+            with self.metrics.stage("copy", copy_type):
+                self.copy_data(copy_type, source, destination, log_file)
+            self.save_checkpoint("copy", copy_type)
+
+        if policy["after_counts"] == "rsync_log":
+            with self.metrics.stage("after_rsync_log", copy_type):
+                self.get_counts_from_rsync_log(copy_type, log_file)
+        elif not self.single_scan:
+            self.get_counts_python(state="after", copy_types=[copy_type])
 
         if self.os_name == "windows":
-            self.get_counts_robocopy(state="before")
-            self.check_robocopy_list_logs(state="before")
+            self.get_counts_robocopy(state="after", copy_types=[copy_type])
+            self.check_robocopy_list_logs(state="after", copy_types=[copy_type])
+            if self.single_scan:
+                self.get_counts_robocopy_manifest(state="after", copy_types=[copy_type])
+
+        with self.metrics.stage("manifest_diff", copy_type):
+            self.get_manifest_diff(copy_types=[copy_type])
+
+        if policy["checksum"]:
+            with self.metrics.stage("checksum", copy_type):
+                self.verify_checksums(copy_type)
+
+        if policy["tree_digest"]:
+            with self.metrics.stage("tree_digest", copy_type):
+                self.get_tree_digest_diff(copy_type)
+
+        with self.metrics.stage("log_check", copy_type):
+            self.store_log_file_status[copy_type] = self.check_log_file(
+                log_file, copy_type
+            )
+        self.save_checkpoint("transfer", copy_type)
+
+    def transfer_copy_types(self):
+        """
+        Run transfer_copy_type for each copy type, using at most --parallel_copy_types concurrent transfers. The copy types live in separate source and destination folders, so they do not interfere with each other.
+        """
+        if self.parallel_copy_types <= 1 or len(self.copy_type) == 1:
+            for copy_type in self.copy_type:
+                self.transfer_copy_type(copy_type)
+            return
+
+        logging.info(
+            f"Transferring copy types {', '.join(self.copy_type)} using at most {self.parallel_copy_types} concurrent transfers"
+        )
+        with ThreadPoolExecutor(
+            max_workers=self.parallel_copy_types,
+            thread_name_prefix="copy_type",
+        ) as executor:
+            futures = {
+                executor.submit(self.transfer_copy_type, copy_type): copy_type
+                for copy_type in self.copy_type
+            }
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    logging.info(f"Finished transfer of {futures[future]}")
+            except Exception:
+                # do not start the copy types that are still waiting
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def get_incremental_file(self, copy_type, name):
+        """
+        Location of the scans, the file list and the copy log of the incremental mode for a copy type in the central logs folder.
+        """
+        return os.path.join(self.log_dir, f"{self.run_id}.{copy_type}.incremental.{name}")
+
+    def incremental_pass(self, copy_type):
+        """
+        One pass of the incremental mode for a copy type: scan the source, copy the files with the same size and modification time as in the previous scan that were not copied yet, and keep the scan for the next pass. Returns True when the source has changed since the previous scan.
+        """
+        source, destination, _ = self.get_copy_locations(copy_type)
+        if not os.path.exists(source):
+            logging.info(
+                f"Incremental {copy_type} - Source folder not found yet: {source}"
+            )
+            return True
+
+        current_manifest = self.get_incremental_file(copy_type, "scan.tsv.gz")
+        previous_manifest = self.get_incremental_file(copy_type, "previous_scan.tsv.gz")
+        synced_manifest = self.get_incremental_file(copy_type, "synced.tsv.gz")
+        with ManifestWriter(current_manifest) as manifest:
+            scan_tree(
+                source,
+                scanner=self.scanner,
+                workers=self.scan_threads,
+                on_file=manifest.add_file,
+                on_dir=manifest.add_dir,
+                long_path=self.win_long_path,
+            )
+        if not os.path.exists(previous_manifest):
+            os.replace(current_manifest, previous_manifest)
+            logging.info(
+                f"Incremental {copy_type} - First scan recorded, files are copied once they are unchanged in the next scan"
+            )
+            return True
+
+        # files stable since the previous scan and not copied yet
+        stats = dict()
+        pending_manifest = self.get_incremental_file(copy_type, "pending.tsv.gz")
+        files_from = self.get_incremental_file(copy_type, "files.txt")
+        total_size_bytes = 0
+        with ManifestWriter(pending_manifest) as pending, open(
+            files_from, "w", encoding="utf-8", newline="\n"
+        ) as f:
+            for entry in stable_files(
+                previous_manifest,
+                current_manifest,
+                synced_manifest if os.path.exists(synced_manifest) else None,
+                stats=stats,
+            ):
+                pending.add(entry.path, entry.type, entry.size, entry.mtime)
+                f.write(f"{entry.path}\n")
+                total_size_bytes += entry.size
+        total_files = stats["stable"] - stats["synced"]
+        logging.info(
+            f"Incremental {copy_type} - Files: {stats['files']}, Stable files: {stats['stable']}, Already copied: {stats['synced']}, Changed since the previous scan: {stats['changed']}, Files to copy: {total_files}, Size to copy (bytes): {total_size_bytes}"
+        )
+
+        failed = set()
+        if total_files:
+            os.makedirs(destination, exist_ok=True)
+            log_file = self.get_incremental_file(copy_type, "log")
+            policy = self.get_copy_policy(copy_type)
+            if policy["backend"] == "rsync":
+                cmd = f"rsync {policy['tool_options']} --files-from={files_from} --log-file={log_file} {source}/ {destination}"
+                logging.info(f"Command: {cmd}")
+                result = run_command(
+                    cmd, check=False, prefix=f"[{copy_type} incremental] "
+                )
+                if result.returncode != 0:
+                    # nothing is recorded as copied, the files are copied again
+                    # by the next pass or by the final transfer
+                    logging.warning(
+                        f"Incremental {copy_type} - rsync exit code '{result.returncode}', the files of this pass are left to the next pass. STDERR: {result.stderr}"
+                    )
+                    failed = None
+            else:
+                # robocopy cannot be given a list of files, use the native copy
+                # engine for the incremental passes
+                def on_record(record):
+                    if record["status"] == "failed":
+                        logging.warning(
+                            f"Incremental {copy_type} - Failed to copy {record['path']}: {record['error']}"
+                        )
+                        failed.add(record["path"])
+
+                controller = self.get_copy_controller(copy_type, source)
+                totals = native_copy.copy_tree(
+                    source,
+                    destination,
+                    (
+                        path
+                        for path, size in order_entries(
+                            (
+                                (entry.path, entry.size)
+                                for entry in read_manifest(pending_manifest)
+                            ),
+                            policy["order"],
+                        )
+                    ),
+                    workers=1 if controller else int(policy["threads"]),
+                    buffer_size=policy["buffer_size"],
+                    on_record=on_record,
+                    long_path=self.win_long_path,
+                    controller=controller,
+                )
+                logging.info(
+                    f"Incremental {copy_type} - Native copy - Files copied: {totals['copied']}, Files skipped: {totals['skipped']}, Files failed: {totals['failed']}, Bytes copied: {totals['size_bytes']}"
+                )
+
+        # record the files copied, so the next passes skip them
+        if total_files and failed is not None:
+            copied_manifest = self.get_incremental_file(copy_type, "copied.tsv.gz")
+            write_manifest(
+                copied_manifest,
+                (
+                    entry
+                    for entry in read_manifest(pending_manifest)
+                    if entry.path not in failed
+                ),
+            )
+            if os.path.exists(synced_manifest):
+                merge_manifests(synced_manifest, copied_manifest, synced_manifest)
+                os.remove(copied_manifest)
+            else:
+                os.replace(copied_manifest, synced_manifest)
+        os.replace(current_manifest, previous_manifest)
+        return stats["changed"] > 0
+
+    def incremental_sync(self):
+        """
+        Incremental mode: run a pass of incremental_pass for every copy type every --incremental_interval seconds, until a pass finds no change in the source of any copy type. The run is then complete and most files are already copied, so the transfer that follows is short.
+        """
+        if any(
+            self.get_copy_policy(copy_type)["backend"] == "robocopy"
+            for copy_type in self.copy_type
+            if copy_type in self.store_copy_policies
+        ):
+            logging.info(
+                "Incremental mode uses the native copy engine for the incremental passes, robocopy is used for the final transfer"
+            )
+        n = 0
+        while True:
+            n += 1
+            logging.info(f"Incremental pass {n} for run: {self.run_id}")
+            changed = list()
+            for copy_type in self.copy_type:
+                with self.metrics.stage("incremental_pass", copy_type):
+                    if self.incremental_pass(copy_type):
+                        changed.append(copy_type)
+            if not changed:
+                logging.info(
+                    f"Incremental mode - No change since the previous scan for run: {self.run_id}, starting the final transfer"
+                )
+                return
+            logging.info(
+                f"Incremental mode - Source still changing for {', '.join(changed)}, next pass in {self.incremental_interval} seconds"
+            )
+            time.sleep(self.incremental_interval)
+
+    def prepare_transfer(self):
+        """
+        Get the counts before transfer and create the run folders on the isilon drive.
+        """
+        # get counts before transfer and log that information, except for the
+        # copy types counted by a previous invocation of the same run. In
+        # single scan mode the source is only enumerated once, by the robocopy
+        # list
+        copy_types = [
+            copy_type
+            for copy_type in self.copy_type
+            if not self.restore_checkpoint("before_counts", copy_type)
+        ]
+        if copy_types and self.single_scan:
+            self.get_counts_robocopy(state="before", copy_types=copy_types)
+            self.check_robocopy_list_logs(state="before", copy_types=copy_types)
+            self.get_counts_robocopy_manifest(state="before", copy_types=copy_types)
+        elif copy_types:
+            self.get_counts_python(state="before", copy_types=copy_types)
+
+            if self.os_name == "windows":
+                self.get_counts_robocopy(state="before", copy_types=copy_types)
+                self.check_robocopy_list_logs(state="before", copy_types=copy_types)
+        for copy_type in copy_types:
+            self.save_checkpoint("before_counts", copy_type)
 
         # check if run folders exist and raise error if not
         if not os.path.exists(self.isilon_drive_raw_data):
@@ -929,47 +2531,13 @@ class VizgenDataTransfer:
             logging.info(f"Creating output folder for run: {self.isilon_drive_output}")
             os.makedirs(self.isilon_drive_output)
 
-        # copy raw_data
-        if "raw_data" in self.copy_type:
-            logging.info(
-                f"Copying raw_data from {self.analysis_drive_raw_data} to {self.isilon_drive_raw_data}"
-            )
-            # copy raw_data from analysis drive to isilon drive
-            # robocopy Z:\merfish_raw_data\202310261058_VZGEN1_VMSC10202 F:202310261058_VZGEN1_VMSC10202\raw_data /E /MT:8
-            self.copy_data(
-                "raw_data",
-                self.analysis_drive_raw_data,
-                self.isilon_drive_raw_data,
-                self.isilon_drive_raw_data_log,
-            )
-
-        # copy analysis
-        if "analysis" in self.copy_type:
-            logging.info(
-                f"Copying analysis from {self.analysis_drive_analysis} to {self.isilon_drive_analysis}"
-            )
-            # copy analysis from analysis drive to isilon drive
-            # robocopy Z:\merfish_analysis\202310261058_VZGEN1_VMSC10202 F:202310261058_VZGEN1_VMSC10202\analysis /E /MT:8
-            self.copy_data(
-                "analysis",
-                self.analysis_drive_analysis,
-                self.isilon_drive_analysis,
-                self.isilon_drive_analysis_log,
-            )
-
-        # copy output
-        if "output" in self.copy_type:
-            logging.info(
-                f"Copying output from {self.analysis_drive_output} to {self.isilon_drive_output}"
-            )
-            # copy output from analysis drive to isilon drive
-            # robocopy Z:\merfish_output\202310261058_VZGEN1_VMSC10202 F:202310261058_VZGEN1_VMSC10202\output /E /MT:8
-            self.copy_data(
-                "output",
-                self.analysis_drive_output,
-                self.isilon_drive_output,
-                self.isilon_drive_output_log,
-            )
+    def finish_transfer(self):
+        """
+        Check the run folders on the isilon drive once all copy types are transferred, and send the summary email.
+        """
+        if self.store_checksum_info:
+            with self.metrics.stage("write_checksums"):
+                self.write_checksums()
 
         # check if output folders exist and raise error if not
         if not os.path.exists(self.isilon_drive_raw_data):
@@ -985,13 +2553,17 @@ class VizgenDataTransfer:
                 f"Error: Analysis output folder not found for run: {self.isilon_drive_output}. Looks like copy failed. Simply restart the command to resume copy from where it left off."
             )
 
-        self.get_counts_python(state="after")
+        self.create_email_content()
+        self.record_history(self.write_metrics())
 
-        if self.os_name == "windows":
-            self.get_counts_robocopy(state="after")
-            self.check_robocopy_list_logs(state="after")
+    def transfer_run(self):
+        self.prepare_transfer()
 
-        self.create_email_content()
+        # copy, count and check the logs for each copy type. With the option
+        # --parallel_copy_types the copy types are processed concurrently
+        self.transfer_copy_types()
+
+        self.finish_transfer()
 
         # output folder - F:
         # output structure
@@ -1004,8 +2576,23 @@ class VizgenDataTransfer:
 
     def run(self):
         logging.info(f"Processing run: {self.run_id}")
-        self.check_run_folders()
-        self.transfer_run()
+        self.start_profile()
+        try:
+            # copy the run while it is still being written, the state file and
+            # the counts below are then taken from the complete run
+            if self.incremental:
+                self.incremental_sync()
+            with self.metrics.stage("check_run_folders"):
+                self.check_run_folders()
+            self.load_run_state()
+            self.transfer_run()
+        except Exception:
+            # keep the timings of the stages done for a failed transfer
+            self.write_metrics(status="failed")
+            raise
+        finally:
+            self.stop_profile()
+        self.run_state.complete()
         logging.info("Command executed: " + executed_command)
         logging.info("Analysis complete")
 
@@ -1016,7 +2603,10 @@ class HelpFormatter(
     pass
 
 
-def main():
+def get_parser(batch=False, watch=False):
+    """
+    Command line options of the data transfer. With batch=True, the single run_id is replaced by the options of the batch mode (vizgen_data_transfer_batch), and with watch=True by the options of the watch mode (vizgen_data_transfer_watch). All other options apply to every run transferred.
+    """
     parser = argparse.ArgumentParser(
         prog=script,
         formatter_class=HelpFormatter,
@@ -1025,10 +2615,66 @@ def main():
         """,
         epilog=f"Contact: {__author__} ({__email__})",
     )
-    parser.add_argument(
-        "run_id",
-        help="Provide run name, for example: 202310261058_VZGEN1_VMSC10202",
-    )
+    if watch:
+        parser.add_argument(
+            "--run_glob",
+            default="*",
+            help="Only watch the run folders matching this pattern, for example: '2023*'",
+        )
+        parser.add_argument(
+            "--poll_interval",
+            type=float,
+            default=300,
+            help="Interval in seconds between two scans of the run folders on the analysis drive",
+        )
+        parser.add_argument(
+            "--quiet_period",
+            type=float,
+            default=3600,
+            help="A new or changed run is transferred once its folders have not changed for this number of seconds",
+        )
+        parser.add_argument(
+            "--watch_depth",
+            type=int,
+            default=2,
+            help="Number of folder levels of a run compared between two scans to detect changes (names, sizes and modification times)",
+        )
+        parser.add_argument(
+            "--watch_state",
+            help="State file of the watch mode [default: 'vizgen_data_transfer_watch.json' in the logs folder]",
+        )
+        parser.add_argument(
+            "--watch_existing",
+            action="store_true",
+            help="Also transfer the runs already on the analysis drive when the watch starts without a state file. By default, they are only transferred if they change [default:%(default)s]",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Scan the run folders once, transfer the runs that are ready and exit, for example to run the watch mode from a scheduled task [default:%(default)s]",
+        )
+    elif batch:
+        parser.add_argument(
+            "run_ids",
+            nargs="*",
+            help="Provide run names, for example: 202310261058_VZGEN1_VMSC10202 202310271104_VZGEN1_VMSC10203",
+        )
+        parser.add_argument(
+            "--run_glob",
+            help="Also transfer the runs in 'merfish_raw_data' on the analysis drive matching this pattern, for example: '202310*'",
+        )
+    else:
+        parser.add_argument(
+            "run_id",
+            help="Provide run name, for example: 202310261058_VZGEN1_VMSC10202",
+        )
+    if batch or watch:
+        parser.add_argument(
+            "--max_transfers",
+            type=int,
+            default=2,
+            help="Maximum number of jobs (before transfer counts of a run, or transfer of a copy type of a run) running at the same time across all runs of the batch",
+        )
     # whether to copy raw_data, analysis, output or all
     parser.add_argument(
         "--copy_type",
@@ -1039,8 +2685,119 @@ def main():
     # add threads option
     parser.add_argument(
         "--threads",
+        help=f"Number of threads to use for copying. With the native copy engine, 'auto' starts with a few threads and changes their number every --adaptive_interval seconds from the throughput and the failed copies, up to --max_threads, logging every decision. When given, it replaces the threads of the copy type policies [default:{copy_option_defaults['threads']}]",
+    )
+    parser.add_argument(
+        "--max_threads",
+        type=int,
+        default=16,
+        help="Maximum number of copy threads used with --threads auto",
+    )
+    parser.add_argument(
+        "--adaptive_interval",
+        type=float,
+        default=30,
+        help="Seconds between two changes of the number of copy threads with --threads auto",
+    )
+    # scanner used for the python based counts
+    parser.add_argument(
+        "--scanner",
+        default="walk",
+        choices=sorted(scanners),
+        help="Scanner used for the python based counts. 'walk' uses os.walk with one extra stat call per file, 'scandir' reuses the os.scandir stat information and scans folders in parallel using --scan_threads threads",
+    )
+    parser.add_argument(
+        "--scan_threads",
+        type=int,
+        default=8,
+        help="Number of threads used by the 'scandir' scanner to scan folders in parallel",
+    )
+    parser.add_argument(
+        "--parallel_copy_types",
+        type=int,
         default=1,
-        help="Number of threads to use for copying",
+        help="Maximum number of copy types (raw_data, analysis, output) to copy, count and check concurrently. The default copies them one after the other",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["auto", "rsync", "robocopy", "native"],
+        help=f"Copy backend. 'auto' uses rsync on Linux and robocopy on Windows. 'native' uses the built-in Python copy engine with --threads worker threads, which copies files kernel side on Linux, preserves modification times, writes to temporary names that are renamed once complete and logs every file. When given, it replaces the backend of the copy type policies [default:{copy_option_defaults['backend']}]",
+    )
+    parser.add_argument(
+        "--progress_interval",
+        type=float,
+        default=60,
+        help="Interval in seconds between live progress reports during the copy (files and bytes done, MB/s and ETA against the before transfer counts), written to the log and to '<run_id>.<copy_type>.progress.json' in the logs folder. Available for rsync and the native copy engine. Use 0 to disable",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="Verify the content of every file after the copy by comparing the checksums of the source and destination files. Mismatches are reported in the email and the source checksums are written to '<run_id>/CHECKSUMS' next to the transferred data [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--checksum_workers",
+        type=int,
+        default=4,
+        help="Number of files hashed in parallel for --checksum [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--checksum_algorithm",
+        default=default_algorithm,
+        choices=checksum_algorithms,
+        help="Hash algorithm used for --checksum [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--checksum_executor",
+        default="thread",
+        choices=sorted(executors),
+        help="Hash files in worker threads or worker processes for --checksum [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--hash_cache",
+        action="store_true",
+        help="Keep the checksums computed by --checksum in '<run_id>.hash_cache.sqlite' in the logs folder, keyed by file size, modification time and inode, so that a resumed transfer of the same run only hashes the files that changed [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--tree_digest",
+        action="store_true",
+        help="Compute a digest of every folder from the before and after transfer manifests (file names, sizes and modification times, and the file checksums with --checksum and --hash_cache) and compare them top-down, to list the folders, e.g. a single FOV, that differ after the transfer [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Ignore the state file of a previous invocation for this run and start the transfer from the beginning. By default, the stages completed by a previous invocation (before transfer counts, copy, after transfer counts and checks) are skipped, unless the source folders have changed [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Copy a run while it is still being written. The source is scanned every --incremental_interval seconds and the files with the same size and modification time in two consecutive scans are copied, until a scan finds no change. The transfer and checks then run as usual and only copy what changed during the last interval. Not used by the batch and watch modes [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--incremental_interval",
+        type=float,
+        default=900,
+        help="Interval in seconds between two scans of the incremental mode. It should be longer than the pauses between the steps writing the run [default:%(default)s]",
+    )
+    parser.add_argument(
+        "--single_scan",
+        action="store_true",
+        help="Windows only. Build the manifests and the python based counts from the robocopy list logs instead of scanning the same locations again with python, so each location is only enumerated once before and once after the transfer",
+    )
+    parser.add_argument(
+        "--after_counts",
+        default="scan",
+        choices=["scan", "rsync_log"],
+        help="How the python based after transfer counts are obtained. 'scan' walks the destination after the copy. 'rsync_log' (rsync only) derives them from the destination state before the copy and the files rsync logged during the copy, avoiding a second full walk of the destination",
+    )
+    parser.add_argument(
+        "--rsync_shards",
+        type=int,
+        help=f"Number of parallel rsync workers per copy type (Linux only). The files are split into shards balanced by size and file count, and the shard logs are merged into the copy type log file. When given, it replaces the rsync shards of the copy type policies [default:{copy_option_defaults['rsync_shards']}]",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Enable this option to resume a failed or incomplete transfer. The source manifest is compared with the files already in the destination and only the missing or size mismatched files are copied (rsync and the native copy engine, robocopy skips existing files by itself) [default:%(default)s]",
     )
     # add choices for python and robocopy, whether to ignore folder, files, bytes or gigabytes count during the check before and after transfer so that users can ignore the count check if they want to, for example, if there is a difference in how size is calculated between os.walk and robocopy which can lead to differences in size_bytes count but files, folders and size_gbytes count are the same between before and after transfer, then users can choose to ignore the bytes count check and only check files, folders and size_gbytes count
     parser.add_argument(
@@ -1067,6 +2824,11 @@ def main():
             "Example: '--ignore_robocopy_counts raw_data:files analysis:all all:bytes' to ignore robocopy based count mismatch check for 'files' metric for 'raw_data' copy type, all metrics for 'analysis' copy type and 'bytes' metric for all copy types."
         ),
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the CPU time with cProfile and the memory with tracemalloc for every stage of the transfer. One pstats file per stage, 'memory.json' with the memory in use and the peak memory of each stage and 'summary.txt' with the hot spots are written to '<run_id>.profile' in the logs folder. The transfer is slower with this option [default:%(default)s]",
+    )
     parser.add_argument(
         "--disk",
         action="store_true",
@@ -1082,16 +2844,21 @@ def main():
         action="store_true",
         help="Enable this option for debugging [default:%(default)s]",
     )
-    args = parser.parse_args()
+    return parser
 
+
+def init_master_log(vizgen_config):
+    """
+    Load the config file and add the master log file in the logs folder to the logger. Returns the config and the operating system.
+    """
     # raise error if config file not found
     try:
-        assert os.path.exists(args.vizgen_config)
+        assert os.path.exists(vizgen_config)
     except AssertionError:
-        logging.error(f"Error: Vizgen config file not found: {args.vizgen_config}")
+        logging.error(f"Error: Vizgen config file not found: {vizgen_config}")
         sys.exit(1)
 
-    with open(args.vizgen_config, "rb") as f:
+    with open(vizgen_config, "rb") as f:
         config = tomllib.load(f)
 
     os_name = get_operating_system()
@@ -1104,6 +2871,12 @@ def main():
         format_logger(log_file)
     else:
         raise ValueError("Operating System: Unknown or not currenly supported")
+    return config, os_name
+
+
+def main():
+    args = get_parser().parse_args()
+    config, os_name = init_master_log(args.vizgen_config)
 
     logging.info("######################################")
     logging.info("### VIZGEN DATA TRANSFER INITIATED ###")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive number of copy threads for the native copy engine (--threads auto)
+
+The copy starts with a low number of workers. At the end of every interval the files/s, MB/s, failed copies and retries of the interval are measured and the number of workers is changed:
+
+    ramp up     the workers are doubled as long as the throughput improves by more than the tolerance
+    settle      once it stops improving, the best level seen is kept
+    probe       a settled copy tries one more and one less worker in turn every few intervals, and one less when the throughput drops. One more worker is kept if the throughput improves, one less if it does not drop
+    back off    when the failed copies and retries go above the maximum error rate, the workers are halved and the level that failed is not tried again
+
+The level found depends on the source (analysis drive or external disk) and the files of the copy type, and every decision is logged.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import time
+import logging
+
+default_start_workers = 2
+
+default_max_workers = 16
+
+# seconds between two decisions
+default_interval = 30
+
+# relative change of throughput considered as a real change
+default_tolerance = 0.1
+
+# failed copies and retries per file above which the workers are halved
+default_max_error_rate = 0.01
+
+# settled intervals between two probes of one more or one less worker
+default_probe_intervals = 5
+
+# number of times a failed file is copied again
+default_retries = 2
+
+
+def better(a, b, tolerance=default_tolerance):
+    """
+    True when measurement 'a' has a higher throughput than 'b': files/s or MB/s higher by more than 'tolerance', without the other one dropping by more than 'tolerance'.
+    """
+    if b is None:
+        return True
+    return (
+        a["mb_per_second"] > b["mb_per_second"] * (1 + tolerance)
+        and a["files_per_second"] >= b["files_per_second"] * (1 - tolerance)
+    ) or (
+        a["files_per_second"] > b["files_per_second"] * (1 + tolerance)
+        and a["mb_per_second"] >= b["mb_per_second"] * (1 - tolerance)
+    )
+
+
+class AdaptiveConcurrency:
+    """
+    Number of workers of a copy, changed by update() at the end of every interval from the files recorded with record(). 'workers' is read by the copy to limit the number of files copied at the same time.
+    """
+
+    def __init__(
+        self,
+        name,
+        start=default_start_workers,
+        min_workers=1,
+        max_workers=default_max_workers,
+        interval=default_interval,
+        tolerance=default_tolerance,
+        max_error_rate=default_max_error_rate,
+        probe_intervals=default_probe_intervals,
+        retries=default_retries,
+    ):
+        self.name = name
+        self.min_workers = max(1, int(min_workers))
+        self.max_workers = max(self.min_workers, int(max_workers))
+        self.workers = min(max(int(start), self.min_workers), self.max_workers)
+        self.start_workers = self.workers
+        self.interval = float(interval)
+        self.tolerance = tolerance
+        self.max_error_rate = max_error_rate
+        self.probe_intervals = probe_intervals
+        self.retries = retries
+        # highest level without too many errors
+        self.cap = self.max_workers
+        self.phase = "ramp"
+        self.previous = None
+        self.settled_intervals = 0
+        self.probes = 0
+        # last measurement of each level
+        self.levels = dict()
+        self.decisions = list()
+        self.intervals = 0
+        self.reset(time.perf_counter())
+
+    def reset(self, now):
+        self.interval_start = now
+        self.files = 0
+        self.size_bytes = 0
+        self.failed = 0
+        self.retried = 0
+
+    def record(self, size=0, failed=False, retried=False):
+        """
+        Record a file copied (or skipped), failed or retried.
+        """
+        if retried:
+            self.retried += 1
+        elif failed:
+            self.failed += 1
+        else:
+            self.files += 1
+            self.size_bytes += size
+
+    def time_left(self, now=None):
+        now = time.perf_counter() if now is None else now
+        # at least a second, the interval may be over with no file finished
+        return max(1.0, self.interval - (now - self.interval_start))
+
+    def update(self, now=None):
+        """
+        Change the number of workers if the interval is over. Returns True when a decision was made.
+        """
+        now = time.perf_counter() if now is None else now
+        seconds = now - self.interval_start
+        if seconds < self.interval:
+            return False
+        if not self.files and not self.failed and not self.retried:
+            # no file finished, e.g. a few very large files, keep measuring
+            return False
+        measurement = {
+            "workers": self.workers,
+            "seconds": round(seconds, 3),
+            "files": self.files,
+            "files_per_second": round(self.files / seconds, 3),
+            "mb_per_second": round(self.size_bytes / (1024 * 1024) / seconds, 3),
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+        self.reset(now)
+        self.intervals += 1
+        workers, reason = self.decide(measurement)
+        self.decisions.append(
+            dict(
+                measurement, interval=self.intervals, new_workers=workers, reason=reason
+            )
+        )
+        change = (
+            f"Workers {measurement['workers']} -> {workers}"
+            if workers != measurement["workers"]
+            else f"Keeping {workers} worker(s)"
+        )
+        logging.info(
+            f"Adaptive threads for {self.name} - interval {self.intervals}: {measurement['mb_per_second']} MB/s, {measurement['files_per_second']} files/s, {measurement['failed']} failed, {measurement['retried']} retried with {measurement['workers']} worker(s). {change}: {reason}"
+        )
+        self.workers = workers
+        return True
+
+    def decide(self, measurement):
+        workers = measurement["workers"]
+        errors = measurement["failed"] + measurement["retried"]
+        attempts = measurement["files"] + errors
+        error_rate = errors / attempts if attempts else 0
+        if error_rate > self.max_error_rate:
+            self.cap = max(self.min_workers, workers - 1)
+            return self.settle(
+                max(self.min_workers, min(workers // 2, self.cap)),
+                f"error rate {error_rate:.3f} above {self.max_error_rate}, backing off and not using more than {self.cap} worker(s)",
+            )
+
+        # measurements of the level before the last change and of this level
+        previous = self.levels.get(self.previous)
+        last = self.levels.get(workers)
+        self.levels[workers] = measurement
+
+        if self.phase == "ramp":
+            if not better(measurement, previous, self.tolerance):
+                return self.settle(
+                    self.previous_level(workers),
+                    "no improvement over fewer workers, settling on the best level",
+                )
+            if workers >= self.cap:
+                return self.settle(
+                    workers, f"throughput improved, at the maximum of {self.cap}"
+                )
+            self.previous = workers
+            return min(workers * 2, self.cap), "throughput improved, ramping up"
+
+        if self.phase == "probe":
+            level = previous["workers"]
+            if workers > level:
+                if better(measurement, previous, self.tolerance):
+                    return self.settle(
+                        workers, "one more worker improved the throughput, keeping it"
+                    )
+                return self.settle(
+                    level, "one more worker did not improve the throughput, going back"
+                )
+            if better(previous, measurement, self.tolerance):
+                return self.settle(level, "one less worker was slower, going back")
+            return self.settle(workers, "one less worker was as fast, keeping it")
+
+        # settled: probe one less worker when the throughput of the level
+        # dropped, and one more worker from time to time
+        self.settled_intervals += 1
+        if (
+            last is not None
+            and workers > self.min_workers
+            and better(last, measurement, self.tolerance)
+        ):
+            self.phase = "probe"
+            self.previous = workers
+            return workers - 1, "throughput dropped, probing one less worker"
+        if self.settled_intervals >= self.probe_intervals:
+            # probe up and down in turn, so the level settles on the fewest
+            # workers giving the best throughput
+            self.probes += 1
+            if workers > self.min_workers and (
+                self.probes % 2 == 0 or workers >= self.cap
+            ):
+                self.phase = "probe"
+                self.previous = workers
+                return workers - 1, "probing one less worker"
+            if workers < self.cap:
+                self.phase = "probe"
+                self.previous = workers
+                return workers + 1, "probing one more worker"
+        return workers, "stable"
+
+    def settle(self, workers, reason):
+        self.phase = "settled"
+        self.settled_intervals = 0
+        self.previous = workers
+        return workers, reason
+
+    def previous_level(self, workers):
+        # best measured level below 'workers'
+        lower = [level for level in self.levels if level < workers]
+        if not lower:
+            return workers
+        best = max(lower)
+        for level in sorted(lower):
+            if better(self.levels[level], self.levels[best], self.tolerance):
+                best = level
+        return best
+
+    def summary(self):
+        return {
+            "start_workers": self.start_workers,
+            "final_workers": self.workers,
+            "max_workers": self.max_workers,
+            "cap": self.cap,
+            "intervals": self.intervals,
+            "decisions": self.decisions,
+        }
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch mode: transfer many runs with a shared pool of workers and send one report
+
+For each run, the before transfer counts and then the transfer of each copy type are scheduled as jobs on a single pool, so at most --max_transfers jobs run at the same time across all runs. The emails of the runs are collected and sent as one consolidated report at the end.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import glob
+import time
+import logging
+import argparse
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from vizgen_data_transfer.__main__ import (
+    VizgenDataTransfer,
+    get_analysis_drive,
+    get_parser,
+    init_master_log,
+    send_email,
+    executed_command,
+)
+
+
+def get_run_ids(args, config, os_name):
+    """
+    Run ids given on the command line, followed by the run folders in 'merfish_raw_data' on the analysis drive matching --run_glob, without duplicates.
+    """
+    run_ids = list(args.run_ids)
+    if args.run_glob:
+        analysis_drive = get_analysis_drive(
+            config, os_name, disk=args.disk, debug=args.debug
+        )
+        pattern = os.path.join(analysis_drive, "merfish_raw_data", args.run_glob)
+        run_ids.extend(
+            os.path.basename(path)
+            for path in sorted(glob.glob(pattern))
+            if os.path.isdir(path)
+        )
+    return list(dict.fromkeys(run_ids))
+
+
+class BatchTransfer:
+    """
+    Transfer a list of runs using one pool of at most 'max_transfers' workers.
+    """
+
+    def __init__(self, args, run_ids, config, os_name, copy_types=None):
+        self.args = args
+        self.run_ids = run_ids
+        # copy types of each run, instead of --copy_type for all runs
+        self.copy_types = copy_types or dict()
+        self.config = config
+        self.os_name = os_name
+        self.max_transfers = max(1, int(args.max_transfers))
+        self.transfers = dict()
+        self.store_run_status = dict()
+        self.store_run_errors = dict()
+        self.store_run_times = dict()
+
+    def prepare_run(self, run_id):
+        """
+        Create the transfer of a run, check its folders and get the before transfer counts.
+        """
+        logging.info(f"Batch: preparing run: {run_id}")
+        run_args = argparse.Namespace(**vars(self.args))
+        run_args.run_id = run_id
+        if run_id in self.copy_types:
+            run_args.copy_type = self.copy_types[run_id]
+        transfer = VizgenDataTransfer(run_args)
+        transfer.defer_emails = True
+        self.transfers[run_id] = transfer
+        # the stages of a run are spread over the threads of the batch, only
+        # the stages are profiled
+        transfer.start_profile(profile_run=False)
+        with transfer.metrics.stage("check_run_folders"):
+            transfer.check_run_folders()
+        transfer.load_run_state()
+        transfer.prepare_transfer()
+        return transfer
+
+    def finish_run(self, run_id):
+        transfer = self.transfers[run_id]
+        transfer.finish_transfer()
+        transfer.stop_profile()
+        transfer.run_state.complete()
+        self.store_run_status[run_id] = (
+            "failed" if self.has_failed_email(transfer) else "completed"
+        )
+        logging.info(f"Batch: run {run_id} {self.store_run_status[run_id]}")
+
+    @staticmethod
+    def has_failed_email(transfer):
+        return any("failed" in subject for subject, _ in transfer.deferred_emails)
+
+    def fail_run(self, run_id, error):
+        logging.error(f"Batch: run {run_id} failed: {error}")
+        if run_id in self.transfers and self.transfers[run_id].log_dir:
+            self.transfers[run_id].write_metrics(status="failed")
+            self.transfers[run_id].stop_profile()
+        self.store_run_status[run_id] = "failed"
+        self.store_run_errors.setdefault(run_id, list()).append(str(error))
+
+    def run(self):
+        if self.args.incremental:
+            logging.warning(
+                "Option --incremental is not used for batches, the runs are transferred once complete"
+            )
+        logging.info(
+            f"Batch: transferring {len(self.run_ids)} run(s) with at most {self.max_transfers} concurrent job(s): {', '.join(self.run_ids)}"
+        )
+        start = dict()
+        remaining = dict()
+        with ThreadPoolExecutor(
+            max_workers=self.max_transfers, thread_name_prefix="batch"
+        ) as executor:
+            jobs = dict()
+            for run_id in self.run_ids:
+                start[run_id] = time.perf_counter()
+                jobs[executor.submit(self.prepare_run, run_id)] = (run_id, None)
+
+            while jobs:
+                done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+                for future in done:
+                    run_id, copy_type = jobs.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.fail_run(run_id, e)
+                        remaining.pop(run_id, None)
+                        continue
+                    if run_id in self.store_run_status:
+                        # an earlier job of this run failed
+                        continue
+
+                    if copy_type is None:
+                        # before transfer counts done, queue the copy types
+                        remaining[run_id] = set(result.copy_type)
+                        for copy_type in result.copy_type:
+                            jobs[
+                                executor.submit(result.transfer_copy_type, copy_type)
+                            ] = (run_id, copy_type)
+                        continue
+
+                    remaining[run_id].discard(copy_type)
+                    if not remaining[run_id]:
+                        del remaining[run_id]
+                        try:
+                            self.finish_run(run_id)
+                        except Exception as e:
+                            self.fail_run(run_id, e)
+                        self.store_run_times[run_id] = (
+                            time.perf_counter() - start[run_id]
+                        )
+
+        self.send_report()
+
+    def send_report(self):
+        failed = [
+            run_id
+            for run_id in self.run_ids
+            if self.store_run_status.get(run_id) != "completed"
+        ]
+        status = "failed" if failed else "completed"
+        email_subject = f"Vizgen data transfer batch {status}: {len(self.run_ids) - len(failed)} of {len(self.run_ids)} run(s) completed"
+        email_content = f"Vizgen data transfer batch {status} for {len(self.run_ids)} run(s)\n\nRun status:\n"
+        for run_id in self.run_ids:
+            duration = self.store_run_times.get(run_id)
+            duration = f", {timedelta(seconds=round(duration))}" if duration else ""
+            email_content += f"\n - {run_id}: {self.store_run_status.get(run_id, 'failed')}{duration}"
+        for run_id in self.run_ids:
+            email_content += f"\n\n{'=' * 80}\nRun: {run_id}\n{'=' * 80}"
+            transfer = self.transfers.get(run_id)
+            emails = transfer.deferred_emails if transfer else list()
+            for subject, content in emails:
+                email_content += f"\n\n{subject}\n\n{content}"
+            for error in self.store_run_errors.get(run_id, list()):
+                # errors raised after an error email hold the same content
+                if not any(error == content for _, content in emails):
+                    email_content += f"\n\nERROR: {error}"
+        email_content += f"\n\nCommand executed:\n\n{executed_command}\n\n"
+        logging.info(email_subject)
+        send_email(
+            self.config,
+            email_subject,
+            email_content,
+            development=any([self.args.debug, self.os_name == "linux"]),
+        )
+        return failed
+
+
+def main():
+    args = get_parser(batch=True).parse_args()
+    config, os_name = init_master_log(args.vizgen_config)
+
+    logging.info("############################################")
+    logging.info("### VIZGEN DATA TRANSFER BATCH INITIATED ###")
+    logging.info("############################################")
+    logging.info(f"Operating System: {os_name.title()}")
+
+    run_ids = get_run_ids(args, config, os_name)
+    if not run_ids:
+        raise ValueError(
+            "No runs to transfer. Provide run names and/or a pattern with --run_glob"
+        )
+    BatchTransfer(args, run_ids, config, os_name).run()
+
+    logging.info("############################################")
+    logging.info("### VIZGEN DATA TRANSFER BATCH COMPLETED ###")
+    logging.info("############################################")
+
+
+if __name__ == "__main__":
+    main()
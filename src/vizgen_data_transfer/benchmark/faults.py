@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fault injection harness measuring the cost of resuming an interrupted transfer
+
+A complete VizgenDataTransfer.run() of a synthetic run is started in a child process, with a stub copier in place of rsync or robocopy and a local SMTP stub receiving the emails. The transfer is killed (os._exit, so nothing is cleaned up or saved) at one of these points:
+
+    mid_file            while the stub copier is writing a file of the copy type, once --fault_fraction of its files are copied
+    between_copy_types  once the copy type is transferred and checked, before the next copy type starts
+    after_scan          during the after transfer scan of the copy type, once the destination is listed but before the result is saved
+
+With the 'corrupt' action, a file already copied to the destination is also damaged before the kill, keeping its size and modification time. The same transfer is then run again, with --resume_options, and the time, the I/O of the process (/proc/self/io) and the files copied by the resumed transfer are compared with an uninterrupted transfer. The destination is compared with the source at the end, to show which resume options detect the damage.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import sys
+import glob
+import json
+import time
+import email
+import shlex
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+import socketserver
+import multiprocessing
+
+from vizgen_data_transfer import native_copy
+from vizgen_data_transfer.__main__ import VizgenDataTransfer, get_parser
+from vizgen_data_transfer.manifest import read_manifest
+from vizgen_data_transfer.benchmark.suite import (
+    SyntheticRun,
+    add_synthetic_run_options,
+    drop_caches,
+    get_spec,
+    logger,
+    run_id,
+)
+
+fault_points = ["mid_file", "between_copy_types", "after_scan"]
+
+fault_actions = ["kill", "corrupt"]
+
+# exit code of the killed transfer, as for SIGKILL
+kill_exit_code = 137
+
+# read/write size of the stub copier
+stub_buffer_size = 1024 * 1024
+
+
+def read_proc_io():
+    """
+    I/O counters of the current process from /proc/self/io (Linux): rchar and wchar (bytes read and written by system calls), read_bytes and write_bytes (bytes read from and written to storage). None when not available.
+    """
+    try:
+        with open("/proc/self/io") as f:
+            return {
+                key: int(value)
+                for key, value in (line.split(":") for line in f if ":" in line)
+            }
+    except OSError:
+        return None
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP session, enough for smtplib.SMTP.sendmail. The messages received are added to the 'messages' list of the server.
+    """
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 localhost SMTP stub")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = list()
+                for line in iter(self.rfile.readline, b""):
+                    if line in (b".\r\n", b".\n"):
+                        break
+                    data.append(line[1:] if line.startswith(b"..") else line)
+                message = email.message_from_bytes(b"".join(data))
+                with self.server.lock:
+                    self.server.messages.append(
+                        {"subject": message["Subject"], "time": time.time()}
+                    )
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """
+    SMTP server on a free local port, running in a background thread. Use 'address' as the smtp_server of the config file.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPStubHandler)
+        self.lock = threading.Lock()
+        self.messages = list()
+        self.address = f"127.0.0.1:{self.server_address[1]}"
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        self.server_close()
+
+
+class FaultInjectingTransfer(VizgenDataTransfer):
+    """
+    Data transfer with a stub copier, killed at the point of 'fault' (a dictionary with the point, action, copy_type and fraction), after calling on_kill().
+
+    The stub copier replaces the native copy engine. It copies the files one after the other, skipping the files already in the destination with the same size and modification time as rsync does, and writes them in place, so a killed copy leaves a partial file behind as robocopy /Z does.
+    """
+
+    def __init__(self, args, fault=None, on_kill=None):
+        super().__init__(args)
+        self.fault = fault
+        self.on_kill = on_kill
+        self.last_copied = None
+        self.stub_totals = {"copied_files": 0, "copied_bytes": 0, "skipped_files": 0}
+
+    def inject(self, point, copy_type):
+        if (
+            not self.fault
+            or self.fault["point"] != point
+            or self.fault["copy_type"] != copy_type
+        ):
+            return
+        if self.fault["action"] == "corrupt":
+            self.corrupt(copy_type)
+        logger.info(
+            f"Fault injected: killing the transfer at {point} of {copy_type}"
+        )
+        if self.on_kill:
+            self.on_kill()
+        os._exit(kill_exit_code)
+
+    def corrupt(self, copy_type):
+        """
+        Flip a byte in the middle of the last file copied to the destination, or the last file of the copy type, keeping its size and modification time.
+        """
+        path = self.last_copied
+        if not path:
+            destination = self.get_copy_locations(copy_type)[1]
+            for entry in read_manifest(self.store_manifest_files["before"][copy_type]):
+                if entry.type == "f" and entry.size:
+                    path = os.path.join(destination, *entry.path.split("/"))
+        if not path or not os.path.exists(path) or not os.path.getsize(path):
+            logger.warning(f"No file to corrupt in the destination of {copy_type}")
+            return
+        stat = os.stat(path)
+        with open(path, "r+b") as f:
+            f.seek(stat.st_size // 2)
+            byte = f.read(1)
+            f.seek(stat.st_size // 2)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        logger.info(f"Fault injected: corrupted {path}")
+
+    def copy_data_native(
+        self,
+        copy_type,
+        source,
+        destination,
+        log_file,
+        total_files=None,
+        total_size_bytes=None,
+    ):
+        entries = list(self.iter_transfer_entries(copy_type))
+        kill_at = None
+        if (
+            self.fault
+            and self.fault["point"] == "mid_file"
+            and self.fault["copy_type"] == copy_type
+        ):
+            kill_at = min(int(len(entries) * self.fault["fraction"]), len(entries) - 1)
+
+        for entry in read_manifest(self.store_manifest_files["before"][copy_type]):
+            if entry.type == "d":
+                os.makedirs(
+                    os.path.join(destination, *entry.path.split("/")), exist_ok=True
+                )
+
+        with open(log_file, "a", encoding="utf-8") as log:
+            log.write(
+                f"{time.strftime('%Y/%m/%d %H:%M:%S')} [{os.getpid()}] {native_copy.log_header}\n"
+            )
+            for n, (path, size) in enumerate(entries):
+                src = os.path.join(source, *path.split("/"))
+                dst = os.path.join(destination, *path.split("/"))
+                stat = os.stat(src)
+                try:
+                    dst_stat = os.stat(dst)
+                    if (
+                        dst_stat.st_size == stat.st_size
+                        and dst_stat.st_mtime_ns == stat.st_mtime_ns
+                    ):
+                        self.stub_totals["skipped_files"] += 1
+                        continue
+                except FileNotFoundError:
+                    pass
+                with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                    if n == kill_at:
+                        fdst.write(fsrc.read(stat.st_size // 2))
+                        fdst.flush()
+                        self.inject("mid_file", copy_type)
+                    shutil.copyfileobj(fsrc, fdst, stub_buffer_size)
+                os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                self.last_copied = dst
+                self.stub_totals["copied_files"] += 1
+                self.stub_totals["copied_bytes"] += stat.st_size
+                log.write(
+                    f"{time.strftime('%Y/%m/%d %H:%M:%S')} [{os.getpid()}] copied {stat.st_size} {path}\n"
+                )
+            log.write(
+                f"{time.strftime('%Y/%m/%d %H:%M:%S')} [{os.getpid()}] {native_copy.log_footer}\n"
+            )
+
+        msg = f"Successfully copied {copy_type} for run: {self.run_id} with the stub copier"
+        logging.info(msg)
+        self.store_copy_returns[copy_type] = msg
+
+    def get_counts_python(self, state="before", copy_types=None):
+        super().get_counts_python(state=state, copy_types=copy_types)
+        if state == "after":
+            for copy_type in copy_types or self.copy_type:
+                self.inject("after_scan", copy_type)
+
+    def save_checkpoint(self, stage, copy_type):
+        super().save_checkpoint(stage, copy_type)
+        if stage == "transfer":
+            self.inject("between_copy_types", copy_type)
+
+
+def run_transfer(options, fault, log_file, result_file):
+    """
+    Run a complete transfer in the current (child) process and write its status, time, I/O and stub copier totals to 'result_file'.
+    """
+    logging.basicConfig(
+        filename=log_file,
+        format="%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s",
+        datefmt="%d-%b-%y %H:%M:%S",
+        level=logging.INFO,
+        force=True,
+    )
+    io_start = read_proc_io()
+    start = time.perf_counter()
+    transfer = None
+
+    def write_result(status, error=None):
+        io_end = read_proc_io()
+        result = {
+            "status": status,
+            "error": error,
+            "seconds": round(time.perf_counter() - start, 3),
+            "io": (
+                {key: io_end[key] - io_start.get(key, 0) for key in io_end}
+                if io_start and io_end
+                else None
+            ),
+            "stub": transfer.stub_totals if transfer else None,
+        }
+        with open(result_file, "w") as f:
+            json.dump(result, f)
+
+    try:
+        args = get_parser().parse_args(options)
+        transfer = FaultInjectingTransfer(
+            args, fault, on_kill=lambda: write_result("killed")
+        )
+        transfer.run()
+        write_result(transfer.transfer_status or "complete")
+    except Exception as e:
+        logging.error(f"Transfer failed: {e}")
+        write_result("failed", str(e).splitlines()[0] if str(e) else repr(e))
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(stub_buffer_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FaultHarness(SyntheticRun):
+    """
+    Run the fault scenarios on the synthetic run: an uninterrupted transfer, then for each fault an interrupted transfer followed by its resume.
+    """
+
+    def __init__(self, args, root, smtp):
+        super().__init__(root, get_spec(args), args.seed, smtp_server=smtp.address)
+        self.args = args
+        self.smtp = smtp
+        self.drop_caches = args.drop_caches
+        self.transfer_options = shlex.split(args.transfer_options)
+        self.resume_options = shlex.split(args.resume_options)
+        self.run_logs = os.path.join(root, "fault_logs")
+
+    def clean(self):
+        """
+        Remove the copied run and its logs and state file, so the next transfer starts from nothing.
+        """
+        shutil.rmtree(os.path.join(self.isilon_drive, run_id), ignore_errors=True)
+        for path in glob.glob(os.path.join(self.log_dir, f"{run_id}.*")):
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    def transfer(self, name, options, fault=None):
+        """
+        Run a transfer in a child process and return its result, with the emails received while it ran.
+        """
+        if self.drop_caches and not drop_caches():
+            logger.warning("Unable to drop the page cache, running with a warm cache")
+            self.drop_caches = False
+        os.makedirs(self.run_logs, exist_ok=True)
+        log_file = os.path.join(self.run_logs, f"{name}.log")
+        result_file = os.path.join(self.run_logs, f"{name}.json")
+        if os.path.exists(result_file):
+            os.remove(result_file)
+        options = [
+            run_id,
+            "--vizgen_config",
+            self.config_file,
+            "--progress_interval",
+            "0",
+            "--backend",
+            "native",
+            *self.transfer_options,
+            *options,
+        ]
+        emails = len(self.smtp.messages)
+        process = multiprocessing.get_context("spawn").Process(
+            target=run_transfer, args=(options, fault, log_file, result_file)
+        )
+        process.start()
+        process.join()
+        result = {"status": "crashed", "seconds": None, "io": None, "stub": None}
+        if os.path.exists(result_file):
+            with open(result_file) as f:
+                result = json.load(f)
+        result.update(
+            name=name,
+            options=options[1:],
+            exit_code=process.exitcode,
+            emails=[x["subject"] for x in self.smtp.messages[emails:]],
+            log_file=log_file,
+        )
+        logger.info(
+            f"{name:<36} {result['status']:<10} {result['seconds'] or 0:9.3f}s  write_bytes {(result['io'] or dict()).get('write_bytes', 0):>12}  copied {(result['stub'] or dict()).get('copied_files', 0):>6} files"
+        )
+        return result
+
+    def check_destination(self):
+        """
+        Number of source files missing or different (content) in the destination.
+        """
+        mismatches = 0
+        for copy_type, totals in self.totals.items():
+            source, destination = self.get_transfer().get_copy_locations(copy_type)[:2]
+            for root, dirs, files in os.walk(source):
+                for name in files:
+                    src = os.path.join(root, name)
+                    dst = os.path.join(destination, os.path.relpath(src, source))
+                    if not os.path.exists(dst) or hash_file(src) != hash_file(dst):
+                        mismatches += 1
+        return mismatches
+
+    def run(self):
+        self.generate()
+        copy_types = list(self.totals)
+        self.clean()
+        baseline = self.transfer("baseline", list())
+        baseline["destination_mismatches"] = self.check_destination()
+
+        scenarios = list()
+        for name in self.args.faults:
+            point, action = name.split(":")
+            fault = {
+                "point": point,
+                "action": action,
+                "copy_type": self.args.fault_copy_type or copy_types[0],
+                "fraction": self.args.fault_fraction,
+            }
+            self.clean()
+            interrupted = self.transfer(f"{point}.{action}.interrupted", list(), fault)
+            resumed = self.transfer(f"{point}.{action}.resumed", self.resume_options)
+            scenario = {
+                "fault": fault,
+                "interrupted": interrupted,
+                "resumed": resumed,
+                "destination_mismatches": self.check_destination(),
+            }
+            if baseline["seconds"] and resumed["seconds"] is not None:
+                scenario["resume_time_ratio"] = round(
+                    resumed["seconds"] / baseline["seconds"], 3
+                )
+            if baseline["io"] and resumed["io"]:
+                scenario["resume_io_ratio"] = {
+                    key: round(resumed["io"][key] / baseline["io"][key], 3)
+                    for key in ("rchar", "wchar", "read_bytes", "write_bytes")
+                    if baseline["io"].get(key)
+                }
+            logger.info(
+                f"{point}:{action} - resume took {scenario.get('resume_time_ratio')} of the uninterrupted time, {scenario['destination_mismatches']} file(s) missing or different afterwards"
+            )
+            scenarios.append(scenario)
+
+        return {
+            "root": self.root,
+            "spec": self.spec,
+            "seed": self.seed,
+            "totals": self.totals,
+            "transfer_options": self.transfer_options,
+            "resume_options": self.resume_options,
+            "baseline": baseline,
+            "scenarios": scenarios,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Kill or corrupt a Vizgen data transfer of a synthetic run at chosen points and measure the time and I/O of resuming it",
+        epilog=f"Contact: {__author__} ({__email__})",
+    )
+    parser.add_argument(
+        "--faults",
+        nargs="+",
+        default=[
+            f"{point}:{action}" for point in fault_points for action in fault_actions
+        ],
+        choices=[
+            f"{point}:{action}" for point in fault_points for action in fault_actions
+        ],
+        help="Faults to inject, as point:action",
+    )
+    parser.add_argument(
+        "--fault_copy_type",
+        choices=["raw_data", "analysis", "output"],
+        help="Copy type the faults are injected in [default: the first copy type]",
+    )
+    parser.add_argument(
+        "--fault_fraction",
+        type=float,
+        default=0.5,
+        help="For mid_file, fraction of the files of the copy type copied before the kill",
+    )
+    parser.add_argument(
+        "--transfer_options",
+        default="",
+        help="Options of every transfer, for example: '--checksum --parallel_copy_types 3'",
+    )
+    parser.add_argument(
+        "--resume_options",
+        default="--resume",
+        help="Options added to the transfer resuming the interrupted one, for example: '--resume --checksum'",
+    )
+    add_synthetic_run_options(parser)
+    parser.add_argument(
+        "--output",
+        help="JSON file for the results [default: 'fault_results.json' in the current folder]",
+    )
+    args = parser.parse_args()
+
+    # the transfers log to a file for each transfer in <root>/fault_logs
+    logger.setLevel(logging.INFO)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    root = args.root or tempfile.mkdtemp(prefix="vizgen_faults_")
+    os.makedirs(root, exist_ok=True)
+    try:
+        with SMTPStub() as smtp:
+            report = FaultHarness(args, root, smtp).run()
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = args.output or "fault_results.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Fault injection results: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic MERFISH-like runs and copy logs for the benchmarks
+
+A synthetic run mimics the layout of a Vizgen run on the analysis drive:
+
+    merfish_raw_data/<run_id>/data/stack_<round>_<fov>.dax         a few thousand large image stacks in one folder
+    merfish_raw_data/<run_id>/settings/, low_resolution/           a few small files
+    merfish_analysis/<run_id>/region_<r>/<task>/fov_<fov>/z<z>/... tens of thousands of small files, deeply nested
+    merfish_output/<run_id>/region_<r>/images/, cell_boundaries/   mosaics, per FOV cell boundaries and tables
+
+The layout, sizes and modification times only depend on the spec and the seed, so the same run is generated every time. The rsync and robocopy logs are written from the same list of files, in the format of the logs written by the transfer.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import time
+import random
+
+# size of the random block the file contents are cut from
+default_block_size = 1024 * 1024
+
+# modification time of the first file, 26 Oct 2023 10:58:00 UTC
+base_mtime = 1698317880
+
+# folder of each copy type on the analysis drive
+copy_type_roots = {
+    "raw_data": "merfish_raw_data",
+    "analysis": "merfish_analysis",
+    "output": "merfish_output",
+}
+
+analysis_tasks = [
+    "FiducialCorrelationWarp",
+    "DeconvolutionPreprocess",
+    "Decode",
+    "Segment",
+    "SumSignal",
+    "PartitionBarcodes",
+]
+
+# number of files and typical sizes of each preset, see --scale
+scales = {
+    "small": {
+        "raw_files": 200,
+        "raw_file_size": 1024 * 1024,
+        "analysis_files": 2000,
+        "analysis_file_size": 8 * 1024,
+        "output_files": 100,
+        "output_file_size": 256 * 1024,
+        "regions": 2,
+        "depth": 5,
+    },
+    "medium": {
+        "raw_files": 2000,
+        "raw_file_size": 4 * 1024 * 1024,
+        "analysis_files": 20000,
+        "analysis_file_size": 16 * 1024,
+        "output_files": 500,
+        "output_file_size": 1024 * 1024,
+        "regions": 4,
+        "depth": 6,
+    },
+    "large": {
+        "raw_files": 4000,
+        "raw_file_size": 64 * 1024 * 1024,
+        "analysis_files": 50000,
+        "analysis_file_size": 32 * 1024,
+        "output_files": 2000,
+        "output_file_size": 4 * 1024 * 1024,
+        "regions": 4,
+        "depth": 7,
+    },
+}
+
+
+def _vary(rng, size, spread=0.1):
+    return max(0, int(size * rng.uniform(1 - spread, 1 + spread)))
+
+
+def iter_run_entries(spec, seed=0):
+    """
+    Yield (copy type, relative path, size) for every file of a synthetic run.
+    """
+    rng = random.Random(seed)
+    regions = max(1, spec["regions"])
+
+    # raw data: one stack per imaging round and FOV, all in data/
+    rounds = 8
+    fovs = max(1, -(-spec["raw_files"] // rounds))
+    for n in range(spec["raw_files"]):
+        yield "raw_data", f"data/stack_{n % rounds}_{n // rounds:04d}.dax", _vary(
+            rng, spec["raw_file_size"]
+        )
+    for name in ("experiment.json", "dataorganization.csv", "codebook.csv"):
+        yield "raw_data", f"settings/{name}", rng.randint(1024, 65536)
+    for n in range(min(fovs, 50)):
+        yield "raw_data", f"low_resolution/fov_{n:04d}.png", rng.randint(8192, 131072)
+
+    # analysis: small files nested by region, task, FOV, z plane and tiles
+    per_folder = 4
+    for n in range(spec["analysis_files"]):
+        folder = n // per_folder
+        task = analysis_tasks[folder % len(analysis_tasks)]
+        region = (folder // len(analysis_tasks)) % regions
+        fov = folder // (len(analysis_tasks) * regions)
+        parts = [f"region_{region}", task, f"fov_{fov // 7:04d}", f"z{fov % 7}"]
+        for level in range(max(0, spec["depth"] - len(parts) - 1)):
+            parts.append(f"tile_{(fov >> level) % 3}")
+        size = min(
+            int(rng.lognormvariate(0, 0.8) * spec["analysis_file_size"]),
+            64 * spec["analysis_file_size"],
+        )
+        yield "analysis", "/".join(parts + [f"{task.lower()}_{n}.pkl"]), size
+
+    # output: mosaics and tables for each region, cell boundaries for each FOV
+    stains = ["DAPI", "PolyT", "Cellbound1", "Cellbound2", "Cellbound3"]
+    mosaics = max(1, spec["output_files"] // 4)
+    for n in range(spec["output_files"]):
+        region = n % regions
+        if n < mosaics:
+            path = f"region_{region}/images/mosaic_{stains[n % len(stains)]}_z{n // regions % 7}_{n:04d}.tif"
+            size = _vary(rng, spec["output_file_size"] * 4)
+        else:
+            path = f"region_{region}/cell_boundaries/feature_data_{n:04d}.hdf5"
+            size = _vary(rng, spec["output_file_size"] // 2, spread=0.5)
+        yield "output", path, size
+    for region in range(regions):
+        for name in (
+            "detected_transcripts.csv",
+            "cell_by_gene.csv",
+            "cell_metadata.csv",
+        ):
+            yield "output", f"region_{region}/{name}", _vary(
+                rng, spec["output_file_size"] * 2, spread=0.5
+            )
+
+
+def get_run_locations(root, run_id):
+    """
+    Source folder of each copy type of a run generated under 'root'.
+    """
+    return {
+        copy_type: os.path.join(root, folder, run_id)
+        for copy_type, folder in copy_type_roots.items()
+    }
+
+
+def write_run(root, run_id, spec, seed=0, block_size=default_block_size):
+    """
+    Write the files of a synthetic run under 'root', as on the analysis drive. The contents are cut from a random block, with the position of the file written at the start so that no two files are the same. Returns the number of files and bytes written for each copy type.
+    """
+    rng = random.Random(seed)
+    block = rng.randbytes(block_size)
+    locations = get_run_locations(root, run_id)
+    totals = {copy_type: {"files": 0, "size_bytes": 0} for copy_type in locations}
+    for n, (copy_type, path, size) in enumerate(iter_run_entries(spec, seed)):
+        file_path = os.path.join(locations[copy_type], *path.split("/"))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as f:
+            header = f"{n}\n".encode()[:size]
+            f.write(header)
+            remaining = size - len(header)
+            offset = n % block_size
+            while remaining > 0:
+                chunk = block[offset : offset + remaining]
+                f.write(chunk)
+                remaining -= len(chunk)
+                offset = 0
+        mtime = (base_mtime + n) * 1000000000
+        os.utime(file_path, ns=(mtime, mtime))
+        totals[copy_type]["files"] += 1
+        totals[copy_type]["size_bytes"] += size
+    return totals
+
+
+def _folders(paths):
+    # every parent folder of the paths, in path order
+    folders = set()
+    for path in paths:
+        parts = path.split("/")[:-1]
+        for n in range(1, len(parts) + 1):
+            folders.add("/".join(parts[:n]))
+    return sorted(folders)
+
+
+def _win(path):
+    return path.replace("/", "\\")
+
+
+def _robocopy_footer(folders, files, size_bytes):
+    ended = time.strftime("%d %B %Y %H:%M:%S", time.gmtime(base_mtime))
+    return (
+        "------------------------------------------------------------------------------\n\n"
+        "               Total    Copied   Skipped  Mismatch    FAILED    Extras\n"
+        f"    Dirs :  {folders:>8}  {folders:>8}         0         0         0         0\n"
+        f"   Files :  {files:>8}  {files:>8}         0         0         0         0\n"
+        f"   Bytes :  {size_bytes:>8}  {size_bytes:>8}         0         0         0         0\n"
+        "   Times :   0:00:03   0:00:00                       0:00:00   0:00:03\n"
+        f"   Ended : {ended}\n\n"
+    )
+
+
+def write_robocopy_log(log_file, source, destination, entries, list_mode=False):
+    """
+    Write a robocopy log for the (relative path, size) entries of a copy type: a list log as written by get_counts_robocopy with list_mode=True, otherwise a copy log as written by copy_data. Paths are logged with backslashes below 'source'.
+    """
+    entries = sorted(entries)
+    folders = _folders(path for path, _ in entries)
+    started = time.strftime("%d %B %Y %H:%M:%S", time.gmtime(base_mtime))
+    options = "/L /E /BYTES /V /NP /FP" if list_mode else "/Z /E /J /MT:8"
+    root = source.rstrip("\\/") + "\\"
+    with open(log_file, "w", encoding="utf-8", newline="\n") as f:
+        f.write(
+            "\n-------------------------------------------------------------------------------\n"
+            "   ROBOCOPY     ::     Robust File Copy for Windows                              \n"
+            "-------------------------------------------------------------------------------\n\n"
+            f"  Started : {started}\n"
+            f"   Source : {root}\n"
+            f"     Dest : {destination}\n\n"
+            "    Files : *.*\n\n"
+            f"  Options : *.* {options}\n\n"
+            "------------------------------------------------------------------------------\n\n"
+        )
+        f.write(f"\t                   {len(entries)}\t{root}\n")
+        by_folder = dict()
+        for path, size in entries:
+            by_folder.setdefault(path.rpartition("/")[0], list()).append((path, size))
+        for path, size in by_folder.get("", list()):
+            f.write(f"\t    New File  \t\t{size:>12}\t{root}{_win(path)}\n")
+        for folder in folders:
+            files = by_folder.get(folder, list())
+            f.write(f"\t  New Dir  {len(files):>8}\t{root}{_win(folder)}\\\n")
+            for path, size in files:
+                f.write(f"\t    New File  \t\t{size:>12}\t{root}{_win(path)}\n")
+        f.write(
+            _robocopy_footer(
+                len(folders) + 1, len(entries), sum(size for _, size in entries)
+            )
+        )
+
+
+def write_rsync_log(log_file, entries, pid=12345):
+    """
+    Write a rsync --log-file in the rsync_log_format used by copy_data for the (relative path, size) entries of a copy type, ending with the session summary line.
+    """
+    entries = sorted(entries)
+    stamp = time.strftime("%Y/%m/%d %H:%M:%S", time.gmtime(base_mtime))
+    mtime = time.strftime("%Y/%m/%d-%H:%M:%S", time.localtime(base_mtime))
+    total = sum(size for _, size in entries)
+    folders = set()
+    with open(log_file, "w", encoding="utf-8", newline="\n") as f:
+        f.write(f"{stamp} [{pid}] building file list\n")
+        f.write(f"{stamp} [{pid}] cd+++++++++ 4096 {mtime} ./\n")
+        for path, size in entries:
+            parts = path.split("/")[:-1]
+            for n in range(1, len(parts) + 1):
+                folder = "/".join(parts[:n])
+                if folder not in folders:
+                    folders.add(folder)
+                    f.write(f"{stamp} [{pid}] cd+++++++++ 4096 {mtime} {folder}/\n")
+            f.write(f"{stamp} [{pid}] >f+++++++++ {size} {mtime} {path}\n")
+        f.write(
+            f"{stamp} [{pid}] sent {total:,} bytes  received {len(entries) * 35:,} bytes  total size {total:,}\n"
+        )
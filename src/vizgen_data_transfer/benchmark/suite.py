@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the hot paths of the transfer on a synthetic run
+
+A synthetic MERFISH-like run is generated in a local folder, and the methods of VizgenDataTransfer used by a real transfer are timed on it, each repeated --repeat times:
+
+    scan     get_counts_python with each scanner and number of scan threads
+    copy     copy_data with the native copy engine and with rsync (and rsync shards)
+    logs     check_log_file, check_robocopy_list_logs and the parsing of the robocopy list and rsync logs, on synthetic logs
+    verify   manifest diff, checksums with each number of workers and folder digests
+
+The results, with the minimum, median and maximum time and the files/s and MB/s of the median, are printed and written to a JSON file.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+
+from vizgen_data_transfer.__main__ import (
+    VizgenDataTransfer,
+    default_vizgen_config,
+    get_parser,
+    tomllib,
+)
+from vizgen_data_transfer.metrics import get_rates
+from vizgen_data_transfer.rsync_log import parse_rsync_log
+from vizgen_data_transfer.benchmark.generator import (
+    get_run_locations,
+    iter_run_entries,
+    scales,
+    write_robocopy_log,
+    write_rsync_log,
+    write_run,
+)
+
+benchmark_names = ["scan", "copy", "logs", "verify"]
+
+run_id = "BENCHMARK_RUN"
+
+# progress and results of the benchmarks and of the fault injection harness,
+# logged at INFO while the INFO messages of the transfer methods are hidden
+logger = logging.getLogger("vizgen_data_transfer.benchmark")
+
+
+def drop_caches():
+    """
+    Drop the page cache on Linux (needs root), so every repetition reads from disk. Returns False when not possible.
+    """
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def get_spec(args):
+    """
+    Preset of --scale with the values changed by the options of the same name.
+    """
+    spec = dict(scales[args.scale])
+    for key in spec:
+        if getattr(args, key, None) is not None:
+            spec[key] = getattr(args, key)
+    return spec
+
+
+class SyntheticRun:
+    """
+    Synthetic run on the analysis drive folder of 'root', with a config file using folders of 'root' as analysis and isilon drives.
+    """
+
+    def __init__(self, root, spec, seed=0, smtp_server="localhost"):
+        self.root = root
+        self.spec = spec
+        self.seed = seed
+        self.smtp_server = smtp_server
+        self.analysis_drive = os.path.join(root, "analysis_drive")
+        self.isilon_drive = os.path.join(root, "isilon")
+        self.log_dir = os.path.join(self.isilon_drive, "logs")
+        self.config_file = os.path.join(root, "benchmark_config.toml")
+        self.totals = dict()
+
+    def generate(self):
+        """
+        Write the synthetic run and the config file, unless the same run was already generated in 'root'.
+        """
+        spec_file = os.path.join(self.root, "benchmark_spec.json")
+        spec = {"spec": self.spec, "seed": self.seed}
+        if os.path.exists(spec_file):
+            with open(spec_file) as f:
+                previous = json.load(f)
+            if (
+                previous.get("spec") == spec["spec"]
+                and previous.get("seed") == spec["seed"]
+            ):
+                self.totals = previous["totals"]
+                logger.info(
+                    f"Using the synthetic run already generated in {self.root}"
+                )
+                self.write_config()
+                return
+            shutil.rmtree(self.analysis_drive, ignore_errors=True)
+
+        logger.info(
+            f"Generating the synthetic run in {self.analysis_drive}: {self.spec}"
+        )
+        start = time.perf_counter()
+        self.totals = write_run(self.analysis_drive, run_id, self.spec, self.seed)
+        logger.info(
+            f"Generated {sum(x['files'] for x in self.totals.values())} files, {sum(x['size_bytes'] for x in self.totals.values())} bytes in {time.perf_counter() - start:.1f} seconds"
+        )
+        spec["totals"] = self.totals
+        with open(spec_file, "w") as f:
+            json.dump(spec, f, indent=2)
+        self.write_config()
+
+    def write_config(self):
+        # tool options of the default config, with the drives of the benchmark
+        with open(default_vizgen_config, "rb") as f:
+            tool_options = tomllib.load(f)["tool"]["options"]
+        os.makedirs(self.log_dir, exist_ok=True)
+        lines = [
+            f"analysis_drive_nix = {json.dumps(self.analysis_drive)}",
+            f"isilon_drive_nix = {json.dumps(self.isilon_drive)}",
+            f"isilon_drive_logs_nix = {json.dumps(self.log_dir)}",
+            f"analysis_drive_pc = {json.dumps(self.analysis_drive)}",
+            f"isilon_drive_pc = {json.dumps(self.isilon_drive)}",
+            f"isilon_drive_logs_pc = {json.dumps(self.log_dir)}",
+            f"analysis_drive_pc_disk = {json.dumps(self.analysis_drive)}",
+            f"analysis_drive_pc_debug = {json.dumps(self.analysis_drive)}",
+            f"smtp_server = {json.dumps(self.smtp_server)}",
+            'sender_email = "benchmark@localhost"',
+            "[production]",
+            'addressees = ["benchmark@localhost"]',
+            "[development]",
+            'addressees = ["benchmark@localhost"]',
+            "[tool.options]",
+        ]
+        policies = tool_options.pop("policy", dict())
+        lines.extend(
+            f"{key} = {json.dumps(value)}" for key, value in tool_options.items()
+        )
+        # policies of the copy types, the options of the benchmarks apply to
+        # every copy type
+        for copy_type, policy in policies.items():
+            lines.append(f"[tool.options.policy.{copy_type}]")
+            lines.extend(
+                f"{key} = {json.dumps(value)}"
+                for key, value in policy.items()
+                if key not in ("backend", "threads", "rsync_shards")
+            )
+        with open(self.config_file, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def get_transfer(self, *options):
+        args = get_parser().parse_args(
+            [
+                run_id,
+                "--vizgen_config",
+                self.config_file,
+                "--progress_interval",
+                "0",
+                *options,
+            ]
+        )
+        return VizgenDataTransfer(args)
+
+    def clean_destination(self):
+        shutil.rmtree(os.path.join(self.isilon_drive, run_id), ignore_errors=True)
+        for copy_type in self.totals:
+            os.makedirs(
+                os.path.join(self.isilon_drive, run_id, copy_type), exist_ok=True
+            )
+
+    def get_totals(self):
+        return {
+            "files": sum(x["files"] for x in self.totals.values()),
+            "size_bytes": sum(x["size_bytes"] for x in self.totals.values()),
+        }
+
+
+class BenchmarkSuite(SyntheticRun):
+    """
+    Time the transfer methods on the synthetic run.
+    """
+
+    def __init__(self, args, root):
+        super().__init__(root, get_spec(args), args.seed)
+        self.args = args
+        self.repeat = max(1, args.repeat)
+        self.threads = sorted(set(args.threads))
+        self.results = list()
+        self.drop_caches = args.drop_caches
+
+    def time_call(
+        self, benchmark, name, function, setup=None, options=None, totals=None
+    ):
+        """
+        Time function() --repeat times, calling setup() untimed before each repetition, and record the result.
+        """
+        if totals is None:
+            totals = self.get_totals()
+        seconds = list()
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            if self.drop_caches and not drop_caches():
+                logger.warning(
+                    "Unable to drop the page cache, running with a warm cache"
+                )
+                self.drop_caches = False
+            start = time.perf_counter()
+            function()
+            seconds.append(time.perf_counter() - start)
+        median = statistics.median(seconds)
+        result = {
+            "benchmark": benchmark,
+            "name": name,
+            "options": options or dict(),
+            "seconds": [round(x, 4) for x in seconds],
+            "min": round(min(seconds), 4),
+            "median": round(median, 4),
+            "max": round(max(seconds), 4),
+            "files": totals["files"],
+            "size_bytes": totals["size_bytes"],
+        }
+        result.update(get_rates(median, totals["files"], totals["size_bytes"]))
+        self.results.append(result)
+        logger.info(
+            f"{benchmark:<7} {name:<40} median {median:9.4f}s  {result['files_per_second'] or 0:12.1f} files/s  {result['mb_per_second'] or 0:10.2f} MB/s"
+        )
+        return result
+
+    def bench_scan(self):
+        scanners = [("walk", 1)] + [("scandir", threads) for threads in self.threads]
+        for scanner, threads in scanners:
+            transfer = self.get_transfer(
+                "--scanner", scanner, "--scan_threads", str(threads)
+            )
+            self.time_call(
+                "scan",
+                f"get_counts_python {scanner} x{threads}",
+                lambda: transfer.get_counts_python(state="before"),
+                options={"scanner": scanner, "scan_threads": threads},
+            )
+
+    def copy_all(self, transfer):
+        for copy_type in transfer.copy_type:
+            source, destination, log_file = transfer.get_copy_locations(copy_type)
+            transfer.copy_data(copy_type, source, destination, log_file)
+
+    def bench_copy(self):
+        backends = [("native", threads, 1) for threads in self.threads]
+        if shutil.which("rsync"):
+            backends.append(("rsync", 1, 1))
+            backends.extend(
+                ("rsync", 1, shards) for shards in self.threads if shards > 1
+            )
+        else:
+            logger.warning("rsync not found, only benchmarking the native copy engine")
+        for backend, threads, shards in backends:
+            transfer = self.get_transfer(
+                "--backend",
+                backend,
+                "--threads",
+                str(threads),
+                "--rsync_shards",
+                str(shards),
+            )
+            # the copy uses the manifests of the before transfer scan
+            transfer.get_counts_python(state="before")
+            name = f"copy_data {backend} x{threads}"
+            if shards > 1:
+                name = f"copy_data {backend} {shards} shards"
+            self.time_call(
+                "copy",
+                name,
+                lambda: self.copy_all(transfer),
+                setup=self.clean_destination,
+                options={
+                    "backend": backend,
+                    "threads": threads,
+                    "rsync_shards": shards,
+                },
+            )
+
+    def bench_logs(self):
+        transfer = self.get_transfer()
+        log_dir = os.path.join(self.root, "logs")
+        os.makedirs(log_dir, exist_ok=True)
+        locations = get_run_locations(self.analysis_drive, run_id)
+
+        # --log_scale copies of the files of the run in each log
+        entries = {copy_type: list() for copy_type in locations}
+        for n in range(max(1, self.args.log_scale)):
+            for copy_type, path, size in iter_run_entries(self.spec, self.args.seed):
+                entries[copy_type].append((f"copy_{n:03d}/{path}", size))
+        totals = {
+            "files": sum(len(x) for x in entries.values()),
+            "size_bytes": sum(size for x in entries.values() for _, size in x),
+        }
+
+        copy_logs = list()
+        rsync_logs = list()
+        for copy_type, source in locations.items():
+            copy_log = os.path.join(log_dir, f"{copy_type}.robocopy.log")
+            write_robocopy_log(
+                copy_log,
+                source,
+                transfer.get_copy_locations(copy_type)[1],
+                entries[copy_type],
+            )
+            copy_logs.append(copy_log)
+            list_log = transfer.get_robocopy_list_locations(copy_type, "before")[1]
+            write_robocopy_log(
+                list_log, source, "NULL", entries[copy_type], list_mode=True
+            )
+            rsync_log = os.path.join(log_dir, f"{copy_type}.rsync.log")
+            write_rsync_log(rsync_log, entries[copy_type])
+            rsync_logs.append(rsync_log)
+
+        # the robocopy log checks only read the logs, so they run on Linux
+        # too once the transfer takes the Windows code path
+        transfer.os_name = "windows"
+        self.time_call(
+            "logs",
+            "check_log_file robocopy",
+            lambda: [transfer.check_log_file(log_file) for log_file in copy_logs],
+            totals=totals,
+        )
+        self.time_call(
+            "logs",
+            "check_robocopy_list_logs",
+            lambda: transfer.check_robocopy_list_logs(state="before"),
+            totals=totals,
+        )
+        self.time_call(
+            "logs",
+            "get_counts_robocopy_manifest",
+            lambda: transfer.get_counts_robocopy_manifest(state="before"),
+            totals=totals,
+        )
+        # the manifest is only built from the log when it agrees with the footer
+        for copy_type in transfer.copy_type:
+            if transfer.store_python_count_info["before"][copy_type]["files"] != len(
+                entries[copy_type]
+            ):
+                logger.warning(
+                    f"Robocopy list log of {copy_type} was not parsed as expected, get_counts_robocopy_manifest fell back to a python scan"
+                )
+
+        def parse_rsync_logs():
+            for log_file in rsync_logs:
+                for _ in parse_rsync_log(log_file):
+                    pass
+
+        self.time_call("logs", "parse_rsync_log", parse_rsync_logs, totals=totals)
+
+    def bench_verify(self):
+        # copy the run once with the native copy engine
+        transfer = self.get_transfer(
+            "--backend", "native", "--threads", str(max(self.threads))
+        )
+        transfer.get_counts_python(state="before")
+        self.clean_destination()
+        self.copy_all(transfer)
+        transfer.get_counts_python(state="after")
+
+        self.time_call("verify", "get_manifest_diff", transfer.get_manifest_diff)
+        self.time_call(
+            "verify",
+            "get_tree_digest_diff",
+            lambda: [transfer.get_tree_digest_diff(x) for x in transfer.copy_type],
+        )
+        for workers in self.threads:
+            transfer.checksum_workers = workers
+            self.time_call(
+                "verify",
+                f"verify_checksums x{workers}",
+                lambda: [transfer.verify_checksums(x) for x in transfer.copy_type],
+                options={"checksum_workers": workers},
+            )
+
+    def run(self):
+        self.generate()
+        for name in self.args.benchmarks:
+            getattr(self, f"bench_{name}")()
+        return {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "root": self.root,
+            "spec": self.spec,
+            "seed": self.args.seed,
+            "repeat": self.repeat,
+            "drop_caches": self.drop_caches,
+            "totals": self.totals,
+            "results": self.results,
+        }
+
+
+def add_synthetic_run_options(parser):
+    """
+    Options of the synthetic run, shared by the benchmarks and the fault injection harness.
+    """
+    parser.add_argument(
+        "--root",
+        help="Folder for the synthetic run, copies and logs. It is kept, and the run is only generated again when its options change [default: a temporary folder, removed at the end]",
+    )
+    parser.add_argument(
+        "--scale",
+        default="small",
+        choices=sorted(scales),
+        help="Size of the synthetic run, the options below change single values of the preset",
+    )
+    for key in scales["small"]:
+        parser.add_argument(
+            f"--{key}", type=int, help=f"Override '{key}' of the preset"
+        )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic run")
+    parser.add_argument(
+        "--drop_caches",
+        action="store_true",
+        help="Drop the page cache before each timed repetition or transfer (Linux, needs root)",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Benchmark the scan, copy, log checks and verification of the Vizgen data transfer on a synthetic MERFISH-like run",
+        epilog=f"Contact: {__author__} ({__email__})",
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        default=benchmark_names,
+        choices=benchmark_names,
+        help="Benchmarks to run",
+    )
+    add_synthetic_run_options(parser)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of times each benchmark is run"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[1, 4, 8],
+        help="Numbers of threads (scan threads, copy threads, rsync shards, checksum workers) benchmarked",
+    )
+    parser.add_argument(
+        "--log_scale",
+        type=int,
+        default=10,
+        help="The synthetic logs list the files of the run this number of times",
+    )
+    parser.add_argument(
+        "--output",
+        help="JSON file for the results [default: 'benchmark_results.json' in the current folder]",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Also show the INFO log messages of the transfer methods, which are hidden during the benchmarks by default",
+    )
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    root = args.root or tempfile.mkdtemp(prefix="vizgen_benchmark_")
+    os.makedirs(root, exist_ok=True)
+    try:
+        report = BenchmarkSuite(args, root).run()
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = args.output or "benchmark_results.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Benchmark results: {output}")
+
+
+if __name__ == "__main__":
+    main()
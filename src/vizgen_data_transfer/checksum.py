@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content checksums of the source and destination files of a copy type
+
+The counts and the manifests only compare the number of files and their sizes, so a file truncated and padded to the same size, or a flipped bit, is not detected. The checksum stage reads every file on both sides and compares their digests. Files are hashed by a pool of worker threads or processes with large reads (memory mapped when possible); hashlib releases the GIL while hashing large blocks, so threads scale on multi core machines.
+
+The digests are written in the format of sha256sum/md5sum, so a copy can also be checked with 'sha256sum -c CHECKSUMS':
+
+    <hex digest>  <relative path>
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import re
+import mmap
+import time
+import hashlib
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    ProcessPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
+
+default_algorithm = "sha256"
+
+# read size for files that are not memory mapped
+default_buffer_size = 8 * 1024 * 1024
+
+# files larger than this are hashed through a memory map
+default_mmap_threshold = 64 * 1024 * 1024
+
+checksum_algorithms = sorted(hashlib.algorithms_guaranteed - {"shake_128", "shake_256"})
+
+executors = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+def hash_file(
+    path,
+    algorithm=default_algorithm,
+    buffer_size=default_buffer_size,
+    mmap_threshold=default_mmap_threshold,
+):
+    """
+    Return the hex digest and the number of bytes read of a file.
+    """
+    digest = hashlib.new(algorithm)
+    size = 0
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if mmap_threshold and file_size >= mmap_threshold:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    # hash the map in slices of 'buffer_size' bytes
+                    view = memoryview(m)
+                    try:
+                        for offset in range(0, file_size, buffer_size):
+                            digest.update(view[offset : offset + buffer_size])
+                    finally:
+                        view.release()
+                return digest.hexdigest(), file_size
+            except (OSError, ValueError):
+                # file systems that do not support mmap, read it instead
+                f.seek(0)
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+            size += n
+    return digest.hexdigest(), size
+
+
+def stat_key(st):
+    """
+    Size, modification time and inode of a file, a file with the same key is assumed to have the same content.
+    """
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _hash_side(path, cached, algorithm, buffer_size):
+    # reuse the cached digest when the file has not changed since it was hashed
+    key = stat_key(os.stat(path))
+    if cached is not None and tuple(cached[:3]) == key:
+        return cached[3], key, True
+    digest, _ = hash_file(path, algorithm, buffer_size)
+    return digest, key, False
+
+
+def _verify_entry(path, source, destination, algorithm, buffer_size, cached=None):
+    start = time.perf_counter()
+    source_cached, destination_cached = cached or (None, None)
+    record = {
+        "path": path,
+        "size": 0,
+        "source_digest": None,
+        "destination_digest": None,
+        "source_key": None,
+        "destination_key": None,
+        "source_cached": False,
+        "destination_cached": False,
+        "status": None,
+        "error": None,
+    }
+    try:
+        (
+            record["source_digest"],
+            record["source_key"],
+            record["source_cached"],
+        ) = _hash_side(source, source_cached, algorithm, buffer_size)
+        record["size"] = record["source_key"][0]
+    except OSError as e:
+        record["status"] = "failed"
+        record["error"] = f"source: {e}"
+    else:
+        try:
+            (
+                record["destination_digest"],
+                record["destination_key"],
+                record["destination_cached"],
+            ) = _hash_side(destination, destination_cached, algorithm, buffer_size)
+        except OSError as e:
+            record["status"] = "failed"
+            record["error"] = f"destination: {e}"
+        else:
+            record["status"] = (
+                "match"
+                if record["source_digest"] == record["destination_digest"]
+                else "mismatch"
+            )
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def verify_tree(
+    source_root,
+    destination_root,
+    paths,
+    workers=1,
+    algorithm=default_algorithm,
+    buffer_size=default_buffer_size,
+    executor="thread",
+    on_record=None,
+    long_path=None,
+    lookup=None,
+):
+    """
+    Hash the files with the given relative paths under 'source_root' and 'destination_root' using 'workers' threads or processes, and compare their digests.
+
+    lookup(path), when given, is called from the calling thread and returns the digests known from a previous run for the source and the destination file, each as a (size, mtime_ns, inode, digest) tuple or None. A known digest is used instead of reading the file again when the size, modification time and inode of the file are unchanged.
+
+    on_record(record) is called from the calling thread for every file with a dictionary holding the path, size, source and destination digests, stat keys and whether the digests were known, status ('match', 'mismatch' or 'failed'), error and seconds. At most twice as many files as workers are in flight at any time, so the list of paths can be a generator over a very large manifest.
+
+    Returns the totals of files matched, mismatched and failed and bytes hashed on the source side.
+    """
+    totals = {"match": 0, "mismatch": 0, "failed": 0, "size_bytes": 0}
+    workers = max(1, int(workers))
+    paths = iter(paths)
+
+    def handle(record):
+        totals[record["status"]] += 1
+        totals["size_bytes"] += record["size"]
+        if on_record:
+            on_record(record)
+
+    with executors[executor](max_workers=workers) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * workers:
+                path = next(paths, None)
+                if path is None:
+                    exhausted = True
+                    break
+                source = os.path.join(source_root, *path.split("/"))
+                destination = os.path.join(destination_root, *path.split("/"))
+                if long_path:
+                    source = long_path(source)
+                    destination = long_path(destination)
+                pending.add(
+                    pool.submit(
+                        _verify_entry,
+                        path,
+                        source,
+                        destination,
+                        algorithm,
+                        buffer_size,
+                        lookup(path) if lookup else None,
+                    )
+                )
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                handle(future.result())
+    return totals
+
+
+def format_checksum_line(digest, path):
+    """
+    Line of a checksum file, with the same escaping as sha256sum: names holding a backslash or a line break are escaped and the line starts with a backslash.
+    """
+    if "\\" in path or "\n" in path:
+        path = path.replace("\\", "\\\\").replace("\n", "\\n")
+        return f"\\{digest}  {path}\n"
+    return f"{digest}  {path}\n"
+
+
+def parse_checksum_line(line):
+    """
+    Digest and path of a line written by format_checksum_line, or None for a line that is not a checksum line.
+    """
+    line = line.rstrip("\n")
+    escaped = line.startswith("\\")
+    if escaped:
+        line = line[1:]
+    digest, separator, path = line.partition("  ")
+    if not separator or not digest or not path:
+        return None
+    if escaped:
+        path = re.sub(
+            r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), path
+        )
+    return digest, path
+
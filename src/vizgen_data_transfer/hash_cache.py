@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of file digests, kept between runs of the same run_id
+
+Large runs are often resumed several times, and every checksum verification would otherwise read all the source and destination files again. The cache stores the digest of each file with its size, modification time and inode in a SQLite database in the logs folder. A file is only hashed again when one of these has changed.
+
+Only the digests are cached. The counts and manifests still stat every file on each run: the size, modification time and inode of a file are what tell whether it changed, so a cached copy of them could not replace the stat, and os.scandir already returns them with the folder listing on Windows. The cache is only used with --checksum.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import sqlite3
+
+# number of new digests written per transaction
+default_commit_every = 1000
+
+
+class HashCache:
+    """
+    Digests of files under named roots (e.g. 'raw_data:source'), keyed by the relative path and the hash algorithm, each stored with the (size, mtime_ns, inode) of the file when it was hashed.
+
+    The cache is used from a single thread. New digests are committed every 'commit_every' files, so an interrupted run keeps most of the work done.
+    """
+
+    def __init__(self, cache_file, commit_every=default_commit_every):
+        self.cache_file = cache_file
+        self.commit_every = commit_every
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        # several copy types can be verified at the same time, each with its
+        # own connection, so wait for the write lock instead of failing
+        self.connection = sqlite3.connect(cache_file, timeout=300)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS digests (
+                root TEXT NOT NULL,
+                path TEXT NOT NULL,
+                algorithm TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (root, path, algorithm)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def get(self, root, path, algorithm):
+        """
+        Return the (size, mtime_ns, inode, digest) stored for a file, or None.
+        """
+        return self.connection.execute(
+            "SELECT size, mtime_ns, inode, digest FROM digests WHERE root = ? AND path = ? AND algorithm = ?",
+            (root, path, algorithm),
+        ).fetchone()
+
+    def put(self, root, path, algorithm, key, digest):
+        size, mtime_ns, inode = key
+        self.connection.execute(
+            "INSERT OR REPLACE INTO digests (root, path, algorithm, size, mtime_ns, inode, digest) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (root, path, algorithm, size, mtime_ns, inode, digest),
+        )
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def record(self, root, path, algorithm, key, digest, cached):
+        """
+        Count a cache hit for a digest that was reused, or store a newly computed one.
+        """
+        if cached:
+            self.hits += 1
+        elif digest is not None:
+            self.misses += 1
+            self.put(root, path, algorithm, key, digest)
+
+    def commit(self):
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+History of the transfers and report of their throughput
+
+Every completed transfer adds its metrics (bytes, files, time of each stage, threads, source drive and exit codes) to a SQLite database in the logs folder. The threads and backend of each copy type are the ones used by its copy, from the policy of the copy type or the final number of adaptive threads. The report shows the throughput of the copy over time, by number of threads and by source drive, and flags the transfers that were much slower than the median of earlier transfers of a similar size.
+
+The throughput of a copy is computed from the bytes and files it transferred. A copy resumed with --resume only counts the missing files it copied. A copy that only skipped the files already in the destination, such as a copy after an earlier invocation of the same run without --resume or a robocopy copy with --resume, is recorded as resumed with an unknown transfer size, and is left out of the report.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import statistics
+
+history_file_name = "vizgen_transfer_history.sqlite"
+
+# transfers with a size within this factor of each other are comparable
+default_size_factor = 2.0
+
+# a transfer slower than the median throughput divided by this factor is flagged
+default_slow_factor = 1.5
+
+# minimum number of comparable earlier transfers needed to flag a transfer
+default_min_transfers = 3
+
+
+def get_copy_threads(info, copy_type):
+    """
+    Threads used by the copy of a copy type: the final number of adaptive threads as 'auto:<n>', or the threads of the policy of the copy type, or the threads of the run.
+    """
+    adaptive = info.get("adaptive_threads", dict())
+    if copy_type in adaptive:
+        return f"auto:{adaptive[copy_type]}"
+    policy = info.get("policies", dict()).get(copy_type, dict())
+    return str(policy.get("threads", info.get("threads")))
+
+
+def get_transferred(info, copy_type, metrics):
+    """
+    Whether the copy of a copy type was resumed, and the files and bytes it transferred, None when they are not known.
+    """
+    resume_totals = info.get("resume_totals", dict())
+    if copy_type in resume_totals:
+        totals = resume_totals[copy_type]
+        return True, totals["files"], totals["size_bytes"]
+    if info.get("resume") or info.get("resumed"):
+        # files already in the destination were skipped by the copy
+        return True, None, None
+    return False, metrics["files"], metrics["size_bytes"]
+
+
+def get_exit_code(copy_return):
+    """
+    Exit code from the copy message of a copy type, None for the native copy engine or a copy not run.
+    """
+    match = re.search(r"exit code '(-?\d+)'", copy_return or "")
+    return int(match.group(1)) if match else None
+
+
+class TransferHistory:
+    """
+    SQLite history of the transfers: one row per transfer, per copy type of a transfer and per stage. Several transfers can add to it at the same time.
+    """
+
+    def __init__(self, history_file):
+        self.history_file = history_file
+        self.connection = sqlite3.connect(history_file, timeout=300)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS transfers (
+                id INTEGER PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                started TEXT NOT NULL,
+                finished TEXT NOT NULL,
+                status TEXT NOT NULL,
+                os TEXT,
+                backend TEXT,
+                threads TEXT,
+                disk INTEGER,
+                total_seconds REAL,
+                files INTEGER,
+                size_bytes INTEGER,
+                metrics TEXT
+            );
+            CREATE TABLE IF NOT EXISTS copy_types (
+                transfer_id INTEGER NOT NULL REFERENCES transfers (id),
+                copy_type TEXT NOT NULL,
+                files INTEGER,
+                size_bytes INTEGER,
+                copy_seconds REAL,
+                exit_code INTEGER,
+                copy_return TEXT,
+                backend TEXT,
+                threads TEXT,
+                resumed INTEGER,
+                transferred_files INTEGER,
+                transferred_bytes INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS stages (
+                transfer_id INTEGER NOT NULL REFERENCES transfers (id),
+                copy_type TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                seconds REAL
+            );
+            CREATE INDEX IF NOT EXISTS copy_types_copy_type ON copy_types (copy_type);
+            """
+        )
+        self.connection.commit()
+
+    def record(self, report, copy_returns=None, status=None):
+        """
+        Add a transfer from its metrics report (see metrics.StageTimer.report) and the copy message of each copy type. Returns the id of the transfer.
+        """
+        copy_returns = copy_returns or dict()
+        info = report["info"]
+        copy_types = report["copy_types"]
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO transfers (run_id, started, finished, status, os, backend, threads, disk, total_seconds, files, size_bytes, metrics) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    report["run_id"],
+                    report["started"],
+                    report["finished"],
+                    status or report["status"],
+                    info.get("os"),
+                    info.get("backend"),
+                    str(info.get("threads")),
+                    int(bool(info.get("disk"))),
+                    report["total_seconds"],
+                    sum(x["files"] for x in copy_types.values()),
+                    sum(x["size_bytes"] for x in copy_types.values()),
+                    json.dumps(report),
+                ),
+            )
+            transfer_id = cursor.lastrowid
+            for copy_type, metrics in copy_types.items():
+                copy_seconds = metrics["stages"].get("copy", dict()).get("seconds")
+                policy = info.get("policies", dict()).get(copy_type, dict())
+                resumed, transferred_files, transferred_bytes = get_transferred(
+                    info, copy_type, metrics
+                )
+                self.connection.execute(
+                    "INSERT INTO copy_types (transfer_id, copy_type, files, size_bytes, copy_seconds, exit_code, copy_return, backend, threads, resumed, transferred_files, transferred_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        transfer_id,
+                        copy_type,
+                        metrics["files"],
+                        metrics["size_bytes"],
+                        copy_seconds,
+                        get_exit_code(copy_returns.get(copy_type)),
+                        copy_returns.get(copy_type),
+                        policy.get("backend", info.get("backend")),
+                        get_copy_threads(info, copy_type),
+                        int(resumed),
+                        transferred_files,
+                        transferred_bytes,
+                    ),
+                )
+            for record in report["stages"]:
+                self.connection.execute(
+                    "INSERT INTO stages (transfer_id, copy_type, stage, seconds) VALUES (?, ?, ?, ?)",
+                    (
+                        transfer_id,
+                        record["copy_type"] or "",
+                        record["stage"],
+                        record["seconds"],
+                    ),
+                )
+        return transfer_id
+
+    def copies(self, copy_types=None, status="completed"):
+        """
+        Copies of the transfers in the order they finished, with their throughput from the files and bytes they transferred, as dictionaries. The threads and backend are the ones used by the copy of the copy type. Copies restored from an earlier invocation (no copy time) and resumed copies with an unknown or empty transfer size are left out.
+        """
+        query = "SELECT t.id, t.run_id, t.finished, c.threads, t.disk, c.backend, c.copy_type, c.transferred_files, c.transferred_bytes, c.copy_seconds, c.exit_code, c.resumed FROM copy_types c JOIN transfers t ON t.id = c.transfer_id WHERE c.copy_seconds > 0 AND NOT (c.resumed = 1 AND (c.transferred_bytes IS NULL OR c.transferred_bytes = 0))"
+        parameters = list()
+        if status:
+            query += " AND t.status = ?"
+            parameters.append(status)
+        if copy_types:
+            query += f" AND c.copy_type IN ({', '.join('?' for _ in copy_types)})"
+            parameters.extend(copy_types)
+        query += " ORDER BY t.finished, t.id"
+        columns = [
+            "id",
+            "run_id",
+            "finished",
+            "threads",
+            "disk",
+            "backend",
+            "copy_type",
+            "files",
+            "size_bytes",
+            "copy_seconds",
+            "exit_code",
+            "resumed",
+        ]
+        copies = list()
+        for row in self.connection.execute(query, parameters):
+            copy = dict(zip(columns, row))
+            copy["mb_per_second"] = copy["size_bytes"] / (1024 * 1024) / copy["copy_seconds"]
+            copy["files_per_second"] = copy["files"] / copy["copy_seconds"]
+            copies.append(copy)
+        return copies
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def find_slow_copies(
+    copies,
+    size_factor=default_size_factor,
+    slow_factor=default_slow_factor,
+    min_transfers=default_min_transfers,
+):
+    """
+    Copies slower than the median throughput of the earlier copies of the same copy type with a size within 'size_factor' of theirs, divided by 'slow_factor'. Copies with fewer than 'min_transfers' comparable earlier copies are not flagged. Returns (copy, median MB/s, number of comparable copies) tuples.
+    """
+    slow = list()
+    for n, copy in enumerate(copies):
+        comparable = [
+            earlier["mb_per_second"]
+            for earlier in copies[:n]
+            if earlier["copy_type"] == copy["copy_type"]
+            and copy["size_bytes"] / size_factor
+            <= earlier["size_bytes"]
+            <= copy["size_bytes"] * size_factor
+        ]
+        if len(comparable) < min_transfers:
+            continue
+        median = statistics.median(comparable)
+        if copy["mb_per_second"] < median / slow_factor:
+            slow.append((copy, median, len(comparable)))
+    return slow
+
+
+def summarise(copies, key):
+    """
+    Number of copies and median MB/s and files/s of the copies grouped by key(copy).
+    """
+    groups = dict()
+    for copy in copies:
+        groups.setdefault(key(copy), list()).append(copy)
+    return [
+        (
+            group,
+            len(items),
+            statistics.median(x["mb_per_second"] for x in items),
+            statistics.median(x["files_per_second"] for x in items),
+        )
+        for group, items in sorted(groups.items())
+    ]
+
+
+def format_report(
+    copies,
+    size_factor=default_size_factor,
+    slow_factor=default_slow_factor,
+    min_transfers=default_min_transfers,
+):
+    """
+    Text report of the throughput of the copies by month, by threads and source drive, and of the slow copies.
+    """
+    if not copies:
+        return "No completed transfers in the history\n"
+    lines = list()
+
+    def table(title, header, rows):
+        lines.append(title)
+        lines.append("-" * len(title))
+        lines.append(header)
+        lines.extend(rows)
+        lines.append("")
+
+    table(
+        "Copy throughput by month",
+        f"{'Month':<8} {'Copy type':<10} {'Copies':>6} {'MB/s':>10} {'Files/s':>10}",
+        [
+            f"{month:<8} {copy_type:<10} {count:>6} {mb:>10.2f} {files:>10.2f}"
+            for (month, copy_type), count, mb, files in summarise(
+                copies, lambda x: (x["finished"][:7], x["copy_type"])
+            )
+        ],
+    )
+    table(
+        "Copy throughput by threads and source drive",
+        f"{'Copy type':<10} {'Threads':>7} {'Source':<14} {'Copies':>6} {'MB/s':>10} {'Files/s':>10}",
+        [
+            f"{copy_type:<10} {threads:>7} {'external disk' if disk else 'analysis drive':<14} {count:>6} {mb:>10.2f} {files:>10.2f}"
+            for (copy_type, threads, disk), count, mb, files in summarise(
+                copies, lambda x: (x["copy_type"], x["threads"], x["disk"])
+            )
+        ],
+    )
+    slow = find_slow_copies(copies, size_factor, slow_factor, min_transfers)
+    title = f"Copies more than {slow_factor}x slower than the median of earlier copies of a similar size (within {size_factor}x)"
+    if slow:
+        table(
+            title,
+            f"{'Finished':<19} {'Run':<32} {'Copy type':<10} {'Size (GB)':>10} {'MB/s':>10} {'Median MB/s':>11} {'Compared':>8}",
+            [
+                f"{copy['finished']:<19} {copy['run_id']:<32} {copy['copy_type']:<10} {copy['size_bytes'] / (1024 * 1024 * 1024):>10.3f} {copy['mb_per_second']:>10.2f} {median:>11.2f} {count:>8}"
+                for copy, median, count in slow
+            ],
+        )
+    else:
+        lines.extend([title, "-" * len(title), "None", ""])
+    return "\n".join(lines)
+
+
+def main():
+    # imported here, the transfer imports this module to record its metrics
+    from vizgen_data_transfer.__main__ import (
+        default_vizgen_config,
+        get_operating_system,
+        tomllib,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Report the throughput of the Vizgen data transfers recorded in the transfer history",
+        epilog=f"Contact: {__author__} ({__email__})",
+    )
+    parser.add_argument(
+        "--history",
+        help=f"Path to the history database [default: '{history_file_name}' in the logs folder of the config file]",
+    )
+    parser.add_argument(
+        "--copy_type",
+        nargs="+",
+        help="Only report these copy types, for example: raw_data",
+    )
+    parser.add_argument(
+        "--size_factor",
+        type=float,
+        default=default_size_factor,
+        help="Copies with a size within this factor of each other are compared",
+    )
+    parser.add_argument(
+        "--slow_factor",
+        type=float,
+        default=default_slow_factor,
+        help="Flag the copies slower than the median throughput of the comparable earlier copies divided by this factor",
+    )
+    parser.add_argument(
+        "--min_transfers",
+        type=int,
+        default=default_min_transfers,
+        help="Minimum number of comparable earlier copies needed to flag a copy",
+    )
+    parser.add_argument(
+        "--vizgen_config",
+        default=default_vizgen_config,
+        help="Path to vizgen config file",
+    )
+    args = parser.parse_args()
+
+    history_file = args.history
+    if not history_file:
+        with open(args.vizgen_config, "rb") as f:
+            config = tomllib.load(f)
+        log_dir = (
+            config["isilon_drive_logs_pc"]
+            if "windows" in get_operating_system()
+            else config["isilon_drive_logs_nix"]
+        )
+        history_file = os.path.join(log_dir, history_file_name)
+    if not os.path.exists(history_file):
+        raise ValueError(f"Error: Transfer history not found: {history_file}")
+
+    with TransferHistory(history_file) as history:
+        copies = history.copies(copy_types=args.copy_type)
+    print(f"Transfer history: {history_file}\n")
+    print(
+        format_report(copies, args.size_factor, args.slow_factor, args.min_transfers)
+    )
+
+
+if __name__ == "__main__":
+    main()
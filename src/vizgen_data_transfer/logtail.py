@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read the first or last lines of a log file without reading the whole file
+
+Robocopy logs written with /V /FP have one line per file, so they can be very large, while the header and footer checks only need a handful of lines at either end. The tail reader seeks to the end of the file and reads backwards block by block until it has enough lines, so the cost does not depend on the size of the log.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import codecs
+import locale
+
+default_block_size = 64 * 1024
+
+# byte order marks, the UTF-32 ones first as they start with the UTF-16 ones
+byte_order_marks = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+]
+
+
+def get_codec(log_file, encoding=None):
+    """
+    Codec of a file and the size of its byte order mark. A byte order mark at the start of the file, e.g. of a robocopy /UNILOG log in UTF-16, is used when no encoding is given or when the encoding does not say the byte order, otherwise the same default encoding as open(log_file, "r").
+    """
+    with open(log_file, "rb") as f:
+        head = f.read(4)
+    name = codecs.lookup(encoding).name if encoding else None
+    family = {"utf-8-sig": "utf-8"}.get(name, name)
+    if family in (None, "utf-8", "utf-16", "utf-32"):
+        for bom, codec in byte_order_marks:
+            if head.startswith(bom) and (family is None or codec.startswith(family)):
+                return codec, len(bom)
+    if name in ("utf-16", "utf-32"):
+        # no byte order mark, little endian as written on Windows
+        return f"{name}-le", 0
+    if name == "utf-8-sig":
+        return "utf-8", 0
+    return encoding or locale.getpreferredencoding(False), 0
+
+
+def _split(text):
+    # same line breaks as bytes.splitlines(), whatever the encoding
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def _breaks(text):
+    return text.count("\n") + text.count("\r") - text.count("\r\n")
+
+
+def read_head_lines(log_file, n, encoding=None, block_size=default_block_size):
+    """
+    Return the first 'n' lines of a file, with the line endings removed. Fewer lines are returned when the file is shorter.
+    """
+    codec, bom_size = get_codec(log_file, encoding)
+    decoder = codecs.getincrementaldecoder(codec)(errors="replace")
+    text = str()
+    with open(log_file, "rb") as f:
+        f.seek(bom_size)
+        while True:
+            block = f.read(block_size)
+            text += decoder.decode(block, final=not block)
+            # n complete lines need n line breaks
+            if not block or _breaks(text) >= n:
+                break
+    return _split(text)[:n]
+
+
+def read_tail_lines(log_file, n, encoding=None, block_size=default_block_size):
+    """
+    Return the last 'n' lines of a file, with the line endings removed, in the same order as f.readlines()[-n:]. Fewer lines are returned when the file is shorter.
+
+    The blocks are read backwards from the end of the file in whole code units of the encoding (2 bytes for UTF-16), so a line break is never split from its character. A character cut by the block boundary can only be in the first line read, which is dropped.
+    """
+    codec, bom_size = get_codec(log_file, encoding)
+    unit = len("\n".encode(codec))
+    block_size = max(unit, block_size - block_size % unit)
+    with open(log_file, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > bom_size:
+            read_size = min(block_size, position - bom_size)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+            # a trailing line break ends the last line, so n complete lines
+            # need n + 1 line breaks when the first one is a partial line
+            text = data.decode(codec, errors="replace")
+            if _breaks(text.rstrip("\r\n")) >= n:
+                break
+    lines = _split(data.decode(codec, errors="replace"))
+    if position > bom_size:
+        # the first line may have been cut by the block boundary
+        lines = lines[1:]
+    return lines[-n:] if n > 0 else []
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-file manifests of a copy type and a diff engine to compare them
+
+A manifest is a gzip compressed, tab separated file sorted by relative path with one line per entry:
+
+    <type>\t<size in bytes>\t<mtime in ns>\t<relative path>
+
+where type is 'f' for files and 'd' for folders. Relative paths always use '/' as the separator.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import gzip
+import heapq
+import shutil
+import tempfile
+from collections import namedtuple
+
+manifest_header = "# vizgen_data_transfer manifest v1"
+
+# default number of entries kept in memory before a sorted chunk is spilled to disk
+default_chunk_size = 200000
+
+ManifestEntry = namedtuple("ManifestEntry", ["path", "type", "size", "mtime"])
+
+
+def escape_path(path):
+    # tabs and newlines are field and record separators in the manifest
+    return path.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def unescape_path(path):
+    if "\\" not in path:
+        return path
+    out = list()
+    chars = iter(path)
+    for c in chars:
+        if c == "\\":
+            n = next(chars, "")
+            out.append({"t": "\t", "n": "\n"}.get(n, n))
+        else:
+            out.append(c)
+    return "".join(out)
+
+
+def format_entry(entry):
+    return f"{entry.type}\t{entry.size}\t{entry.mtime}\t{escape_path(entry.path)}\n"
+
+
+def parse_entry(line):
+    entry_type, size, mtime, path = line.rstrip("\n").split("\t", 3)
+    return ManifestEntry(unescape_path(path), entry_type, int(size), int(mtime))
+
+
+def read_manifest(manifest_file):
+    """
+    Stream the entries of a manifest file in path order.
+    """
+    with gzip.open(manifest_file, "rt", encoding="utf-8", newline="\n") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            yield parse_entry(line)
+
+
+def write_manifest(manifest_file, entries):
+    """
+    Write already sorted entries to a manifest file. The file is written to a temporary name first and renamed once complete, so a manifest on disk is never partial.
+    """
+    tmp_file = f"{manifest_file}.tmp"
+    with gzip.open(tmp_file, "wt", encoding="utf-8", newline="\n", compresslevel=1) as f:
+        f.write(f"{manifest_header}\n")
+        for entry in entries:
+            f.write(format_entry(entry))
+    os.replace(tmp_file, manifest_file)
+
+
+class ManifestWriter:
+    """
+    Collect manifest entries in any order and write them sorted by path.
+
+    At most 'chunk_size' entries are kept in memory. Larger manifests are sorted in chunks that are spilled to temporary files and merged on close, so memory stays bounded for millions of entries.
+    """
+
+    def __init__(self, manifest_file, chunk_size=default_chunk_size):
+        self.manifest_file = manifest_file
+        self.chunk_size = chunk_size
+        self.buffer = list()
+        self.chunks = list()
+        self.tmp_dir = None
+        self.count = 0
+
+    def add(self, path, entry_type, size=0, mtime=0):
+        self.buffer.append(ManifestEntry(path, entry_type, int(size), int(mtime)))
+        self.count += 1
+        if len(self.buffer) >= self.chunk_size:
+            self.spill()
+
+    def add_file(self, path, st):
+        self.add(path, "f", st.st_size, st.st_mtime_ns)
+
+    def add_dir(self, path):
+        self.add(path, "d")
+
+    def spill(self):
+        if not self.buffer:
+            return
+        if self.tmp_dir is None:
+            manifest_dir = os.path.dirname(os.path.abspath(self.manifest_file))
+            os.makedirs(manifest_dir, exist_ok=True)
+            self.tmp_dir = tempfile.mkdtemp(prefix=".manifest.", dir=manifest_dir)
+        self.buffer.sort()
+        chunk_file = os.path.join(self.tmp_dir, f"chunk_{len(self.chunks)}.tsv.gz")
+        write_manifest(chunk_file, self.buffer)
+        self.chunks.append(chunk_file)
+        self.buffer = list()
+
+    def close(self):
+        os.makedirs(
+            os.path.dirname(os.path.abspath(self.manifest_file)), exist_ok=True
+        )
+        try:
+            if not self.chunks:
+                self.buffer.sort()
+                write_manifest(self.manifest_file, self.buffer)
+            else:
+                self.spill()
+                write_manifest(
+                    self.manifest_file,
+                    heapq.merge(*[read_manifest(c) for c in self.chunks]),
+                )
+        finally:
+            self.buffer = list()
+            if self.tmp_dir is not None:
+                shutil.rmtree(self.tmp_dir, ignore_errors=True)
+                self.tmp_dir = None
+        return self.manifest_file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.tmp_dir is not None:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def diff_manifests(source_manifest, destination_manifest, include_dirs=False):
+    """
+    Compare two manifests and yield (kind, source_entry, destination_entry) for every difference, where kind is one of:
+
+    - 'missing': present in the source but not in the destination
+    - 'extra': present in the destination but not in the source
+    - 'size_mismatch': a file present in both with a different size
+
+    Both manifests are sorted by path, so they are merged in a single streaming pass and memory use does not depend on the number of entries.
+    """
+    source = read_manifest(source_manifest)
+    destination = read_manifest(destination_manifest)
+    if not include_dirs:
+        source = (e for e in source if e.type == "f")
+        destination = (e for e in destination if e.type == "f")
+    src = next(source, None)
+    dst = next(destination, None)
+    while src is not None or dst is not None:
+        if dst is None or (src is not None and src.path < dst.path):
+            yield "missing", src, None
+            src = next(source, None)
+        elif src is None or dst.path < src.path:
+            yield "extra", None, dst
+            dst = next(destination, None)
+        else:
+            if src.type == "f" and dst.type == "f" and src.size != dst.size:
+                yield "size_mismatch", src, dst
+            elif src.type != dst.type:
+                yield "missing", src, None
+                yield "extra", None, dst
+            src = next(source, None)
+            dst = next(destination, None)
+
+
+def summarise_diff(source_manifest, destination_manifest, max_examples=20):
+    """
+    Count the differences between two manifests and keep up to 'max_examples' example paths for each kind of difference.
+    """
+    summary = {
+        kind: {"count": 0, "examples": list()}
+        for kind in ("missing", "extra", "size_mismatch")
+    }
+    for kind, src, dst in diff_manifests(source_manifest, destination_manifest):
+        summary[kind]["count"] += 1
+        if len(summary[kind]["examples"]) < max_examples:
+            if kind == "size_mismatch":
+                summary[kind]["examples"].append(
+                    f"{src.path} (source: {src.size} bytes, destination: {dst.size} bytes)"
+                )
+            else:
+                summary[kind]["examples"].append((src or dst).path)
+    return summary
+
+
+def merge_manifests(base_manifest, update_manifest, manifest_file):
+    """
+    Write a manifest holding the entries of both manifests, where an entry of 'update_manifest' replaces the entry with the same path in 'base_manifest'. Both are streamed, so memory does not depend on their size. Returns the number of files, folders and total size in bytes of the merged manifest.
+    """
+    totals = {"files": 0, "folders": 0, "size_bytes": 0}
+
+    def unique(entries):
+        # the same path can be listed more than once, e.g. a folder logged by
+        # several rsync workers, keep one entry per path
+        previous = None
+        for entry in entries:
+            if previous is not None and entry.path != previous.path:
+                yield previous
+            previous = entry
+        if previous is not None:
+            yield previous
+
+    def merged():
+        base = unique(read_manifest(base_manifest))
+        update = unique(read_manifest(update_manifest))
+        b = next(base, None)
+        u = next(update, None)
+        while b is not None or u is not None:
+            if u is None or (b is not None and b.path < u.path):
+                entry, b = b, next(base, None)
+            elif b is None or u.path < b.path:
+                entry, u = u, next(update, None)
+            else:
+                entry, b, u = u, next(base, None), next(update, None)
+            if entry.type == "f":
+                totals["files"] += 1
+                totals["size_bytes"] += entry.size
+            else:
+                totals["folders"] += 1
+            yield entry
+
+    write_manifest(manifest_file, merged())
+    return totals
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hierarchical (Merkle style) digests of the folders of a manifest
+
+The digest of a folder is built from the names, sizes and modification times (and optionally the content digests) of its files and from the names and digests of its sub folders. Two trees with the same top digest hold the same files, and when the digests differ, comparing them top-down only descends into the sub folders whose digests differ. The mismatches are then localised to the deepest folders that differ, for example a single FOV of a region, instead of the total of a copy type.
+
+The digests are built from the full before and after transfer manifests, so building them reads every entry of both, as the manifest diff does. Only the comparison of the two trees is proportional to the number of folders that changed.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import gzip
+import json
+import hashlib
+from collections import deque
+
+from vizgen_data_transfer.manifest import read_manifest
+
+default_algorithm = "sha256"
+
+
+def _parent(path):
+    parent, _, name = path.rpartition("/")
+    return parent, name
+
+
+def _new_folder(algorithm):
+    return {
+        "files": hashlib.new(algorithm),
+        "subdirs": set(),
+        "file_count": 0,
+        "size_bytes": 0,
+    }
+
+
+def tree_digests(
+    manifest_file, content=None, include_mtime=True, algorithm=default_algorithm
+):
+    """
+    Compute the digest of every folder of a manifest. Returns a dictionary keyed by the relative folder path ('' for the top folder) with the folder digest, the digest of its own files, the names of its sub folders, and the number of files and bytes below it.
+
+    content(path), when given, returns the content digest of a file (or None), which is then part of the digest. Modification times are compared to the second, as rsync and robocopy do, and can be left out with include_mtime=False.
+
+    The manifest is streamed, only one entry per folder is kept in memory.
+    """
+    folders = {"": _new_folder(algorithm)}
+    for entry in read_manifest(manifest_file):
+        parent, name = _parent(entry.path)
+        if parent not in folders:
+            folders[parent] = _new_folder(algorithm)
+        if entry.type == "d":
+            folders[parent]["subdirs"].add(name)
+            if entry.path not in folders:
+                folders[entry.path] = _new_folder(algorithm)
+            continue
+        mtime = entry.mtime // 1000000000 if include_mtime else 0
+        digest = content(entry.path) if content else None
+        # files of a folder are in path order in the manifest
+        folders[parent]["files"].update(
+            f"{name}\0{entry.size}\0{mtime}\0{digest or ''}\n".encode(
+                "utf-8", errors="surrogateescape"
+            )
+        )
+        folders[parent]["file_count"] += 1
+        folders[parent]["size_bytes"] += entry.size
+
+    # folders listed only as the parent of a file are sub folders too
+    for path in list(folders):
+        if path:
+            parent, name = _parent(path)
+            folders.setdefault(parent, _new_folder(algorithm))["subdirs"].add(name)
+
+    # deepest folders first, so the digests of the sub folders are known
+    digests = dict()
+    for path in sorted(folders, key=lambda p: p.count("/") + bool(p), reverse=True):
+        folder = folders[path]
+        files_digest = folder["files"].hexdigest()
+        subdirs = sorted(folder["subdirs"])
+        digest = hashlib.new(algorithm)
+        digest.update(f"{files_digest}\n".encode())
+        file_count = folder["file_count"]
+        size_bytes = folder["size_bytes"]
+        for name in subdirs:
+            child = digests[f"{path}/{name}" if path else name]
+            digest.update(
+                f"{name}\0{child['digest']}\n".encode("utf-8", errors="surrogateescape")
+            )
+            file_count += child["file_count"]
+            size_bytes += child["size_bytes"]
+        digests[path] = {
+            "digest": digest.hexdigest(),
+            "files_digest": files_digest,
+            "subdirs": subdirs,
+            "file_count": file_count,
+            "size_bytes": size_bytes,
+        }
+    return digests
+
+
+def compare_tree_digests(source, destination):
+    """
+    Compare the folder digests of two trees top-down and return the folders where they differ, with the number of folders compared.
+
+    Each difference is a (kind, path) tuple where kind is 'missing' (folder only in the source), 'extra' (folder only in the destination) or 'files' (the files directly in the folder differ). Folders with the same digest on both sides are not descended into.
+    """
+    differences = list()
+    visited = 0
+    queue = deque([""])
+    while queue:
+        path = queue.popleft()
+        visited += 1
+        src = source.get(path)
+        dst = destination.get(path)
+        if dst is None:
+            differences.append(("missing", path))
+            continue
+        if src is None:
+            differences.append(("extra", path))
+            continue
+        if src["digest"] == dst["digest"]:
+            continue
+        if src["files_digest"] != dst["files_digest"]:
+            differences.append(("files", path))
+        for name in sorted(set(src["subdirs"]) | set(dst["subdirs"])):
+            queue.append(f"{path}/{name}" if path else name)
+    return differences, visited
+
+
+def write_tree_digests(digests_file, digests):
+    with gzip.open(digests_file, "wt", encoding="utf-8") as f:
+        json.dump(digests, f)
+
+
+def read_tree_digests(digests_file):
+    with gzip.open(digests_file, "rt", encoding="utf-8") as f:
+        return json.load(f)
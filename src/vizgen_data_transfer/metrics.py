@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timing of the stages of a transfer and the JSON metrics report of a run
+
+Every stage (config load, run folder checks, scans, robocopy lists, copy, checks, email) is timed for each copy type. The metrics report written to '<run_id>.metrics.json' in the logs folder lists the stages in the order they ran, the time spent in each stage per copy type and the files/s and MB/s of each stage against the before transfer counts.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+metrics_version = 1
+
+
+def get_rates(seconds, files, size_bytes):
+    """
+    Files/s and MB/s of a stage that handled 'files' files and 'size_bytes' bytes in 'seconds'.
+    """
+    if not seconds:
+        return {"files_per_second": None, "mb_per_second": None}
+    return {
+        "files_per_second": round(files / seconds, 3),
+        "mb_per_second": round(size_bytes / (1024 * 1024) / seconds, 3),
+    }
+
+
+class StageTimer:
+    """
+    Wall clock time of the stages of a run. Stages of different copy types can run at the same time in several threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.started = datetime.now()
+        self.stages = list()
+        # profiling.StageProfiler of the stages, with --profile
+        self.profiler = None
+
+    @contextmanager
+    def stage(self, name, copy_type=None):
+        """
+        Time the code run inside the 'with' block as stage 'name' of 'copy_type' (None for the stages of the whole run). A stage that raises an error is recorded as failed.
+        """
+        profiler = self.profiler
+        if profiler:
+            profiler.start_stage(name, copy_type)
+        started = datetime.now()
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            yield
+            status = "complete"
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler:
+                profiler.stop_stage(name, copy_type, round(seconds, 3))
+            with self.lock:
+                self.stages.append(
+                    {
+                        "stage": name,
+                        "copy_type": copy_type,
+                        "started": started.isoformat(timespec="seconds"),
+                        "seconds": round(seconds, 3),
+                        "status": status,
+                    }
+                )
+            logging.info(
+                f"Stage '{name}'{f' for {copy_type}' if copy_type else ''} {status} in {seconds:.3f} seconds"
+            )
+
+    def report(self, run_id, counts, info=None, status="complete"):
+        """
+        Metrics report of the run. 'counts' holds the before transfer counts (files and size_bytes) of each copy type, used for the files/s and MB/s of its stages, and 'info' any other run details (threads, backend, options).
+        """
+        with self.lock:
+            stages = list(self.stages)
+        copy_types = dict()
+        totals = dict()
+        for record in stages:
+            totals[record["stage"]] = totals.get(record["stage"], 0) + record["seconds"]
+            if record["copy_type"] is None:
+                continue
+            copy_type = copy_types.setdefault(
+                record["copy_type"],
+                {
+                    "files": counts.get(record["copy_type"], dict()).get("files", 0),
+                    "size_bytes": counts.get(record["copy_type"], dict()).get(
+                        "size_bytes", 0
+                    ),
+                    "stages": dict(),
+                },
+            )
+            stage = copy_type["stages"].setdefault(record["stage"], {"seconds": 0})
+            stage["seconds"] += record["seconds"]
+        for copy_type in copy_types.values():
+            for stage in copy_type["stages"].values():
+                stage["seconds"] = round(stage["seconds"], 3)
+                stage.update(
+                    get_rates(stage["seconds"], copy_type["files"], copy_type["size_bytes"])
+                )
+        return {
+            "version": metrics_version,
+            "run_id": run_id,
+            "status": status,
+            "started": self.started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - self.start, 3),
+            "info": info or dict(),
+            "stage_totals": {stage: round(seconds, 3) for stage, seconds in totals.items()},
+            "copy_types": copy_types,
+            "stages": stages,
+        }
+
+
+def write_metrics(metrics_file, report):
+    tmp_file = f"{metrics_file}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_file, metrics_file)
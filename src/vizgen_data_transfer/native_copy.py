@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Native Python copy engine, used as an alternative to rsync and robocopy
+
+Files are copied by a pool of worker threads. On Linux the data is copied kernel side with os.copy_file_range, falling back to os.sendfile and finally to a buffered copy. A method copying fewer bytes than the size of the source also falls back to the next one, and a file still short after the buffered copy fails. Each file is written to a temporary name next to the destination, its modification time is set to the one of the source and it is then renamed in place, so a destination file is either absent or complete.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import time
+import errno
+import shutil
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# suffix of the temporary files written before the atomic rename
+partial_suffix = ".vdt-partial"
+
+# default read/write size for each kernel or buffered copy call
+default_buffer_size = 8 * 1024 * 1024
+
+# header and footer written to the log file, used to check the log is complete
+log_header = "NATIVE COPY     ::     vizgen_data_transfer copy engine"
+log_footer = "NATIVE COPY COMPLETE"
+
+# errors meaning the zero-copy call is not supported for this pair of files
+_fallback_errors = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+}
+
+
+def _copy_file_range(fsrc, fdst, buffer_size):
+    copied = 0
+    while True:
+        n = os.copy_file_range(fsrc, fdst, buffer_size)
+        if n == 0:
+            return copied
+        copied += n
+
+
+def _sendfile(fsrc, fdst, buffer_size):
+    copied = 0
+    while True:
+        n = os.sendfile(fdst, fsrc, copied, buffer_size)
+        if n == 0:
+            return copied
+        copied += n
+
+
+def _buffered(fsrc, fdst, buffer_size):
+    copied = 0
+    with os.fdopen(os.dup(fsrc), "rb") as src, os.fdopen(os.dup(fdst), "wb") as dst:
+        src.seek(0)
+        dst.seek(0)
+        while True:
+            chunk = src.read(buffer_size)
+            if not chunk:
+                break
+            dst.write(chunk)
+            copied += len(chunk)
+    return copied
+
+
+def copy_file(source, destination, buffer_size=default_buffer_size):
+    """
+    Copy a single file to a temporary name next to 'destination', preserve the source modification time and rename it in place. Returns the number of bytes copied and the method used.
+    """
+    tmp_file = f"{destination}{partial_suffix}"
+    st = os.stat(source)
+    method = None
+    copied = 0
+    try:
+        fsrc = os.open(source, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            fdst = os.open(
+                tmp_file,
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+                0o644,
+            )
+            try:
+                for name, func in (
+                    ("copy_file_range", _copy_file_range),
+                    ("sendfile", _sendfile),
+                ):
+                    if not hasattr(os, name):
+                        continue
+                    try:
+                        copied = func(fsrc, fdst, buffer_size)
+                        # some file systems (FUSE, CIFS, overlay) return 0
+                        # before the end of the file, the copy is then short
+                        if copied == st.st_size:
+                            method = name
+                            break
+                    except OSError as e:
+                        if e.errno not in _fallback_errors:
+                            raise
+                    # start again from the beginning with the next method
+                    os.lseek(fsrc, 0, os.SEEK_SET)
+                    os.lseek(fdst, 0, os.SEEK_SET)
+                    os.ftruncate(fdst, 0)
+                if method is None:
+                    copied = _buffered(fsrc, fdst, buffer_size)
+                    method = "buffered"
+                if copied != st.st_size:
+                    raise OSError(
+                        errno.EIO,
+                        f"Copied {copied} of the {st.st_size} bytes of the source file",
+                        source,
+                    )
+            finally:
+                os.close(fdst)
+        finally:
+            os.close(fsrc)
+        shutil.copymode(source, tmp_file)
+        os.utime(tmp_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp_file, destination)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    return copied, method
+
+
+def is_up_to_date(source_size, source_mtime_ns, destination):
+    """
+    Same quick check as rsync: a destination file with the same size and modification time (to the second) as the source is not copied again.
+    """
+    try:
+        st = os.stat(destination)
+    except OSError:
+        return False
+    return st.st_size == source_size and (
+        st.st_mtime_ns // 1000000000 == source_mtime_ns // 1000000000
+    )
+
+
+def _copy_entry(source_root, destination_root, path, long_path, buffer_size):
+    source = os.path.join(source_root, *path.split("/"))
+    destination = os.path.join(destination_root, *path.split("/"))
+    if long_path:
+        source = long_path(source)
+        destination = long_path(destination)
+    start = time.perf_counter()
+    record = {"path": path, "size": 0, "status": None, "method": None, "error": None}
+    try:
+        st = os.stat(source)
+        record["size"] = st.st_size
+        if is_up_to_date(st.st_size, st.st_mtime_ns, destination):
+            record["status"] = "skipped"
+        else:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            copied, record["method"] = copy_file(source, destination, buffer_size)
+            record["size"] = copied
+            record["status"] = "copied"
+    except OSError as e:
+        record["status"] = "failed"
+        record["error"] = str(e)
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def copy_tree(
+    source_root,
+    destination_root,
+    paths,
+    workers=1,
+    buffer_size=default_buffer_size,
+    on_record=None,
+    long_path=None,
+    controller=None,
+):
+    """
+    Copy the files with the given relative paths from 'source_root' to 'destination_root' using 'workers' threads.
+
+    With an adaptive.AdaptiveConcurrency 'controller', the number of files copied at the same time follows controller.workers instead, up to controller.max_workers threads, and a failed file is copied again up to controller.retries times before it is recorded as failed.
+
+    on_record(record) is called from the calling thread for every file, as soon as it is done, with a dictionary holding the path, size, status ('copied', 'skipped' or 'failed'), copy method, error and seconds. At most twice as many files as workers are in flight at any time, so the list of paths can be a generator over a very large manifest.
+
+    Returns the totals of files copied, skipped and failed and bytes copied.
+    """
+    totals = {"copied": 0, "skipped": 0, "failed": 0, "size_bytes": 0}
+    workers = max(1, int(workers))
+    if controller:
+        workers = controller.max_workers
+    paths = iter(paths)
+    attempts = dict()
+
+    def handle(record):
+        if controller:
+            if record["status"] == "failed":
+                attempts[record["path"]] = attempts.get(record["path"], 0) + 1
+                if attempts[record["path"]] <= controller.retries:
+                    controller.record(retried=True)
+                    return record["path"]
+                controller.record(failed=True)
+            else:
+                controller.record(record["size"] if record["status"] == "copied" else 0)
+        totals[record["status"]] += 1
+        if record["status"] == "copied":
+            totals["size_bytes"] += record["size"]
+        if on_record:
+            on_record(record)
+
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="native_copy"
+    ) as executor:
+        pending = set()
+        exhausted = False
+        retry = list()
+        while pending or retry or not exhausted:
+            # files in flight, exactly the workers chosen by the controller
+            limit = controller.workers if controller else 2 * workers
+            while (retry or not exhausted) and len(pending) < limit:
+                path = retry.pop() if retry else next(paths, None)
+                if path is None:
+                    exhausted = True
+                    break
+                pending.add(
+                    executor.submit(
+                        _copy_entry,
+                        source_root,
+                        destination_root,
+                        path,
+                        long_path,
+                        buffer_size,
+                    )
+                )
+            if not pending:
+                break
+            done, pending = wait(
+                pending,
+                timeout=controller.time_left() if controller else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                path = handle(future.result())
+                if path:
+                    retry.append(path)
+            if controller:
+                controller.update()
+    return totals
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transfer policies of the copy types, from the [tool.options.policy.<copy_type>] tables of the config
+
+raw_data is a few thousand very large images while analysis is tens of thousands of small files, so each copy type can have its own copy settings:
+
+    backend       copy backend, as --backend
+    threads       copy threads, a number or 'auto', as --threads
+    rsync_shards  parallel rsync workers, as --rsync_shards
+    buffer_size   read/write size of the native copy engine, in bytes or with a K, M or G suffix
+    verify        checks after the copy: 'counts', 'checksum', 'tree_digest' or 'full' (checksum and tree digest)
+    order         order in which the native copy engine copies the files: 'path', 'largest_first' or 'smallest_first'
+    rsync         rsync options, replacing [tool.options] rsync
+    robocopy      robocopy options, replacing [tool.options] robocopy
+
+A value of a policy replaces the default of the command line option of the same name. An option given on the command line applies to every copy type instead. --checksum and --tree_digest add to the verification of every policy.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import re
+import logging
+
+copy_types = ["raw_data", "analysis", "output"]
+
+policy_keys = [
+    "backend",
+    "threads",
+    "rsync_shards",
+    "buffer_size",
+    "verify",
+    "order",
+    "rsync",
+    "robocopy",
+]
+
+backends = ["auto", "rsync", "robocopy", "native"]
+
+# checksum and tree digest of each verification depth
+verify_levels = {
+    "counts": (False, False),
+    "checksum": (True, False),
+    "tree_digest": (False, True),
+    "full": (True, True),
+}
+
+file_orders = ["path", "largest_first", "smallest_first"]
+
+size_units = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_size(value):
+    """
+    Size in bytes of a number or a string such as '512K', '16M' or '1G'. Returns None when not a positive size.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if value > 0 else None
+    match = re.fullmatch(r"\s*(\d+)\s*([KMG]?)i?B?\s*", str(value), re.IGNORECASE)
+    if not match:
+        return None
+    size = int(match.group(1)) * size_units[match.group(2).upper()]
+    return size if size > 0 else None
+
+
+def get_verify_level(checksum, tree_digest):
+    for level, checks in verify_levels.items():
+        if checks == (bool(checksum), bool(tree_digest)):
+            return level
+
+
+def check_policy(copy_type, table):
+    """
+    Check the keys and values of the policy table of a copy type. Raises ValueError for an unknown copy type, key or value.
+    """
+    name = f"[tool.options.policy.{copy_type}]"
+    if copy_type not in copy_types:
+        raise ValueError(
+            f"Error: unknown copy type in the config: {name}, expected one of: {', '.join(copy_types)}"
+        )
+    if not isinstance(table, dict):
+        raise ValueError(f"Error: {name} in the config must be a table")
+    unknown = [key for key in table if key not in policy_keys]
+    if unknown:
+        raise ValueError(
+            f"Error: unknown option(s) in {name} of the config: {', '.join(unknown)}. Expected: {', '.join(policy_keys)}"
+        )
+    checks = {
+        "backend": lambda x: x in backends,
+        "threads": lambda x: str(x).lower() == "auto"
+        or (str(x).isdigit() and int(x) >= 1),
+        "rsync_shards": lambda x: str(x).isdigit() and int(x) >= 1,
+        "buffer_size": lambda x: parse_size(x) is not None,
+        "verify": lambda x: x in verify_levels,
+        "order": lambda x: x in file_orders,
+        "rsync": lambda x: isinstance(x, str),
+        "robocopy": lambda x: isinstance(x, str),
+    }
+    for key, value in table.items():
+        if not checks[key](value):
+            raise ValueError(
+                f"Error: invalid value for '{key}' in {name} of the config: '{value}'"
+            )
+
+
+def resolve_copy_policies(tables, defaults, explicit=(), tool="rsync"):
+    """
+    Policy of each copy type: 'defaults' (the command line options and [tool.options]) updated with the policy table of the copy type from 'tables', except for the keys in 'explicit' given on the command line. 'tool' is the copy tool of the operating system, whose options are read from the policy.
+    """
+    policies = dict()
+    for copy_type, table in tables.items():
+        check_policy(copy_type, table)
+    for copy_type in copy_types:
+        table = tables.get(copy_type, dict())
+        policy = dict(defaults)
+        for key, value in table.items():
+            if key in ("rsync", "robocopy"):
+                if key == tool:
+                    policy["tool_options"] = value
+            elif key == "verify":
+                checksum, tree_digest = verify_levels[value]
+                policy["checksum"] = policy["checksum"] or checksum
+                policy["tree_digest"] = policy["tree_digest"] or tree_digest
+            elif key in explicit:
+                logging.info(
+                    f"Policy of {copy_type}: '{key}' set to '{value}' in the config, using '{defaults[key]}' from the command line instead"
+                )
+            elif key == "buffer_size":
+                policy[key] = parse_size(value)
+            elif key == "threads":
+                policy[key] = "auto" if str(value).lower() == "auto" else int(value)
+            elif key == "rsync_shards":
+                policy[key] = int(value)
+            else:
+                policy[key] = value
+        policy["verify"] = get_verify_level(policy["checksum"], policy["tree_digest"])
+        policies[copy_type] = policy
+    return policies
+
+
+def order_entries(entries, order="path"):
+    """
+    (relative path, size) entries in the given order. Entries in 'path' order are streamed, the other orders need the whole list.
+    """
+    if order == "largest_first":
+        return sorted(entries, key=lambda x: x[1], reverse=True)
+    if order == "smallest_first":
+        return sorted(entries, key=lambda x: x[1])
+    return entries
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run the copy tools with their output streamed to the logger line by line
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import time
+import logging
+import threading
+import subprocess
+from collections import deque
+
+# number of output lines kept for the error emails
+default_tail_lines = 200
+
+# log a heartbeat when a command has been silent for this many seconds
+default_heartbeat = 600
+
+
+def _read_stream(stream, tail, level, prefix, on_line, state):
+    for line in stream:
+        line = line.rstrip("\r\n")
+        state["last_output"] = time.perf_counter()
+        state["lines"] += 1
+        tail.append(line)
+        # lines handled by on_line, for example progress updates, are not logged
+        if on_line and on_line(line):
+            continue
+        if line:
+            logging.log(level, f"{prefix}{line}")
+    stream.close()
+
+
+def run_command(
+    cmd,
+    check=True,
+    tail_lines=default_tail_lines,
+    prefix="",
+    on_line=None,
+    heartbeat=default_heartbeat,
+):
+    """
+    Run a shell command and forward its stdout (INFO) and stderr (WARNING) to the logger as the lines arrive, instead of buffering the whole output until the command exits.
+
+    Only the last 'tail_lines' lines of each stream are kept, and they are returned as the stdout and stderr of a subprocess.CompletedProcess. With check=True a subprocess.CalledProcessError holding the same tails is raised for a non-zero exit code, so callers can handle it the same way as subprocess.run(..., capture_output=True, check=True).
+
+    on_line(line) is called for every stdout line, for example to follow the progress of a copy, and the line is not logged when it returns True. While the command runs without any output, a heartbeat message is logged every 'heartbeat' seconds so that a hung transfer can be spotted in the log.
+    """
+    stdout_tail = deque(maxlen=tail_lines)
+    stderr_tail = deque(maxlen=tail_lines)
+    state = {"last_output": time.perf_counter(), "lines": 0}
+    start = time.perf_counter()
+
+    process = subprocess.Popen(
+        cmd,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        bufsize=1,
+    )
+    readers = [
+        threading.Thread(
+            target=_read_stream,
+            args=(process.stdout, stdout_tail, logging.INFO, prefix, on_line, state),
+            daemon=True,
+        ),
+        threading.Thread(
+            target=_read_stream,
+            args=(
+                process.stderr,
+                stderr_tail,
+                logging.WARNING,
+                f"{prefix}STDERR: ",
+                None,
+                state,
+            ),
+            daemon=True,
+        ),
+    ]
+    for reader in readers:
+        reader.start()
+
+    while True:
+        try:
+            returncode = process.wait(timeout=heartbeat)
+            break
+        except subprocess.TimeoutExpired:
+            now = time.perf_counter()
+            if now - state["last_output"] >= heartbeat:
+                logging.info(
+                    f"{prefix}Command still running after {now - start:.0f} seconds, {state['lines']} lines of output so far, no output for the last {now - state['last_output']:.0f} seconds: {cmd}"
+                )
+    for reader in readers:
+        reader.join()
+
+    stdout = "\n".join(stdout_tail)
+    stderr = "\n".join(stderr_tail)
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, returncode, stdout=stdout, stderr=stderr)
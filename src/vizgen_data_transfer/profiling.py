@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU and memory profiles of the stages of a transfer (--profile)
+
+The whole run is profiled with cProfile, with a separate profile for each stage timed by metrics.StageTimer, so the Python work of a stage (walking, parsing and reading logs, building the summary) can be told apart from the time spent waiting for rsync or robocopy. A stage started inside another stage pauses the profile of the outer stage, and the time outside all stages goes to the profile of the run. Work done by worker threads started inside a stage (scandir scan threads, native copy workers, checksum workers) is not in the profile of the stage.
+
+Memory is traced with tracemalloc, recording the memory in use at the end of each stage and the peak during the stage. The peak of tracemalloc is shared by the whole process, so the peak of a stage running at the same time as a stage of another thread (--parallel_copy_types, or another run of the batch mode) cannot be told apart from the other one: such stages are marked as overlapped and only the peak of the run is recorded for them. The profile folder '<run_id>.profile' in the logs folder holds one pstats dump per stage, 'memory.json' and 'summary.txt' with the hot spots of the whole run.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import re
+import json
+import time
+import pstats
+import shutil
+import cProfile
+import logging
+import threading
+import tracemalloc
+
+# number of functions and allocation sites listed in the summary
+default_top = 30
+
+# frames kept for each allocation traced by tracemalloc
+default_frames = 1
+
+# stages being profiled by all the profilers of the process, as tracemalloc and
+# its peak are shared by the whole process
+_open_stages = list()
+_open_stages_lock = threading.Lock()
+
+
+def _update_peaks():
+    """
+    Add the peak traced since the last call to the peaks of the open stages and reset it. Called with _open_stages_lock held, returns the peak.
+    """
+    peak = tracemalloc.get_traced_memory()[1]
+    for stage in _open_stages:
+        stage["peak_bytes"] = max(stage["peak_bytes"], peak)
+    tracemalloc.reset_peak()
+    return peak
+
+
+class StageProfiler:
+    """
+    cProfile and tracemalloc profiles of the stages of a run, written to 'profile_dir'. Set it as the 'profiler' of a metrics.StageTimer and call start() and stop() around the run.
+    """
+
+    def __init__(self, profile_dir, top=default_top):
+        self.profile_dir = profile_dir
+        self.top = top
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.count = 0
+        self.stages = list()
+        self.tracing = False
+        self.start_time = None
+        self.peak = 0
+        self.warned = False
+
+    def _stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = list()
+        return self.local.stack
+
+    def _enable(self):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # only one cProfile can be active at a time from Python 3.12,
+            # concurrent stages of other threads are then not profiled
+            if not self.warned:
+                logging.warning(f"Unable to profile a stage: {e}")
+                self.warned = True
+            return None
+        return profile
+
+    def _dump(self, profile, name, copy_type):
+        with self.lock:
+            self.count += 1
+            count = self.count
+        label = re.sub(r"[^\w.-]", "_", f"{name}.{copy_type}" if copy_type else name)
+        profile_file = os.path.join(self.profile_dir, f"{count:03d}.{label}.prof")
+        profile.dump_stats(profile_file)
+        return profile_file
+
+    def start(self, profile_run=True):
+        """
+        Start tracing memory and, with profile_run=True, profiling the run in the current thread. stop() has to be called from the same thread.
+        """
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        # tracemalloc is shared by the whole process, it may already be
+        # tracing for another run of the batch mode
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(default_frames)
+            self.tracing = True
+        self.start_time = time.perf_counter()
+        if profile_run:
+            self._stack().append(self._enable())
+        logging.info(f"Profiling the run, profiles written to: {self.profile_dir}")
+
+    def _memory_stack(self):
+        if not hasattr(self.local, "memory_stack"):
+            self.local.memory_stack = list()
+        return self.local.memory_stack
+
+    def start_stage(self, name, copy_type=None):
+        stack = self._stack()
+        if stack and stack[-1] is not None:
+            stack[-1].disable()
+        thread = threading.get_ident()
+        with _open_stages_lock:
+            peak = _update_peaks()
+            stage = {
+                "thread": thread,
+                "peak_bytes": tracemalloc.get_traced_memory()[0],
+                "overlapped": False,
+            }
+            # stages of other threads change the peak of this one
+            for other in _open_stages:
+                if other["thread"] != thread:
+                    other["overlapped"] = stage["overlapped"] = True
+            _open_stages.append(stage)
+        with self.lock:
+            self.peak = max(self.peak, peak)
+        self._memory_stack().append(stage)
+        stack.append(self._enable())
+
+    def stop_stage(self, name, copy_type=None, seconds=None):
+        stack = self._stack()
+        profile = stack.pop() if stack else None
+        stage = self._memory_stack().pop()
+        with _open_stages_lock:
+            peak = _update_peaks()
+            # by identity, stages of other threads may hold the same values
+            _open_stages[:] = [x for x in _open_stages if x is not stage]
+            current = tracemalloc.get_traced_memory()[0]
+        profile_file = None
+        with self.lock:
+            self.peak = max(self.peak, peak)
+        if profile is not None:
+            profile.disable()
+            profile_file = self._dump(profile, name, copy_type)
+        with self.lock:
+            self.stages.append(
+                {
+                    "stage": name,
+                    "copy_type": copy_type,
+                    "seconds": seconds,
+                    "current_bytes": current,
+                    # only the peak of the run is known for overlapped stages
+                    "peak_bytes": (
+                        None if stage["overlapped"] else stage["peak_bytes"]
+                    ),
+                    "overlapped": stage["overlapped"],
+                    "profile": (
+                        os.path.basename(profile_file) if profile_file else None
+                    ),
+                }
+            )
+        if stack and stack[-1] is not None:
+            stack[-1].enable()
+
+    def stop(self):
+        """
+        Stop profiling the run and write 'memory.json' and 'summary.txt'. Returns the path to the summary.
+        """
+        stack = self._stack()
+        while stack:
+            profile = stack.pop()
+            if profile is not None:
+                profile.disable()
+                self._dump(profile, "run", None)
+        seconds = time.perf_counter() - self.start_time
+        with _open_stages_lock:
+            peak = _update_peaks()
+            current = tracemalloc.get_traced_memory()[0]
+        top_allocations = list()
+        # tracing may have been stopped by another run of the batch mode
+        if tracemalloc.is_tracing():
+            # leave out the memory used by the profiles themselves
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, module.__file__)
+                    for module in (cProfile, pstats, tracemalloc)
+                ]
+                + [tracemalloc.Filter(False, __file__)]
+            )
+            top_allocations = snapshot.statistics("lineno")[: self.top]
+        if self.tracing:
+            tracemalloc.stop()
+
+        memory = {
+            "seconds": round(seconds, 3),
+            "current_bytes": current,
+            "peak_bytes": max(self.peak, peak),
+            "stages": self.stages,
+            "top_allocations": [
+                {
+                    "location": str(statistic.traceback[0]),
+                    "size_bytes": statistic.size,
+                    "count": statistic.count,
+                }
+                for statistic in top_allocations
+            ],
+        }
+        with open(os.path.join(self.profile_dir, "memory.json"), "w") as f:
+            json.dump(memory, f, indent=2)
+
+        summary_file = os.path.join(self.profile_dir, "summary.txt")
+        profile_files = sorted(
+            os.path.join(self.profile_dir, x)
+            for x in os.listdir(self.profile_dir)
+            if x.endswith(".prof")
+        )
+        with open(summary_file, "w") as f:
+            f.write(f"Profile of the run: {seconds:.3f} seconds\n")
+            f.write(
+                f"Peak traced memory (MB): {memory['peak_bytes'] / 1024 / 1024:.3f}\n\n"
+            )
+            f.write(
+                f"{'Stage':<32} {'Copy type':<10} {'Seconds':>10} {'Peak MB':>10} {'End MB':>10}\n"
+            )
+            for stage in self.stages:
+                peak_mb = (
+                    f"{stage['peak_bytes'] / 1024 / 1024:>10.3f}"
+                    if stage["peak_bytes"] is not None
+                    else f"{'-':>10}"
+                )
+                f.write(
+                    f"{stage['stage']:<32} {stage['copy_type'] or '-':<10} {stage['seconds'] or 0:>10.3f} {peak_mb} {stage['current_bytes'] / 1024 / 1024:>10.3f}\n"
+                )
+            if any(stage["overlapped"] for stage in self.stages):
+                f.write(
+                    "\nThe peak memory of the stages that ran at the same time as a stage of another thread (Peak MB '-') is only part of the peak of the run\n"
+                )
+            f.write(f"\nTop {self.top} allocation sites at the end of the run\n")
+            for allocation in memory["top_allocations"]:
+                f.write(
+                    f"{allocation['size_bytes'] / 1024:>12.1f} KiB {allocation['count']:>10} blocks  {allocation['location']}\n"
+                )
+            if profile_files:
+                f.write(f"\nTop {self.top} functions of all stages by internal time\n")
+                stats = pstats.Stats(*profile_files, stream=f)
+                stats.sort_stats("tottime").print_stats(self.top)
+                f.write(
+                    f"\nTop {self.top} functions of all stages by cumulative time\n"
+                )
+                stats.sort_stats("cumulative").print_stats(self.top)
+        logging.info(f"Profile summary: {summary_file}")
+        return summary_file
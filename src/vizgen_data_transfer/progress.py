@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Live throughput and ETA reporting while a copy type is being copied
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import re
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+# rsync --info=progress2 line, for example:
+#     1,238,099,968  45%   56.37MB/s    0:00:20 (xfr#12, to-chk=100/200)
+rsync_progress2_re = re.compile(
+    r"^\s*(?P<bytes>[\d,]+)\s+(?P<percent>\d+)%\s+\S+\s+\S+"
+    r"(?:\s+\(xfe?r#(?P<files>\d+),\s*(?:ir|to)-chk=\d+/\d+\))?"
+)
+
+
+def parse_rsync_progress2(line):
+    """
+    Return the bytes and files transferred so far from a rsync --info=progress2 line, or None for any other line. The file count is None when the line does not have one.
+    """
+    match = rsync_progress2_re.match(line)
+    if not match:
+        return None
+    files = match.group("files")
+    return int(match.group("bytes").replace(",", "")), (
+        int(files) if files is not None else None
+    )
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "unknown"
+    return str(timedelta(seconds=round(seconds)))
+
+
+class ProgressReporter:
+    """
+    Keep track of the files and bytes done for a copy type and, every 'interval' seconds, log the progress, the current and average MB/s and the ETA against the before transfer totals, and write them to a JSON status file.
+
+    The counters can be updated from several threads. A copy split over several processes (for example rsync shards) reports each part separately with 'part' and the parts are summed.
+    """
+
+    def __init__(self, run_id, copy_type, total_files, total_bytes, status_file, interval=60):
+        self.run_id = run_id
+        self.copy_type = copy_type
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.status_file = status_file
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.report_lock = threading.Lock()
+        self.parts = dict()
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.last_bytes = 0
+
+    @property
+    def files_done(self):
+        return sum(files for files, _ in self.parts.values())
+
+    @property
+    def bytes_done(self):
+        return sum(size for _, size in self.parts.values())
+
+    def add(self, files=0, size=0, part=None):
+        with self.lock:
+            done_files, done_bytes = self.parts.get(part, (0, 0))
+            self.parts[part] = (done_files + files, done_bytes + size)
+        self.maybe_report()
+
+    def set(self, files=None, size=None, part=None):
+        with self.lock:
+            done_files, done_bytes = self.parts.get(part, (0, 0))
+            self.parts[part] = (
+                done_files if files is None else files,
+                done_bytes if size is None else size,
+            )
+        self.maybe_report()
+
+    def on_rsync_line(self, line, part=None):
+        """
+        Line callback for run_command. Returns True for rsync progress lines so they are not written to the log one by one.
+        """
+        progress = parse_rsync_progress2(line)
+        if progress is None:
+            return False
+        self.set(files=progress[1], size=progress[0], part=part)
+        return True
+
+    def maybe_report(self):
+        if time.perf_counter() - self.last_report < self.interval:
+            return
+        # only one thread reports, the others carry on copying
+        if not self.report_lock.acquire(blocking=False):
+            return
+        try:
+            if time.perf_counter() - self.last_report >= self.interval:
+                self._report()
+        finally:
+            self.report_lock.release()
+
+    def get_status(self, state="running"):
+        now = time.perf_counter()
+        with self.lock:
+            files_done = self.files_done
+            bytes_done = self.bytes_done
+            elapsed = now - self.start
+            interval = now - self.last_report
+            current_rate = (
+                (bytes_done - self.last_bytes) / interval if interval > 0 else 0
+            )
+            self.last_report = now
+            self.last_bytes = bytes_done
+        average_rate = bytes_done / elapsed if elapsed > 0 else 0
+        remaining = max(0, self.total_bytes - bytes_done)
+        # prefer the current rate, it follows slow downs of the network drive
+        rate = current_rate if current_rate > 0 else average_rate
+        eta_seconds = remaining / rate if rate > 0 else None
+        if state == "complete":
+            eta_seconds = 0
+        return {
+            "run_id": self.run_id,
+            "copy_type": self.copy_type,
+            "state": state,
+            "files_done": files_done,
+            "files_total": self.total_files,
+            "bytes_done": bytes_done,
+            "bytes_total": self.total_bytes,
+            "percent": round(100 * bytes_done / self.total_bytes, 2)
+            if self.total_bytes
+            else 100.0,
+            "current_mb_per_s": round(current_rate / (1024 * 1024), 3),
+            "average_mb_per_s": round(average_rate / (1024 * 1024), 3),
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+            "eta": format_seconds(eta_seconds),
+            "updated": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def _report(self, state="running"):
+        status = self.get_status(state)
+        logging.info(
+            f"Progress {self.copy_type} - Files: {status['files_done']}/{status['files_total']}, Bytes: {status['bytes_done']}/{status['bytes_total']} ({status['percent']}%), Current: {status['current_mb_per_s']} MB/s, Average: {status['average_mb_per_s']} MB/s, Elapsed: {format_seconds(status['elapsed_seconds'])}, ETA: {status['eta']}"
+        )
+        if self.status_file:
+            tmp_file = f"{self.status_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(status, f, indent=2)
+            os.replace(tmp_file, self.status_file)
+        return status
+
+    def report(self, state="running"):
+        with self.report_lock:
+            return self._report(state)
+
+    def close(self, state="complete"):
+        return self.report(state)
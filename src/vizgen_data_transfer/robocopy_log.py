@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parse the robocopy list log written by get_counts_robocopy into per-file records
+
+The list is run with /L /E /BYTES /V /FP, so robocopy logs a tab separated line for every folder and file of the source with its full path, and every file with its size in bytes, for example:
+
+                       3  Z:\\merfish_raw_data\\RUN\\
+            New File            35284  Z:\\merfish_raw_data\\RUN\\settings.json
+          New Dir          2  Z:\\merfish_raw_data\\RUN\\region_0\\
+            New File         10485760  Z:\\merfish_raw_data\\RUN\\region_0\\image.tif
+
+Folder paths end with a backslash. With /TS, the timestamp of the file is logged between the size and the path. A log written with /UNILOG is in UTF-16, its byte order mark is used to decode it as in logtail.py.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import io
+import re
+import time
+from collections import namedtuple
+
+from vizgen_data_transfer.logtail import get_codec
+
+# file timestamp logged with /TS, e.g. "2023/10/26 10:58:00"
+robocopy_timestamp_re = re.compile(r"^\d{4}/\d\d/\d\d \d\d:\d\d:\d\d$")
+
+RobocopyListRecord = namedtuple("RobocopyListRecord", ["path", "type", "size", "mtime"])
+
+
+def parse_timestamp(value):
+    return int(time.mktime(time.strptime(value, "%Y/%m/%d %H:%M:%S"))) * 1000000000
+
+
+def parse_robocopy_list_log(log_file, source_root, offset=0, encoding=None, stats=None):
+    """
+    Yield a RobocopyListRecord for every file ('f') and folder ('d') below 'source_root' in a robocopy list log, starting at byte 'offset', which allows to skip the lists of previous runs appended to the same log with /LOG+. Paths are relative to 'source_root' and use '/' as the separator, as in the manifests. The source folder itself is not returned.
+
+    The log is read line by line, so logs of millions of lines are streamed. It is decoded with 'encoding', or the codec of its byte order mark, or the same default encoding as open(log_file, "r"). When a 'stats' dictionary is given, it is filled with the number of lines, files, folders and bytes found.
+    """
+    if stats is None:
+        stats = dict()
+    stats.update({"lines": 0, "files": 0, "folders": 0, "size_bytes": 0})
+    # robocopy logs the source folder with a trailing backslash, paths are
+    # not case sensitive on Windows
+    root = source_root.rstrip("\\/") + "\\"
+    root_folded = root.casefold()
+    codec, bom_size = get_codec(log_file, encoding)
+    with open(log_file, "rb") as raw:
+        raw.seek(max(offset, bom_size))
+        # only split on line feeds, a UTF-16 line feed is two bytes
+        f = io.TextIOWrapper(raw, encoding=codec, errors="replace", newline="\n")
+        for line in f:
+            stats["lines"] += 1
+            line = line.rstrip("\r\n").lstrip("\ufeff")
+            if "\t" not in line:
+                continue
+            # the path is the first field below the source folder, a file
+            # name may itself contain tabs
+            parts = line.split("\t")
+            for n, part in enumerate(parts):
+                if part.strip().casefold().startswith(root_folded):
+                    break
+            else:
+                continue
+            path = "\t".join(parts[n:]).strip(" ")
+            fields = [field.strip() for field in parts[:n]]
+            fields = [field for field in fields if field] + [path]
+            if len(fields) < 2:
+                continue
+            rel_path = path[len(root) :]
+            if path.endswith("\\"):
+                rel_path = rel_path.rstrip("\\")
+                if not rel_path:
+                    continue
+                stats["folders"] += 1
+                yield RobocopyListRecord(rel_path.replace("\\", "/"), "d", 0, 0)
+                continue
+            mtime = 0
+            size_field = fields[-2]
+            if robocopy_timestamp_re.match(size_field) and len(fields) >= 3:
+                mtime = parse_timestamp(size_field)
+                size_field = fields[-3]
+            if not size_field.isdigit():
+                continue
+            size = int(size_field)
+            stats["files"] += 1
+            stats["size_bytes"] += size
+            yield RobocopyListRecord(rel_path.replace("\\", "/"), "f", size, mtime)
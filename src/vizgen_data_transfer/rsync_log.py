@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parse the rsync --log-file written by copy_data into per-file records
+
+The copy is run with --log-file-format set to rsync_log_format, so that every line for a transferred file or created folder holds its itemized changes, size, modification time and name, for example:
+
+    2026/02/26 12:04:26 [12345] >f+++++++++ 35284 2026/02/20-09:12:01 region_0/fov_1/image.tif
+    2026/02/26 12:04:26 [12345] cd+++++++++ 4096 2026/02/20-09:12:01 region_0/fov_1/
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import re
+import time
+from collections import namedtuple
+
+# passed to rsync as --log-file-format, the name comes last as it may hold spaces
+rsync_log_format = "%i %l %M %n%L"
+
+rsync_log_line_re = re.compile(
+    r"^\d{4}/\d\d/\d\d \d\d:\d\d:\d\d \[\d+\] "
+    r"(?P<itemize>[<>ch.*][fdLDS]\S+) (?P<size>\d+) "
+    r"(?P<mtime>\d{4}/\d\d/\d\d-\d\d:\d\d:\d\d) (?P<path>.*)$"
+)
+# last line of a rsync session, e.g. "sent 1,234 bytes  received 56 bytes  total size 7,890"
+rsync_log_end_re = re.compile(r"\] sent [\d,]+ bytes\s+received [\d,]+ bytes")
+# process id of a log line, each rsync session (or shard) logs with its own
+rsync_log_pid_re = re.compile(r"^\d{4}/\d\d/\d\d \d\d:\d\d:\d\d \[(?P<pid>\d+)\] ")
+
+RsyncLogRecord = namedtuple("RsyncLogRecord", ["path", "type", "size", "mtime", "itemize"])
+
+
+def parse_mtime(value):
+    # %M is the local time of the file, formatted as YYYY/MM/DD-HH:MM:SS
+    return int(time.mktime(time.strptime(value, "%Y/%m/%d-%H:%M:%S"))) * 1000000000
+
+
+def parse_rsync_log(log_file, offset=0, stats=None, sessions=1):
+    """
+    Yield a RsyncLogRecord for every file ('f') and folder ('d') in the rsync log, starting at byte 'offset', which allows to skip the sessions of previous runs appended to the same log. Symlinks, devices and other lines are skipped.
+
+    When a 'stats' dictionary is given, it is filled with the number of lines, records, files, folders and bytes found, the number of sessions started and ended, and whether the log is complete: at least 'sessions' sessions (e.g. the number of rsync shards merged into the log) ended with the session end line ('sent ... bytes  received ... bytes'), and every session that logged a line ended.
+    """
+    if stats is None:
+        stats = dict()
+    stats.update(
+        {
+            "lines": 0,
+            "files": 0,
+            "folders": 0,
+            "size_bytes": 0,
+            "sessions_started": 0,
+            "sessions_ended": 0,
+            "complete": False,
+        }
+    )
+    started = set()
+    ended = set()
+    with open(log_file, "r", encoding="utf-8", errors="surrogateescape") as f:
+        f.seek(offset)
+        for line in f:
+            stats["lines"] += 1
+            line = line.rstrip("\n")
+            pid = rsync_log_pid_re.match(line)
+            if pid:
+                started.add(pid.group("pid"))
+            match = rsync_log_line_re.match(line)
+            if not match:
+                if rsync_log_end_re.search(line):
+                    ended.add(pid.group("pid") if pid else stats["lines"])
+                continue
+            itemize = match.group("itemize")
+            entry_type = itemize[1]
+            path = match.group("path")
+            if entry_type == "d":
+                path = path.rstrip("/")
+                # the top folder of the transfer is logged as "./"
+                if path in ("", "."):
+                    continue
+                stats["folders"] += 1
+                yield RsyncLogRecord(path, "d", 0, 0, itemize)
+            elif entry_type == "f":
+                size = int(match.group("size"))
+                stats["files"] += 1
+                stats["size_bytes"] += size
+                yield RsyncLogRecord(
+                    path, "f", size, parse_mtime(match.group("mtime")), itemize
+                )
+    # a shard stopped before its end line leaves a session that never ended
+    stats["sessions_started"] = len(started)
+    stats["sessions_ended"] = len(ended)
+    stats["complete"] = len(ended) >= sessions and started <= ended
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Directory tree scanners used to count files, folders and bytes for a copy type
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def walk_tree(root, workers=1, on_file=None, on_dir=None, long_path=None):
+    """
+    Scan a tree with os.walk and one extra stat call per file. This is the original walker of get_counts_python and is kept so that it can be compared against the scandir based scanner.
+    """
+    totals = {"files": 0, "folders": 0, "size_bytes": 0}
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        rel_dir = "" if rel_dir == os.curdir else rel_dir.replace(os.sep, "/")
+        totals["folders"] += len(dirnames)
+        totals["files"] += len(filenames)
+        if on_dir:
+            for d in dirnames:
+                on_dir(f"{rel_dir}/{d}" if rel_dir else d)
+        for f in filenames:
+            fp = os.path.join(dirpath, f)
+            if long_path:
+                fp = long_path(fp)
+            st = os.stat(fp)
+            totals["size_bytes"] += st.st_size
+            if on_file:
+                on_file(f"{rel_dir}/{f}" if rel_dir else f, st)
+    return totals
+
+
+def _scan_directory(path, rel_dir):
+    """
+    List a single directory with os.scandir. Returns the files with their stat information and the sub directories to descend into.
+
+    The stat information of a DirEntry is cached, and on Windows it comes for free with the directory listing, so no extra round-trip to the network drive is needed per file.
+    """
+    files = list()
+    folders = list()
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        # os.walk ignores folders it cannot list, do the same here
+        return files, folders
+    for entry in entries:
+        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            # symlinked folders are counted but not followed, same as os.walk
+            folders.append((entry.path, rel_path, entry.is_symlink()))
+        else:
+            # a file that cannot be stat-ed, e.g. a broken symlink, fails the
+            # scan as with walk_tree, the rest of the folder is not dropped
+            files.append((rel_path, entry.stat()))
+    return files, folders
+
+
+def scandir_tree(root, workers=1, on_file=None, on_dir=None, long_path=None):
+    """
+    Scan a tree with os.scandir, reusing the DirEntry stat information and fanning the directories out across a thread pool of 'workers' threads.
+
+    The callbacks are always called from the calling thread, so they do not need to be thread safe.
+    """
+    if long_path:
+        root = long_path(root)
+    totals = {"files": 0, "folders": 0, "size_bytes": 0}
+    if not os.path.isdir(root):
+        return totals
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        pending = {executor.submit(_scan_directory, root, "")}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, folders = future.result()
+                totals["files"] += len(files)
+                totals["folders"] += len(folders)
+                for rel_path, st in files:
+                    totals["size_bytes"] += st.st_size
+                    if on_file:
+                        on_file(rel_path, st)
+                for path, rel_path, is_symlink in folders:
+                    if on_dir:
+                        on_dir(rel_path)
+                    if not is_symlink:
+                        pending.add(executor.submit(_scan_directory, path, rel_path))
+    return totals
+
+
+# available scanners, selectable with the --scanner option
+scanners = {
+    "walk": walk_tree,
+    "scandir": scandir_tree,
+}
+
+
+def scan_tree(root, scanner="walk", workers=1, on_file=None, on_dir=None, long_path=None):
+    """
+    Count the files, folders and total size in bytes below 'root' using the selected scanner. Optionally call on_file(relative_path, stat_result) for every file and on_dir(relative_path) for every folder. Relative paths always use '/' as the separator.
+    """
+    if scanner not in scanners:
+        raise ValueError(
+            f"Unknown scanner: '{scanner}'. Must be one of: {', '.join(scanners)}"
+        )
+    return scanners[scanner](
+        root, workers=workers, on_file=on_file, on_dir=on_dir, long_path=long_path
+    )
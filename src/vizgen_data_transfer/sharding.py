@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Partition the files of a copy type into size balanced shards for parallel rsync workers
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import heapq
+import shutil
+
+
+def write_shards(entries, shard_prefix, shards, total_files=None, total_size_bytes=None):
+    """
+    Distribute (relative path, size) entries over 'shards' file lists named '<shard_prefix>.<n>.txt', suitable for rsync --files-from.
+
+    Each entry goes to the shard with the lowest load so far, where the load is the fraction of the total bytes plus the fraction of the total files already assigned to it. Balancing on both keeps a shard of a few very large images and a shard of many small analysis files equally long. The entries are streamed, so memory does not depend on the number of files, but the totals are needed up front; when they are not given the entries must be a list.
+
+    Returns a list with the file list, number of files and size in bytes of each non empty shard.
+    """
+    if total_files is None or total_size_bytes is None:
+        entries = list(entries)
+        total_files = len(entries)
+        total_size_bytes = sum(size for _, size in entries)
+    total_files = max(1, total_files)
+    total_size_bytes = max(1, total_size_bytes)
+
+    shard_info = list()
+    handles = list()
+    for n in range(shards):
+        shard_file = f"{shard_prefix}.{n}.txt"
+        handles.append(open(shard_file, "w", encoding="utf-8", newline="\n"))
+        shard_info.append({"file_list": shard_file, "files": 0, "size_bytes": 0})
+
+    # heap of (load, shard number)
+    loads = [(0.0, n) for n in range(shards)]
+    try:
+        for path, size in entries:
+            _, n = heapq.heappop(loads)
+            handles[n].write(f"{path}\n")
+            shard_info[n]["files"] += 1
+            shard_info[n]["size_bytes"] += size
+            load = (
+                shard_info[n]["size_bytes"] / total_size_bytes
+                + shard_info[n]["files"] / total_files
+            )
+            heapq.heappush(loads, (load, n))
+    finally:
+        for handle in handles:
+            handle.close()
+
+    # drop empty shards, for example when there are fewer files than shards
+    for info in shard_info:
+        if info["files"] == 0:
+            os.remove(info["file_list"])
+    return [info for info in shard_info if info["files"]]
+
+
+def merge_shard_logs(shard_logs, log_file):
+    """
+    Append the per shard log files to the copy type log file, in shard order, and remove them.
+    """
+    with open(log_file, "ab") as out:
+        for shard_log in shard_logs:
+            if not os.path.exists(shard_log):
+                continue
+            with open(shard_log, "rb") as f:
+                shutil.copyfileobj(f, out)
+            os.remove(shard_log)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run level checkpoint file, so that a re-invocation for the same run skips the stages already done
+
+The state file records, for each stage and copy type, that the stage finished and the results it produced (counts, exit codes, manifest paths). It also holds a shallow fingerprint of the source folders, so the state of a previous invocation is only reused while the source has not changed.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+state_version = 1
+
+
+def _fingerprint_folder(digest, path, depth):
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    for entry in entries:
+        st = entry.stat(follow_symlinks=False)
+        digest.update(
+            f"{entry.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode(
+                "utf-8", errors="surrogateescape"
+            )
+        )
+        if depth > 1 and entry.is_dir(follow_symlinks=False):
+            digest.update(b"{\n")
+            _fingerprint_folder(digest, entry.path, depth - 1)
+            digest.update(b"}\n")
+
+
+def source_fingerprint(locations, depth=2):
+    """
+    Shallow fingerprint of the source folders: the name, size and modification time of the entries in the top 'depth' levels of each folder. Adding, removing or renaming files in a folder changes the modification time of that folder, so this catches the usual changes of a run folder (e.g. a re-run of the analysis) without walking the whole tree again. Files rewritten in place deeper down are not detected.
+    """
+    digest = hashlib.sha256()
+    for location in locations:
+        digest.update(f"{location}\n".encode("utf-8", errors="surrogateescape"))
+        try:
+            st = os.stat(location)
+        except OSError:
+            digest.update(b"missing\n")
+            continue
+        digest.update(f"{st.st_mtime_ns}\n".encode())
+        _fingerprint_folder(digest, location, depth)
+    return digest.hexdigest()
+
+
+class RunState:
+    """
+    Stages done for each copy type and their results, saved to a JSON file after every change. The file is written to a temporary name and renamed, so it is never partial, and it can be updated from several threads.
+    """
+
+    def __init__(self, state_file, run_id, fingerprint):
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.state = self.new_state(run_id, fingerprint)
+        self.resumed = False
+        self.previous = None
+        self.load_error = None
+        if os.path.exists(state_file):
+            try:
+                with open(state_file) as f:
+                    self.previous = json.load(f)
+                if not isinstance(self.previous, dict):
+                    raise ValueError("not a JSON object")
+            except (OSError, ValueError) as e:
+                # e.g. a state file cut short by a full disk, the run is then
+                # transferred again from the start
+                self.previous = None
+                self.load_error = str(e)
+
+    @staticmethod
+    def new_state(run_id, fingerprint):
+        return {
+            "version": state_version,
+            "run_id": run_id,
+            "fingerprint": fingerprint,
+            "complete": False,
+            "stages": dict(),
+        }
+
+    def resume(self):
+        """
+        Continue from the state file of a previous invocation. Returns a reason when it cannot be used: no state file, a state file that cannot be read, a different version or fingerprint, or a complete run, which is transferred again from the start.
+        """
+        previous = self.previous
+        if self.load_error:
+            return f"the state file could not be read ({self.load_error})"
+        if previous is None:
+            return "no state file found"
+        if previous.get("version") != state_version:
+            return f"state file version {previous.get('version')} is not supported"
+        if previous.get("fingerprint") != self.state["fingerprint"]:
+            return "the source folders have changed since the state file was written"
+        if previous.get("complete"):
+            return "the previous transfer of this run completed"
+        self.state["stages"] = previous.get("stages", dict())
+        self.resumed = True
+        return None
+
+    def is_done(self, stage, copy_type):
+        with self.lock:
+            return copy_type in self.state["stages"].get(stage, dict())
+
+    def get(self, stage, copy_type):
+        with self.lock:
+            return self.state["stages"].get(stage, dict()).get(copy_type)
+
+    def mark(self, stage, copy_type, result=None):
+        with self.lock:
+            self.state["stages"].setdefault(stage, dict())[copy_type] = result or dict()
+            self.save()
+
+    def complete(self):
+        with self.lock:
+            self.state["complete"] = True
+            self.save()
+
+    def save(self):
+        self.state["updated"] = datetime.now().isoformat(timespec="seconds")
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Watch mode: transfer the runs automatically once they are complete on the analysis drive
+
+The run folders in 'merfish_raw_data', 'merfish_analysis' and 'merfish_output' on the analysis drive are scanned every --poll_interval seconds. A new or changed run is transferred, with the batch mode, once its folders have not changed for --quiet_period seconds. The state of every run seen is kept in a JSON file in the logs folder, so a restarted watch continues where it stopped, and the runs already transferred are only checked with a scan of their top folders.
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import json
+import time
+import fnmatch
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from vizgen_data_transfer.__main__ import (
+    get_analysis_drive,
+    get_parser,
+    init_master_log,
+)
+from vizgen_data_transfer.batch import BatchTransfer
+from vizgen_data_transfer.state import source_fingerprint
+
+state_version = 1
+
+# folder of each copy type on the analysis drive
+watch_roots = {
+    "raw_data": "merfish_raw_data",
+    "analysis": "merfish_analysis",
+    "output": "merfish_output",
+}
+
+# runs in these states are only checked with a scan of their top folders
+settled_status = ("completed", "failed", "existing")
+
+
+class WatchState:
+    """
+    Runs seen by the watch mode, saved to a JSON file after every scan. For each run: its status ('changing', 'queued', 'transferring', 'completed', 'failed' or 'existing'), the copy types found, the fingerprint of its folders and the time it last changed.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.runs = dict()
+        self.new = True
+        if os.path.exists(state_file):
+            with open(state_file) as f:
+                state = json.load(f)
+            if state.get("version") != state_version:
+                raise ValueError(
+                    f"Error: Watch state file version {state.get('version')} is not supported: {state_file}"
+                )
+            self.runs = state.get("runs", dict())
+            self.new = False
+
+    def save(self):
+        state = {
+            "version": state_version,
+            "updated": datetime.now().isoformat(timespec="seconds"),
+            "runs": self.runs,
+        }
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+
+class RunWatcher:
+    """
+    Scan the run folders of the analysis drive and transfer the runs that are ready, one batch at a time, while the scans go on.
+    """
+
+    def __init__(self, args, config, os_name):
+        self.args = args
+        self.config = config
+        self.os_name = os_name
+        self.copy_type = [x.strip().lower() for x in args.copy_type]
+        self.analysis_drive = get_analysis_drive(
+            config, os_name, disk=args.disk, debug=args.debug
+        )
+        log_dir = (
+            config["isilon_drive_logs_pc"]
+            if "windows" in os_name
+            else config["isilon_drive_logs_nix"]
+        )
+        state_file = args.watch_state or os.path.join(
+            log_dir, "vizgen_data_transfer_watch.json"
+        )
+        self.state = WatchState(state_file)
+        # runs interrupted by a restart are transferred again, resuming
+        # from their own state files
+        for record in self.state.runs.values():
+            if record["status"] == "transferring":
+                record["status"] = "queued"
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="watch")
+        self.batch = None
+        self.batch_run_ids = list()
+
+    def find_runs(self):
+        """
+        Run folders matching --run_glob for each copy type. Returns a dictionary of run id to the (copy type, folder) found.
+        """
+        runs = dict()
+        for copy_type in self.copy_type:
+            root = os.path.join(self.analysis_drive, watch_roots[copy_type])
+            try:
+                with os.scandir(root) as it:
+                    entries = [
+                        entry
+                        for entry in it
+                        if entry.is_dir() and fnmatch.fnmatch(entry.name, self.args.run_glob)
+                    ]
+            except OSError as e:
+                logging.warning(f"Watch: unable to scan folder: {root}: {e}")
+                continue
+            for entry in entries:
+                runs.setdefault(entry.name, list()).append((copy_type, entry.path))
+        return runs
+
+    def check_run(self, run_id, locations, now):
+        """
+        Update the state of a run from the fingerprint of its folders. Returns True when the run has been quiet for --quiet_period seconds and is ready to be transferred.
+        """
+        copy_types = [copy_type for copy_type, _ in locations]
+        folders = [path for _, path in locations]
+        record = self.state.runs.get(run_id)
+        if record and record["status"] in ("queued", "transferring"):
+            return False
+
+        quick = source_fingerprint(folders, depth=1)
+        if record and record["status"] in settled_status:
+            if record["quick"] == quick and record["copy_types"] == copy_types:
+                return False
+            logging.info(f"Watch: run {run_id} has changed since it was {record['status']}")
+
+        fingerprint = source_fingerprint(folders, depth=self.args.watch_depth)
+        if record is None or record["status"] in settled_status:
+            status = "changing"
+            if record is None and self.state.new and not self.args.watch_existing:
+                # runs already there when the watch starts for the first time
+                status = "existing"
+                logging.info(f"Watch: run {run_id} found on the first scan, it is only transferred if it changes")
+            elif record is None:
+                logging.info(f"Watch: new run {run_id}: {', '.join(copy_types)}")
+            self.state.runs[run_id] = record = {
+                "status": status,
+                "copy_types": copy_types,
+                "fingerprint": fingerprint,
+                "quick": quick,
+                "changed": now,
+            }
+            return False
+
+        if record["fingerprint"] != fingerprint or record["copy_types"] != copy_types:
+            record.update(
+                fingerprint=fingerprint, quick=quick, copy_types=copy_types, changed=now
+            )
+            return False
+        if now - record["changed"] < self.args.quiet_period:
+            return False
+        logging.info(
+            f"Watch: run {run_id} has not changed for {round(now - record['changed'])} seconds, queued for transfer"
+        )
+        record.update(status="queued", quick=quick)
+        return True
+
+    def check_batch(self):
+        """
+        Record the status of the runs of the last batch once it is finished.
+        """
+        if self.batch is None or not self.batch.done():
+            return
+        try:
+            status = self.batch.result()
+        except Exception as e:
+            logging.error(f"Watch: batch failed: {e}")
+            status = dict()
+        for run_id in self.batch_run_ids:
+            record = self.state.runs[run_id]
+            record["status"] = status.get(run_id, "failed")
+            record["transferred"] = time.time()
+            logging.info(f"Watch: run {run_id} {record['status']}")
+        self.batch = None
+        self.batch_run_ids = list()
+
+    def transfer(self, run_ids, copy_types):
+        batch = BatchTransfer(
+            self.args, run_ids, self.config, self.os_name, copy_types=copy_types
+        )
+        batch.run()
+        return batch.store_run_status
+
+    def start_batch(self):
+        """
+        Transfer the queued runs, unless a batch is still running.
+        """
+        if self.batch is not None:
+            return
+        run_ids = sorted(
+            run_id
+            for run_id, record in self.state.runs.items()
+            if record["status"] == "queued"
+        )
+        if not run_ids:
+            return
+        copy_types = dict()
+        for run_id in run_ids:
+            self.state.runs[run_id]["status"] = "transferring"
+            copy_types[run_id] = self.state.runs[run_id]["copy_types"]
+        logging.info(f"Watch: transferring run(s): {', '.join(run_ids)}")
+        self.batch_run_ids = run_ids
+        self.batch = self.executor.submit(self.transfer, run_ids, copy_types)
+
+    def poll(self):
+        self.check_batch()
+        now = time.time()
+        for run_id, locations in sorted(self.find_runs().items()):
+            try:
+                self.check_run(run_id, locations, now)
+            except OSError as e:
+                # run folders moved or removed during the scan
+                logging.warning(f"Watch: unable to scan run {run_id}: {e}")
+        self.state.new = False
+        self.start_batch()
+        self.state.save()
+
+    def run(self):
+        logging.info(
+            f"Watch: watching {', '.join(watch_roots[x] for x in self.copy_type)} in {self.analysis_drive} every {self.args.poll_interval} seconds, state file: {self.state.state_file}"
+        )
+        try:
+            while True:
+                self.poll()
+                if self.args.once:
+                    break
+                time.sleep(self.args.poll_interval)
+        except KeyboardInterrupt:
+            logging.info("Watch: stopped, waiting for the running transfers to finish")
+        finally:
+            # wait for the running batch before exiting
+            self.executor.shutdown(wait=True)
+            if self.batch is not None:
+                self.check_batch()
+                self.state.save()
+
+
+def main():
+    args = get_parser(watch=True).parse_args()
+    config, os_name = init_master_log(args.vizgen_config)
+
+    logging.info("############################################")
+    logging.info("### VIZGEN DATA TRANSFER WATCH INITIATED ###")
+    logging.info("############################################")
+    logging.info(f"Operating System: {os_name.title()}")
+
+    RunWatcher(args, config, os_name).run()
+
+    logging.info("############################################")
+    logging.info("### VIZGEN DATA TRANSFER WATCH COMPLETED ###")
+    logging.info("############################################")
+
+
+if __name__ == "__main__":
+    main()
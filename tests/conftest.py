@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fixtures shared by the tests
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import pytest
+
+from vizgen_data_transfer.benchmark.generator import scales
+from vizgen_data_transfer.benchmark.suite import SyntheticRun
+
+
+@pytest.fixture
+def synthetic_run(tmp_path):
+    """
+    Synthetic run in a temporary folder with its config file written, the run itself is generated by the tests that need it.
+    """
+    run = SyntheticRun(str(tmp_path), dict(scales["small"]))
+    run.write_config()
+    return run
+
+
+@pytest.fixture
+def transfer(synthetic_run):
+    """
+    VizgenDataTransfer of the synthetic run, with the default options.
+    """
+    return synthetic_run.get_transfer()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the adaptive number of copy threads and of the --threads auto option
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import pytest
+
+from vizgen_data_transfer.adaptive import AdaptiveConcurrency
+
+mb = 1024 * 1024
+
+
+def make_controller(**options):
+    controller = AdaptiveConcurrency("raw_data", interval=1, **options)
+    controller.reset(0)
+    return controller
+
+
+def run_interval(controller, mb_per_second, files=100, failed=0):
+    """
+    Record one interval of 'files' copied files at 'mb_per_second' and 'failed' failed copies, and let the controller decide.
+    """
+    for _ in range(files):
+        controller.record(size=mb_per_second * mb // files)
+    for _ in range(failed):
+        controller.record(failed=True)
+    now = controller.interval_start + controller.interval
+    assert controller.update(now)
+    return controller.workers
+
+
+def test_ramp_up_while_the_throughput_improves():
+    controller = make_controller(start=2, max_workers=16)
+    assert run_interval(controller, 10) == 4
+    assert run_interval(controller, 20) == 8
+    assert run_interval(controller, 40) == 16
+    assert controller.decisions[-1]["reason"] == "throughput improved, ramping up"
+
+
+def test_settle_on_the_best_level_when_the_throughput_stops_improving():
+    controller = make_controller(start=2, max_workers=16)
+    run_interval(controller, 10)
+    run_interval(controller, 20)
+    # 8 workers are not faster than 4 by more than the tolerance
+    assert run_interval(controller, 21) == 4
+    assert controller.phase == "settled"
+
+
+def test_stop_at_the_maximum():
+    controller = make_controller(start=2, max_workers=4)
+    assert run_interval(controller, 10) == 4
+    assert run_interval(controller, 20) == 4
+    assert controller.phase == "settled"
+
+
+def test_back_off_on_errors():
+    controller = make_controller(start=8, max_workers=16)
+    # 10 failed copies out of 110 is above the maximum error rate
+    assert run_interval(controller, 10, failed=10) == 4
+    assert controller.cap == 7
+    assert "backing off" in controller.decisions[-1]["reason"]
+    # the level that failed is not tried again
+    assert run_interval(controller, 10) == 4
+    assert run_interval(controller, 10) == 4
+    assert run_interval(controller, 10) <= controller.cap
+
+
+def test_probe_one_more_worker_when_settled():
+    controller = make_controller(start=2, max_workers=16, probe_intervals=2)
+    run_interval(controller, 10)
+    # no improvement with 4 workers, settling back on 2
+    assert run_interval(controller, 10) == 2
+    assert run_interval(controller, 10) == 2
+    assert run_interval(controller, 10) == 3
+    assert controller.decisions[-1]["reason"] == "probing one more worker"
+    # one more worker faster, keeping it
+    assert run_interval(controller, 20) == 3
+    assert controller.phase == "settled"
+
+
+def test_probe_one_less_worker_when_the_throughput_drops():
+    controller = make_controller(start=2, max_workers=4)
+    run_interval(controller, 10)
+    assert run_interval(controller, 20) == 4
+    assert run_interval(controller, 20) == 4
+    assert run_interval(controller, 5) == 3
+    assert controller.phase == "probe"
+
+
+def test_no_decision_before_the_end_of_the_interval():
+    controller = make_controller(start=2)
+    controller.record(size=mb)
+    assert not controller.update(0.5)
+    # no file finished during the interval
+    controller = make_controller(start=2)
+    assert not controller.update(2)
+    assert controller.workers == 2
+
+
+@pytest.mark.parametrize(
+    "options,threads,list_threads",
+    [
+        (["--backend", "native", "--threads", "auto"], "auto", 16),
+        (
+            ["--backend", "native", "--threads", "auto", "--max_threads", "4"],
+            "auto",
+            4,
+        ),
+        (
+            ["--backend", "native", "--threads", "auto", "--max_threads", "500"],
+            "auto",
+            128,
+        ),
+        (["--backend", "native", "--threads", "AUTO"], "auto", 16),
+        (["--backend", "rsync", "--threads", "auto"], 1, 1),
+        (["--backend", "native", "--threads", "8"], 8, 8),
+    ],
+)
+def test_threads_option(synthetic_run, options, threads, list_threads):
+    transfer = synthetic_run.get_transfer(*options)
+    assert transfer.threads == threads
+    # robocopy /MT of the list step is always a number between 1 and 128
+    assert transfer.get_robocopy_list_threads() == list_threads
+
+
+@pytest.mark.parametrize("threads", ["0", "-1", "many"])
+def test_invalid_threads_option(synthetic_run, threads):
+    with pytest.raises(ValueError):
+        synthetic_run.get_transfer("--threads", threads)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Smoke tests of the synthetic run of the benchmarks and of the fault injection harness
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import logging
+import argparse
+
+import pytest
+
+from vizgen_data_transfer.benchmark.generator import iter_run_entries
+from vizgen_data_transfer.benchmark.suite import (
+    SyntheticRun,
+    add_synthetic_run_options,
+    get_spec,
+    logger,
+)
+
+# a few files of each copy type
+tiny = [
+    "--raw_files",
+    "4",
+    "--raw_file_size",
+    "4096",
+    "--analysis_files",
+    "20",
+    "--analysis_file_size",
+    "512",
+    "--output_files",
+    "3",
+    "--output_file_size",
+    "1024",
+    "--regions",
+    "2",
+    "--depth",
+    "3",
+]
+
+
+@pytest.fixture
+def spec():
+    parser = argparse.ArgumentParser()
+    add_synthetic_run_options(parser)
+    return get_spec(parser.parse_args(tiny))
+
+
+def test_get_spec(spec):
+    assert spec["raw_files"] == 4
+    assert spec["analysis_file_size"] == 512
+    assert spec["depth"] == 3
+
+
+def count_files(folder):
+    files = size_bytes = 0
+    for root, _, names in os.walk(folder):
+        for name in names:
+            files += 1
+            size_bytes += os.path.getsize(os.path.join(root, name))
+    return {"files": files, "size_bytes": size_bytes}
+
+
+def test_synthetic_run(tmp_path, spec, caplog):
+    run = SyntheticRun(str(tmp_path), spec)
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        run.generate()
+    # progress is logged at INFO, not as a warning
+    assert [x.levelname for x in caplog.records if x.name == logger.name] == [
+        "INFO",
+        "INFO",
+    ]
+    assert set(run.totals) == {"raw_data", "analysis", "output"}
+    assert run.get_totals()["files"] == len(list(iter_run_entries(spec)))
+
+    transfer = run.get_transfer()
+    for copy_type, totals in run.totals.items():
+        source = transfer.get_copy_locations(copy_type)[0]
+        assert count_files(source) == totals
+
+    # the python counts of the transfer agree with the generator
+    transfer.get_counts_python()
+    for copy_type, totals in run.totals.items():
+        counts = transfer.store_python_count_info["before"][copy_type]
+        assert (counts["files"], counts["size_bytes"]) == (
+            totals["files"],
+            totals["size_bytes"],
+        )
+
+    # the same run is not generated again
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        SyntheticRun(str(tmp_path), spec).generate()
+    assert "already generated" in caplog.records[-1].getMessage()
+
+
+def test_same_seed_same_run(tmp_path, spec):
+    runs = [SyntheticRun(str(tmp_path / name), spec, seed=1) for name in "ab"]
+    for run in runs:
+        run.generate()
+    assert runs[0].totals == runs[1].totals
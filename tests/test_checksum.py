@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the content checksums of the source and destination files
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import mmap
+import shutil
+import hashlib
+import subprocess
+
+import pytest
+
+from vizgen_data_transfer import checksum
+from vizgen_data_transfer.checksum import (
+    format_checksum_line,
+    hash_file,
+    parse_checksum_line,
+    verify_tree,
+)
+
+files = {
+    "empty.txt": b"",
+    "small.csv": b"cell_id,x,y\n1,2,3\n",
+    "region_0/image.dax": bytes(range(256)) * 4096,
+    "region_0/odd.dax": b"x" * 100003,
+}
+
+
+@pytest.fixture
+def trees(tmp_path):
+    roots = (tmp_path / "source", tmp_path / "destination")
+    for root in roots:
+        for path, content in files.items():
+            file_path = root / path
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_bytes(content)
+    return tuple(str(root) for root in roots)
+
+
+@pytest.mark.parametrize("algorithm", ["sha256", "md5", "blake2b"])
+@pytest.mark.parametrize(
+    "buffer_size,mmap_threshold",
+    [
+        # buffered reads, one or several per file
+        (8 * 1024 * 1024, 0),
+        (1000, 0),
+        # memory mapped, the zero byte file (which cannot be mapped) is read
+        (8 * 1024 * 1024, 1),
+        (1000, 1),
+    ],
+    ids=["buffered", "buffered_small_reads", "mmap", "mmap_small_slices"],
+)
+def test_hash_file_matches_hashlib(tmp_path, algorithm, buffer_size, mmap_threshold):
+    for name, content in files.items():
+        path = tmp_path / name.replace("/", "_")
+        path.write_bytes(content)
+        digest, size = hash_file(str(path), algorithm, buffer_size, mmap_threshold)
+        assert digest == hashlib.new(algorithm, content).hexdigest()
+        assert size == len(content)
+
+
+@pytest.mark.parametrize("error", [OSError, ValueError])
+def test_hash_file_without_mmap(tmp_path, monkeypatch, error):
+    # file systems that cannot be memory mapped are read instead
+    def fail(*args, **kwargs):
+        raise error("mmap not supported")
+
+    monkeypatch.setattr(checksum.mmap, "mmap", fail)
+    content = files["region_0/image.dax"]
+    path = tmp_path / "image.dax"
+    path.write_bytes(content)
+    assert hash_file(str(path), mmap_threshold=1) == (
+        hashlib.sha256(content).hexdigest(),
+        len(content),
+    )
+
+
+def test_zero_byte_file_cannot_be_mapped(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    with open(path, "rb") as f, pytest.raises(ValueError):
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # a negative threshold tries to map every file, the ValueError of the
+    # empty file falls back to reading it
+    assert hash_file(str(path), mmap_threshold=-1) == (
+        hashlib.sha256(b"").hexdigest(),
+        0,
+    )
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_verify_tree_matches_hashlib(trees, executor, workers):
+    records = list()
+    totals = verify_tree(
+        *trees,
+        sorted(files),
+        workers=workers,
+        executor=executor,
+        buffer_size=1000,
+        on_record=records.append,
+    )
+    assert totals == {
+        "match": len(files),
+        "mismatch": 0,
+        "failed": 0,
+        "size_bytes": sum(len(x) for x in files.values()),
+    }
+    for record in records:
+        expected = hashlib.sha256(files[record["path"]]).hexdigest()
+        assert record["source_digest"] == expected
+        assert record["destination_digest"] == expected
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_verify_tree_mismatch_and_failed(trees, executor):
+    source, destination = trees
+    with open(f"{destination}/small.csv", "r+b") as f:
+        # same size, one byte changed
+        f.write(b"C")
+    records = dict()
+    totals = verify_tree(
+        source,
+        destination,
+        sorted(files) + ["missing.txt"],
+        workers=2,
+        executor=executor,
+        on_record=lambda x: records.update({x["path"]: x}),
+    )
+    assert (totals["match"], totals["mismatch"], totals["failed"]) == (3, 1, 1)
+    assert records["small.csv"]["status"] == "mismatch"
+    assert records["missing.txt"]["error"].startswith("source:")
+
+
+def test_format_checksum_line():
+    assert format_checksum_line("abc", "a/b.txt") == "abc  a/b.txt\n"
+    # escaped as sha256sum does
+    assert format_checksum_line("abc", "a\\b\nc") == "\\abc  a\\\\b\\nc\n"
+
+
+@pytest.mark.parametrize(
+    "path", ["a/b.txt", "a\\b\nc", "trailing\\", "two  spaces.txt", "région.csv"]
+)
+def test_parse_checksum_line(path):
+    digest = hashlib.sha256(b"").hexdigest()
+    assert parse_checksum_line(format_checksum_line(digest, path)) == (digest, path)
+
+
+@pytest.mark.parametrize("line", ["", "\n", "no separator\n", "  only a path\n"])
+def test_not_a_checksum_line(line):
+    assert parse_checksum_line(line) is None
+
+
+def write_run_checksums(synthetic_run, copy_types, content, algorithm="sha256"):
+    """
+    Write the CHECKSUMS file of a transfer of 'copy_types', with the files of each copy type holding 'content' in the run folder.
+    """
+    transfer = synthetic_run.get_transfer(
+        "--copy_type", *copy_types, "--checksum_algorithm", algorithm
+    )
+    run_folder = os.path.dirname(transfer.isilon_drive_checksums)
+    for copy_type in copy_types:
+        checksum_file = os.path.join(synthetic_run.root, f"{copy_type}.checksums.txt")
+        with open(checksum_file, "w", encoding="utf-8", newline="\n") as f:
+            for name in ("a.txt", "sub/b\\c.txt"):
+                path = f"{copy_type}/{name}"
+                file_path = os.path.join(run_folder, *path.split("/"))
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, "wb") as data:
+                    data.write(content)
+                digest = hashlib.new(algorithm, content).hexdigest()
+                f.write(format_checksum_line(digest, path))
+        transfer.store_checksum_info[copy_type] = {"checksum_file": checksum_file}
+    transfer.write_checksums()
+    with open(transfer.isilon_drive_checksums, encoding="utf-8") as f:
+        return run_folder, [parse_checksum_line(line) for line in f]
+
+
+def test_checksums_of_other_copy_types_are_kept(synthetic_run):
+    run_folder, entries = write_run_checksums(
+        synthetic_run, ["raw_data", "analysis", "output"], b"first"
+    )
+    assert len(entries) == 6
+    # a transfer of the raw data only
+    _, entries = write_run_checksums(synthetic_run, ["raw_data"], b"second")
+    digests = {path: digest for digest, path in entries}
+    assert len(entries) == 6
+    assert digests["raw_data/a.txt"] == hashlib.sha256(b"second").hexdigest()
+    assert digests["analysis/sub/b\\c.txt"] == hashlib.sha256(b"first").hexdigest()
+    assert digests["output/a.txt"] == hashlib.sha256(b"first").hexdigest()
+    if shutil.which("sha256sum"):
+        subprocess.run(
+            ["sha256sum", "--quiet", "-c", "CHECKSUMS"], cwd=run_folder, check=True
+        )
+
+
+def test_checksums_of_another_algorithm_are_left_out(synthetic_run):
+    write_run_checksums(synthetic_run, ["raw_data", "analysis"], b"x", "md5")
+    _, entries = write_run_checksums(synthetic_run, ["raw_data"], b"x")
+    assert sorted(path for _, path in entries) == [
+        "raw_data/a.txt",
+        "raw_data/sub/b\\c.txt",
+    ]
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the persistent cache of file digests
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import hashlib
+
+import pytest
+
+from vizgen_data_transfer import checksum
+from vizgen_data_transfer.checksum import stat_key, verify_tree
+from vizgen_data_transfer.hash_cache import HashCache
+
+algorithm = "sha256"
+
+
+@pytest.fixture
+def trees(tmp_path):
+    source = tmp_path / "source"
+    destination = tmp_path / "destination"
+    for root in (source, destination):
+        (root / "d").mkdir(parents=True)
+        (root / "a.txt").write_bytes(b"a" * 10)
+        (root / "d" / "b.txt").write_bytes(b"b" * 20)
+    return str(source), str(destination)
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """
+    Paths of the files read by hash_file.
+    """
+    paths = list()
+    hash_file = checksum.hash_file
+
+    def counting_hash_file(path, *args, **kwargs):
+        paths.append(os.path.basename(path))
+        return hash_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(checksum, "hash_file", counting_hash_file)
+    return paths
+
+
+def verify(cache, source, destination, paths=("a.txt", "d/b.txt")):
+    """
+    Verify the files using the digests of the cache, as verify_checksums does.
+    """
+
+    def lookup(path):
+        return (
+            cache.get("source", path, algorithm),
+            cache.get("destination", path, algorithm),
+        )
+
+    def on_record(record):
+        for side in ("source", "destination"):
+            cache.record(
+                side,
+                record["path"],
+                algorithm,
+                record[f"{side}_key"],
+                record[f"{side}_digest"],
+                record[f"{side}_cached"],
+            )
+
+    totals = verify_tree(
+        source,
+        destination,
+        paths,
+        algorithm=algorithm,
+        lookup=lookup,
+        on_record=on_record,
+    )
+    cache.commit()
+    return totals
+
+
+def test_put_and_get(tmp_path):
+    cache_file = str(tmp_path / "cache.sqlite")
+    with HashCache(cache_file) as cache:
+        assert cache.get("source", "a.txt", algorithm) is None
+        cache.put("source", "a.txt", algorithm, (10, 123, 4), "digest")
+    # kept between runs
+    with HashCache(cache_file) as cache:
+        assert cache.get("source", "a.txt", algorithm) == (10, 123, 4, "digest")
+        assert cache.get("source", "a.txt", "md5") is None
+        assert cache.get("destination", "a.txt", algorithm) is None
+
+
+def test_unchanged_files_are_not_hashed_again(tmp_path, trees, hashed):
+    cache_file = str(tmp_path / "cache.sqlite")
+    with HashCache(cache_file) as cache:
+        assert verify(cache, *trees)["match"] == 2
+        assert (cache.hits, cache.misses) == (0, 4)
+    assert len(hashed) == 4
+    hashed.clear()
+    with HashCache(cache_file) as cache:
+        assert verify(cache, *trees)["match"] == 2
+        assert (cache.hits, cache.misses) == (4, 0)
+    assert hashed == []
+
+
+def test_changed_file_is_hashed_again(tmp_path, trees, hashed):
+    source, destination = trees
+    cache_file = str(tmp_path / "cache.sqlite")
+    with HashCache(cache_file) as cache:
+        verify(cache, source, destination)
+    hashed.clear()
+    # same size, new content and modification time
+    path = os.path.join(destination, "a.txt")
+    st = os.stat(path)
+    with open(path, "wb") as f:
+        f.write(b"x" * 10)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    with HashCache(cache_file) as cache:
+        totals = verify(cache, source, destination)
+        assert (cache.hits, cache.misses) == (3, 1)
+    assert hashed == ["a.txt"]
+    assert totals["mismatch"] == 1
+
+
+@pytest.mark.parametrize("field", [0, 1, 2], ids=["size", "mtime_ns", "inode"])
+def test_changed_key_invalidates_the_digest(tmp_path, trees, hashed, field):
+    source, destination = trees
+    path = os.path.join(source, "a.txt")
+    key = list(stat_key(os.stat(path)))
+    key[field] += 1
+    cache_file = str(tmp_path / "cache.sqlite")
+    with HashCache(cache_file) as cache:
+        # a wrong digest stored with a key that no longer matches the file
+        cache.put("source", "a.txt", algorithm, tuple(key), "stale")
+        cache.commit()
+        totals = verify(cache, source, destination, paths=["a.txt"])
+        assert totals["match"] == 1
+        assert cache.get("source", "a.txt", algorithm)[3] == (
+            hashlib.sha256(b"a" * 10).hexdigest()
+        )
+    assert "a.txt" in hashed
+
+
+def test_stored_key_is_reused(tmp_path, trees, hashed):
+    source, destination = trees
+    path = os.path.join(source, "a.txt")
+    cache_file = str(tmp_path / "cache.sqlite")
+    with HashCache(cache_file) as cache:
+        # the digest is trusted as long as size, mtime_ns and inode match
+        cache.put("source", "a.txt", algorithm, stat_key(os.stat(path)), "trusted")
+        cache.commit()
+        verify(cache, source, destination, paths=["a.txt"])
+        assert cache.hits == 1
+    # only the destination file is read
+    assert hashed == ["a.txt"]
+
+
+def test_hash_cache_needs_checksums(synthetic_run):
+    assert not synthetic_run.get_transfer("--hash_cache").hash_cache
+    assert synthetic_run.get_transfer("--hash_cache", "--checksum").hash_cache
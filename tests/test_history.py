@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the transfer history
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import sqlite3
+
+from vizgen_data_transfer.history import TransferHistory, find_slow_copies
+
+mb = 1024 * 1024
+
+
+def make_report(run_id, copy_types, finished="2026-01-01T10:00:00", **info):
+    """
+    Metrics report with {copy_type: (files, size_bytes, copy_seconds)} copy types.
+    """
+    info = dict(
+        {"os": "linux", "backend": "rsync", "threads": 8, "disk": False}, **info
+    )
+    return {
+        "run_id": run_id,
+        "started": finished,
+        "finished": finished,
+        "status": "complete",
+        "total_seconds": 100,
+        "info": info,
+        "copy_types": {
+            copy_type: {
+                "files": files,
+                "size_bytes": size_bytes,
+                "stages": {"copy": {"seconds": seconds}},
+            }
+            for copy_type, (files, size_bytes, seconds) in copy_types.items()
+        },
+        "stages": [
+            {"copy_type": copy_type, "stage": "copy", "seconds": seconds}
+            for copy_type, (_, _, seconds) in copy_types.items()
+        ],
+    }
+
+
+def get_copies(history_file):
+    with TransferHistory(history_file) as history:
+        return {x["copy_type"]: x for x in history.copies(status=None)}
+
+
+def test_record_threads_of_each_copy_type(tmp_path):
+    history_file = str(tmp_path / "history.sqlite")
+    report = make_report(
+        "RUN1",
+        {
+            "raw_data": (10, 100 * mb, 10),
+            "analysis": (50, 10 * mb, 5),
+            "output": (5, mb, 1),
+        },
+        threads="auto",
+        adaptive_threads={"analysis": 12},
+        policies={
+            "raw_data": {"backend": "native", "threads": 4},
+            "analysis": {"backend": "native", "threads": "auto"},
+            "output": {"backend": "rsync", "threads": 8},
+        },
+    )
+    with TransferHistory(history_file) as history:
+        history.record(report)
+    copies = get_copies(history_file)
+    assert copies["raw_data"]["threads"] == "4"
+    assert copies["raw_data"]["backend"] == "native"
+    assert copies["analysis"]["threads"] == "auto:12"
+    assert copies["output"]["threads"] == "8"
+    assert copies["output"]["backend"] == "rsync"
+    assert copies["raw_data"]["mb_per_second"] == 10
+
+
+def test_record_threads_without_policies(tmp_path):
+    history_file = str(tmp_path / "history.sqlite")
+    with TransferHistory(history_file) as history:
+        history.record(
+            make_report("RUN1", {"raw_data": (10, 100 * mb, 10)}, threads=16)
+        )
+    assert get_copies(history_file)["raw_data"]["threads"] == "16"
+
+
+def test_resumed_copy_uses_transferred_bytes(tmp_path):
+    history_file = str(tmp_path / "history.sqlite")
+    report = make_report(
+        "RUN1",
+        {"raw_data": (100, 1000 * mb, 10), "analysis": (50, 10 * mb, 5)},
+        resume=True,
+        resume_totals={"raw_data": {"files": 10, "size_bytes": 100 * mb}},
+    )
+    with TransferHistory(history_file) as history:
+        history.record(report)
+    copies = get_copies(history_file)
+    assert copies["raw_data"]["resumed"] == 1
+    assert copies["raw_data"]["size_bytes"] == 100 * mb
+    assert copies["raw_data"]["mb_per_second"] == 10
+    assert copies["raw_data"]["files_per_second"] == 1
+    # no resume totals (robocopy) so the transferred size is not known
+    assert "analysis" not in copies
+
+
+def test_resumed_copy_with_nothing_left_is_left_out(tmp_path):
+    history_file = str(tmp_path / "history.sqlite")
+    report = make_report(
+        "RUN1",
+        {"raw_data": (100, 1000 * mb, 1)},
+        resume=True,
+        resume_totals={"raw_data": {"files": 0, "size_bytes": 0}},
+    )
+    with TransferHistory(history_file) as history:
+        history.record(report)
+    assert get_copies(history_file) == dict()
+
+
+def test_copy_of_resumed_run_is_left_out(tmp_path):
+    history_file = str(tmp_path / "history.sqlite")
+    with TransferHistory(history_file) as history:
+        history.record(
+            make_report("RUN1", {"raw_data": (100, 1000 * mb, 10)}, resumed=True)
+        )
+    assert get_copies(history_file) == dict()
+
+
+def test_copy_types_table(tmp_path):
+    history_file = str(tmp_path / "history.sqlite")
+    with TransferHistory(history_file) as history:
+        history.record(make_report("RUN1", {"raw_data": (10, 100 * mb, 10)}))
+    # opening an existing history keeps its transfers
+    with TransferHistory(history_file) as history:
+        history.record(make_report("RUN2", {"raw_data": (10, 100 * mb, 5)}))
+    connection = sqlite3.connect(history_file)
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(copy_types)")]
+    rows = connection.execute(
+        "SELECT backend, threads, resumed, transferred_files, transferred_bytes FROM copy_types"
+    ).fetchall()
+    connection.close()
+    assert os.path.exists(history_file)
+    assert columns[-5:] == [
+        "backend",
+        "threads",
+        "resumed",
+        "transferred_files",
+        "transferred_bytes",
+    ]
+    assert rows == [("rsync", "8", 0, 10, 100 * mb)] * 2
+
+
+def test_find_slow_copies():
+    copies = [
+        {"copy_type": "raw_data", "size_bytes": 100 * mb, "mb_per_second": speed}
+        for speed in (100, 110, 90, 20, 100)
+    ]
+    slow = find_slow_copies(copies, slow_factor=2, min_transfers=3)
+    assert slow == [(copies[3], 100, 3)]
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the stability detection and of the passes of the incremental mode
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import re
+import logging
+
+import pytest
+
+from vizgen_data_transfer.incremental import stable_files
+from vizgen_data_transfer.manifest import ManifestWriter
+
+mtime_ns = 1700000000 * 10**9
+
+
+def make_manifest(manifest_file, files, folders=()):
+    """
+    Write a manifest of {path: size} or {path: (size, mtime_ns)} files.
+    """
+    with ManifestWriter(str(manifest_file)) as manifest:
+        for path, info in files.items():
+            size, mtime = info if isinstance(info, tuple) else (info, mtime_ns)
+            manifest.add(path, "f", size, mtime)
+        for path in folders:
+            manifest.add(path, "d", 0, mtime_ns)
+    return str(manifest_file)
+
+
+def get_stable(tmp_path, previous, current, synced=None, folders=((), ())):
+    stats = dict()
+    paths = [
+        entry.path
+        for entry in stable_files(
+            make_manifest(tmp_path / "previous.tsv.gz", previous, folders[0]),
+            make_manifest(tmp_path / "current.tsv.gz", current, folders[1]),
+            make_manifest(tmp_path / "synced.tsv.gz", synced) if synced else None,
+            stats=stats,
+        )
+    ]
+    return paths, stats
+
+
+def test_first_scans(tmp_path):
+    files = {"a.dax": 10, "b/c.csv": 20, "b/d.csv": 30}
+    paths, stats = get_stable(tmp_path, files, files)
+    assert paths == ["a.dax", "b/c.csv", "b/d.csv"]
+    assert stats == {"files": 3, "stable": 3, "synced": 0, "changed": 0}
+
+
+def test_changed_files_are_not_stable(tmp_path):
+    previous = {
+        "growing.dax": 10,
+        "touched.dax": 10,
+        "removed.dax": 10,
+        "same.dax": 10,
+    }
+    current = {
+        # still being written between the two scans
+        "growing.dax": 20,
+        "touched.dax": (10, mtime_ns + 10**9),
+        "new.dax": 5,
+        "same.dax": 10,
+    }
+    paths, stats = get_stable(tmp_path, previous, current)
+    assert paths == ["same.dax"]
+    assert stats == {"files": 4, "stable": 1, "synced": 0, "changed": 4}
+
+
+def test_already_copied_files_are_skipped(tmp_path):
+    files = {"a.dax": 10, "b.dax": 20, "c.dax": 30}
+    # b.dax was copied with another size, it is copied again
+    synced = {"a.dax": 10, "b.dax": 15, "z.dax": 1}
+    paths, stats = get_stable(tmp_path, files, files, synced)
+    assert paths == ["b.dax", "c.dax"]
+    assert stats == {"files": 3, "stable": 3, "synced": 1, "changed": 0}
+
+
+def test_folders_are_changes_but_not_copied(tmp_path):
+    files = {"region_0/a.dax": 10}
+    paths, stats = get_stable(
+        tmp_path, files, files, folders=(["region_0"], ["region_0", "region_1"])
+    )
+    assert paths == ["region_0/a.dax"]
+    assert stats["changed"] == 1
+
+
+@pytest.fixture
+def incremental(synthetic_run):
+    transfer = synthetic_run.get_transfer("--backend", "native", "--incremental")
+    source, destination, _ = transfer.get_copy_locations("raw_data")
+    os.makedirs(os.path.join(source, "data"))
+    return transfer, source, destination
+
+
+def write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def files_to_copy(caplog):
+    messages = [x.getMessage() for x in caplog.records]
+    matches = [re.search(r"Files to copy: (\d+)", x) for x in messages]
+    return int([x for x in matches if x][-1].group(1))
+
+
+def test_incremental_passes(incremental, caplog):
+    transfer, source, destination = incremental
+    write(os.path.join(source, "settings.json"), 10)
+    write(os.path.join(source, "data", "stack_0.dax"), 100)
+    caplog.set_level(logging.INFO)
+
+    # first scan, nothing is copied yet
+    assert transfer.incremental_pass("raw_data")
+    assert not os.path.exists(destination)
+
+    # the stack is still being written, only the settings are copied
+    write(os.path.join(source, "data", "stack_0.dax"), 200)
+    assert transfer.incremental_pass("raw_data")
+    assert files_to_copy(caplog) == 1
+    assert os.listdir(destination) == ["settings.json"]
+
+    # no change since the previous scan, the stack is copied and the settings
+    # already copied are not copied again
+    assert not transfer.incremental_pass("raw_data")
+    assert files_to_copy(caplog) == 1
+    assert os.path.getsize(os.path.join(destination, "data", "stack_0.dax")) == 200
+
+    # nothing left to copy
+    assert not transfer.incremental_pass("raw_data")
+    assert files_to_copy(caplog) == 0
+
+
+def test_incremental_pass_without_source(synthetic_run):
+    transfer = synthetic_run.get_transfer("--backend", "native", "--incremental")
+    assert transfer.incremental_pass("raw_data")
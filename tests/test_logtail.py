@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the log head and tail readers and of the log file checks, on large synthetic logs
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+
+import pytest
+
+from vizgen_data_transfer import native_copy
+from vizgen_data_transfer.benchmark.generator import (
+    iter_run_entries,
+    scales,
+    write_robocopy_log,
+    write_rsync_log,
+)
+from vizgen_data_transfer.logtail import read_head_lines, read_tail_lines
+
+complete = "Complete log file"
+
+block_sizes = [1, 2, 7, 64, 1000, 64 * 1024]
+
+
+def get_entries(copy_type="analysis"):
+    return [
+        (path, size)
+        for entry_type, path, size in iter_run_entries(scales["small"])
+        if entry_type == copy_type
+    ]
+
+
+def rewrite(log_file, encoding="utf-8", newline="\n", trailing_newline=True):
+    """
+    Write a log again with another encoding and line ending, and optionally without the line break at the end.
+    """
+    with open(log_file, encoding="utf-8") as f:
+        text = f.read()
+    if not trailing_newline:
+        text = text.rstrip("\n")
+    with open(log_file, "w", encoding=encoding, newline=newline) as f:
+        f.write(text)
+
+
+def expected_lines(log_file, encoding):
+    # what the original checks got from f.readlines()
+    with open(log_file, encoding=encoding, newline=None) as f:
+        return [line.rstrip("\n") for line in f.readlines()]
+
+
+@pytest.fixture
+def robocopy_log(tmp_path):
+    # about 300 KB, several blocks of the default block size
+    log_file = str(tmp_path / "analysis.robocopy.log")
+    write_robocopy_log(log_file, "Z:\\merfish_analysis\\RUN", "L:\\RUN", get_entries())
+    assert os.path.getsize(log_file) > 4 * 64 * 1024
+    return log_file
+
+
+@pytest.mark.parametrize("block_size", block_sizes)
+@pytest.mark.parametrize(
+    "encoding,newline",
+    [("utf-8", "\n"), ("utf-8", "\r\n"), ("utf-16", "\r\n"), ("utf-16-be", "\n")],
+)
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_tail_and_head_match_readlines(
+    robocopy_log, block_size, encoding, newline, trailing_newline
+):
+    rewrite(robocopy_log, encoding, newline, trailing_newline)
+    lines = expected_lines(robocopy_log, encoding)
+    # the lines of the footer are cut by the block boundaries of the small
+    # block sizes
+    for n in (1, 7, 12):
+        assert (
+            read_tail_lines(robocopy_log, n, encoding=encoding, block_size=block_size)
+            == lines[-n:]
+        )
+        assert (
+            read_head_lines(robocopy_log, n, encoding=encoding, block_size=block_size)
+            == lines[:n]
+        )
+
+
+def test_utf16_is_detected_from_the_byte_order_mark(robocopy_log):
+    rewrite(robocopy_log, "utf-16", "\r\n")
+    lines = expected_lines(robocopy_log, "utf-16")
+    assert read_head_lines(robocopy_log, 4) == lines[:4]
+    assert read_tail_lines(robocopy_log, 12) == lines[-12:]
+
+
+@pytest.mark.parametrize("block_size", block_sizes)
+@pytest.mark.parametrize(
+    "content", ["", "\n", "one", "one\n", "one\ntwo", "a\r\nb\r\n"]
+)
+def test_file_shorter_than_the_block_size(tmp_path, block_size, content):
+    log_file = tmp_path / "short.log"
+    log_file.write_bytes(content.encode())
+    lines = content.encode().splitlines()
+    for n in (0, 1, 2, 5):
+        assert read_tail_lines(str(log_file), n, block_size=block_size) == [
+            x.decode() for x in lines[-n:] if n
+        ]
+        assert read_head_lines(str(log_file), n, block_size=block_size) == [
+            x.decode() for x in lines[:n]
+        ]
+
+
+def test_multibyte_character_cut_by_a_block(tmp_path):
+    log_file = tmp_path / "utf8.log"
+    log_file.write_text("première\nsecond ligne\nfin é\n", encoding="utf-8")
+    for block_size in range(1, 12):
+        assert read_tail_lines(
+            str(log_file), 2, encoding="utf-8", block_size=block_size
+        ) == ["second ligne", "fin é"]
+
+
+def check(transfer, log_file, os_name="windows"):
+    # the robocopy checks only read the log, they run on Linux once the
+    # transfer takes the Windows code path
+    transfer.os_name = os_name
+    return transfer.check_log_file(log_file)
+
+
+@pytest.mark.parametrize(
+    "encoding,newline", [("utf-8", "\n"), ("utf-8", "\r\n"), ("utf-16", "\r\n")]
+)
+def test_check_log_file_robocopy(transfer, robocopy_log, encoding, newline):
+    rewrite(robocopy_log, encoding, newline)
+    assert check(transfer, robocopy_log) == complete
+
+
+def test_check_log_file_robocopy_appended(transfer, robocopy_log, tmp_path):
+    # a resumed robocopy appends a second copy log with /LOG+
+    with open(robocopy_log, encoding="utf-8") as f:
+        text = f.read()
+    with open(robocopy_log, "a", encoding="utf-8") as f:
+        f.write(text)
+    assert check(transfer, robocopy_log) == complete
+
+
+@pytest.mark.parametrize("cut", ["before_footer", "end_of_footer"])
+def test_check_log_file_robocopy_interrupted(transfer, robocopy_log, cut):
+    # the footer is missing or cut short when robocopy is stopped
+    with open(robocopy_log, encoding="utf-8") as f:
+        lines = f.readlines()
+    footer = next(n for n, line in enumerate(lines) if transfer.robocopy_footer in line)
+    lines = lines[: footer - 1] if cut == "before_footer" else lines[:-3]
+    with open(robocopy_log, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    assert check(transfer, robocopy_log) != complete
+
+
+def test_check_log_file_robocopy_missing_header(transfer, robocopy_log):
+    with open(robocopy_log, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(robocopy_log, "w", encoding="utf-8") as f:
+        f.writelines(lines[4:])
+    assert check(transfer, robocopy_log) != complete
+
+
+def test_check_log_file_rsync(transfer, tmp_path):
+    log_file = str(tmp_path / "analysis.rsync.log")
+    write_rsync_log(log_file, get_entries())
+    assert check(transfer, log_file, os_name="linux") == complete
+
+
+def test_check_log_file_native(transfer, tmp_path):
+    log_file = str(tmp_path / "analysis.native.log")
+    with open(log_file, "w", encoding="utf-8") as f:
+        f.write(f"2026/01/01 00:00:00 [1] {native_copy.log_header}\n")
+        for path, size in get_entries():
+            f.write(
+                f"2026/01/01 00:00:00 [1] copied {size} 0.001s copy_file_range {path}\n"
+            )
+    transfer.backend = "native"
+    assert check(transfer, log_file, os_name="linux") != complete
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write(f"2026/01/01 00:00:01 [1] {native_copy.log_footer}\n")
+    assert check(transfer, log_file, os_name="linux") == complete
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the per-file manifests, their external sort and the diff engine
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import random
+
+import pytest
+
+from vizgen_data_transfer.manifest import (
+    ManifestEntry,
+    ManifestWriter,
+    diff_manifests,
+    merge_manifests,
+    read_manifest,
+    summarise_diff,
+    write_manifest,
+)
+
+
+def make_manifest(manifest_file, files, folders=(), chunk_size=1000):
+    """
+    Write a manifest of {path: size} files and folders, added in a random order.
+    """
+    entries = [(path, "f", size, 1000 + size) for path, size in files.items()]
+    entries += [(path, "d", 0, 0) for path in folders]
+    random.Random(0).shuffle(entries)
+    with ManifestWriter(str(manifest_file), chunk_size=chunk_size) as manifest:
+        for entry in entries:
+            manifest.add(*entry)
+    return str(manifest_file)
+
+
+def test_diff_manifests(tmp_path):
+    source = make_manifest(
+        tmp_path / "source.tsv.gz",
+        {"a.txt": 1, "b.txt": 2, "d/c.txt": 3, "d/e.txt": 4, "same.txt": 5},
+        folders=["d"],
+    )
+    destination = make_manifest(
+        tmp_path / "destination.tsv.gz",
+        {"a.txt": 1, "d/c.txt": 30, "d/e.txt": 4, "same.txt": 5, "z.txt": 6},
+        folders=["d", "extra_folder"],
+    )
+    diff = [
+        (kind, (src or dst).path)
+        for kind, src, dst in diff_manifests(source, destination)
+    ]
+    assert diff == [
+        ("missing", "b.txt"),
+        ("size_mismatch", "d/c.txt"),
+        ("extra", "z.txt"),
+    ]
+    summary = summarise_diff(source, destination)
+    assert summary["missing"] == {"count": 1, "examples": ["b.txt"]}
+    assert summary["extra"] == {"count": 1, "examples": ["z.txt"]}
+    assert summary["size_mismatch"] == {
+        "count": 1,
+        "examples": ["d/c.txt (source: 3 bytes, destination: 30 bytes)"],
+    }
+    # folders are only compared when asked for
+    diff = [
+        (kind, (src or dst).path)
+        for kind, src, dst in diff_manifests(source, destination, include_dirs=True)
+    ]
+    assert ("extra", "extra_folder") in diff
+
+
+def test_file_replaced_by_a_folder(tmp_path):
+    source = make_manifest(tmp_path / "source.tsv.gz", {"x": 1})
+    destination = make_manifest(tmp_path / "destination.tsv.gz", {}, folders=["x"])
+    diff = diff_manifests(source, destination, include_dirs=True)
+    assert [kind for kind, _, _ in diff] == ["missing", "extra"]
+
+
+def test_identical_manifests(tmp_path):
+    files = {f"f{n}": n for n in range(100)}
+    source = make_manifest(tmp_path / "source.tsv.gz", files)
+    destination = make_manifest(tmp_path / "destination.tsv.gz", files)
+    assert list(diff_manifests(source, destination)) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 10000])
+def test_manifest_larger_than_a_chunk(tmp_path, chunk_size):
+    files = {f"region_{n % 5}/fov_{n}/image.tif": n for n in range(500)}
+    manifest = make_manifest(
+        tmp_path / "manifest.tsv.gz",
+        files,
+        folders=[f"region_{n}" for n in range(5)],
+        chunk_size=chunk_size,
+    )
+    entries = list(read_manifest(manifest))
+    assert [x.path for x in entries] == sorted(x.path for x in entries)
+    assert {x.path: x.size for x in entries if x.type == "f"} == files
+    assert len(entries) == 505
+    # the spilled chunks are removed
+    assert os.listdir(tmp_path) == ["manifest.tsv.gz"]
+
+
+def test_paths_with_tabs_and_newlines(tmp_path):
+    files = {
+        "tab\tname.csv": 1,
+        "new\nline.txt": 2,
+        "back\\slash\\t.txt": 3,
+        "trailing backslash\\": 4,
+        "région/données.csv": 5,
+        "plain.txt": 6,
+    }
+    manifest = make_manifest(tmp_path / "manifest.tsv.gz", files, chunk_size=2)
+    entries = list(read_manifest(manifest))
+    assert {x.path: x.size for x in entries} == files
+    # one line per entry
+    assert len(entries) == len(files)
+    assert list(diff_manifests(manifest, manifest)) == []
+
+
+def test_write_manifest_is_atomic(tmp_path):
+    manifest = str(tmp_path / "manifest.tsv.gz")
+    write_manifest(manifest, [ManifestEntry("a", "f", 1, 2)])
+
+    def failing():
+        yield ManifestEntry("b", "f", 1, 2)
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        write_manifest(manifest, failing())
+    assert list(read_manifest(manifest)) == [ManifestEntry("a", "f", 1, 2)]
+
+
+def test_merge_manifests(tmp_path):
+    base = make_manifest(
+        tmp_path / "base.tsv.gz", {"a.txt": 1, "b.txt": 2}, folders=["d"]
+    )
+    update = make_manifest(
+        tmp_path / "update.tsv.gz", {"b.txt": 20, "d/c.txt": 3}, folders=["d"]
+    )
+    merged = str(tmp_path / "merged.tsv.gz")
+    totals = merge_manifests(base, update, merged)
+    assert totals == {"files": 3, "folders": 1, "size_bytes": 24}
+    assert [(x.path, x.size) for x in read_manifest(merged)] == [
+        ("a.txt", 1),
+        ("b.txt", 20),
+        ("d", 0),
+        ("d/c.txt", 3),
+    ]
+
+
+@pytest.mark.parametrize(
+    "destination_files,ignore,error",
+    [
+        # a missing file offset by an extra file, the counts agree
+        ({"a.txt": 1, "z.txt": 2}, [], True),
+        ({"a.txt": 1, "b.txt": 20}, [], True),
+        ({"a.txt": 1, "b.txt": 2, "z.txt": 3}, [], False),
+        ({"a.txt": 1, "z.txt": 2}, ["raw_data:files"], False),
+        ({"a.txt": 1, "b.txt": 20}, ["all:bytes"], False),
+        ({"a.txt": 1, "b.txt": 20}, ["raw_data:files"], True),
+    ],
+    ids=[
+        "missing",
+        "size_mismatch",
+        "extra",
+        "missing_ignored",
+        "size_mismatch_ignored",
+        "other_metric_ignored",
+    ],
+)
+def test_manifest_diff_fails_the_transfer(
+    tmp_path, synthetic_run, destination_files, ignore, error
+):
+    options = ["--ignore_python_counts", *ignore] if ignore else []
+    transfer = synthetic_run.get_transfer(*options)
+    transfer.store_manifest_files["before"]["raw_data"] = make_manifest(
+        tmp_path / "source.tsv.gz", {"a.txt": 1, "b.txt": 2}
+    )
+    transfer.store_manifest_files["after"]["raw_data"] = make_manifest(
+        tmp_path / "destination.tsv.gz", destination_files
+    )
+    transfer.get_manifest_diff(["raw_data"])
+    email_content, diff_error = transfer.get_manifest_diff_summary("raw_data")
+    assert diff_error is error
+    assert ("ERROR:" in email_content) is error
+    assert ("WARNING:" in email_content) is (bool(ignore) and not error)
+
+
+def test_no_manifest_diff(transfer):
+    assert transfer.get_manifest_diff_summary("raw_data") == ("", False)
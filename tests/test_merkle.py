@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the folder digests of the manifests and of their top-down comparison
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import pytest
+
+from vizgen_data_transfer.manifest import ManifestWriter
+from vizgen_data_transfer.merkle import (
+    compare_tree_digests,
+    read_tree_digests,
+    tree_digests,
+    write_tree_digests,
+)
+
+mtime_ns = 1700000000 * 10**9
+
+# a few regions of a few FOVs, with files at every level
+files = {"settings.json": 10}
+for region in range(3):
+    files[f"region_{region}/mosaic.tif"] = 1000
+    for fov in range(4):
+        files[f"region_{region}/fov_{fov}/image.dax"] = 100 + fov
+        files[f"region_{region}/fov_{fov}/cells/cell_0.csv"] = 5
+
+
+def make_manifest(manifest_file, files, folders=None, mtimes=None):
+    """
+    Write a manifest of {path: size} files, with every parent folder listed unless 'folders' is given.
+    """
+    mtimes = mtimes or dict()
+    if folders is None:
+        folders = set()
+        for path in files:
+            while "/" in path:
+                path = path.rsplit("/", 1)[0]
+                folders.add(path)
+    with ManifestWriter(str(manifest_file)) as manifest:
+        for path, size in files.items():
+            manifest.add(path, "f", size, mtimes.get(path, mtime_ns))
+        for path in folders:
+            manifest.add(path, "d", 0, mtime_ns)
+    return str(manifest_file)
+
+
+@pytest.fixture
+def source(tmp_path):
+    return tree_digests(make_manifest(tmp_path / "source.tsv.gz", files))
+
+
+def test_identical_trees(tmp_path, source):
+    destination = tree_digests(make_manifest(tmp_path / "destination.tsv.gz", files))
+    assert destination == source
+    # only the top folder is compared
+    assert compare_tree_digests(source, destination) == ([], 1)
+    assert source[""]["file_count"] == len(files)
+    assert source[""]["size_bytes"] == sum(files.values())
+    assert source["region_1"]["subdirs"] == [f"fov_{n}" for n in range(4)]
+    assert source["region_1"]["file_count"] == 9
+
+
+def test_folders_without_folder_entries(tmp_path, source):
+    # folders only known as the parent of a file give the same digests
+    destination = make_manifest(tmp_path / "destination.tsv.gz", files, folders=())
+    assert tree_digests(destination) == source
+
+
+@pytest.mark.parametrize("change", ["size", "mtime", "content"])
+def test_one_changed_file_deep_in_the_tree(tmp_path, source, change):
+    changed = "region_2/fov_3/cells/cell_0.csv"
+    sizes = dict(files)
+    mtimes = dict()
+    content = None
+    if change == "size":
+        sizes[changed] += 1
+    elif change == "mtime":
+        mtimes[changed] = mtime_ns + 10**9
+    else:
+        content = {changed: "abc"}.get
+    destination = tree_digests(
+        make_manifest(tmp_path / "destination.tsv.gz", sizes, mtimes=mtimes),
+        content=content,
+    )
+    differences, visited = compare_tree_digests(source, destination)
+    # only the folder of the file is reported
+    assert differences == [("files", "region_2/fov_3/cells")]
+    # the changed folder and its ancestors are descended into, so their sub
+    # folders are compared, the other folders are not
+    ancestors = ["", "region_2", "region_2/fov_3", "region_2/fov_3/cells"]
+    for path in ancestors:
+        assert source[path]["digest"] != destination[path]["digest"]
+    assert visited == 1 + sum(len(source[path]["subdirs"]) for path in ancestors)
+    assert visited < len(source)
+    for path in source:
+        if path not in ancestors:
+            assert source[path]["digest"] == destination[path]["digest"]
+
+
+def test_mtime_to_the_second(tmp_path, source):
+    mtimes = {path: mtime_ns + 999999999 for path in files}
+    destination = tree_digests(
+        make_manifest(tmp_path / "destination.tsv.gz", files, mtimes=mtimes)
+    )
+    assert compare_tree_digests(source, destination)[0] == []
+    mtimes = {path: mtime_ns + 10**9 for path in files}
+    destination = tree_digests(
+        make_manifest(tmp_path / "destination.tsv.gz", files, mtimes=mtimes),
+        include_mtime=False,
+    )
+    source = tree_digests(
+        make_manifest(tmp_path / "source.tsv.gz", files), include_mtime=False
+    )
+    assert compare_tree_digests(source, destination)[0] == []
+
+
+def test_removed_subfolder(tmp_path, source):
+    removed = {x: y for x, y in files.items() if not x.startswith("region_0/fov_1/")}
+    destination = tree_digests(make_manifest(tmp_path / "destination.tsv.gz", removed))
+    differences, _ = compare_tree_digests(source, destination)
+    # the folder is reported once, not its sub folders
+    assert differences == [("missing", "region_0/fov_1")]
+    assert destination[""]["file_count"] == len(files) - 2
+
+
+def test_added_subfolder(tmp_path, source):
+    added = dict(files, **{"region_1/fov_9/image.dax": 1, "region_1/fov_9/x/y": 1})
+    destination = tree_digests(make_manifest(tmp_path / "destination.tsv.gz", added))
+    differences, _ = compare_tree_digests(source, destination)
+    assert differences == [("extra", "region_1/fov_9")]
+
+
+def test_empty_subfolder(tmp_path, source):
+    destination = tree_digests(
+        make_manifest(
+            tmp_path / "destination.tsv.gz",
+            files,
+            folders=["region_0", "region_0/empty"],
+        )
+    )
+    assert compare_tree_digests(source, destination)[0] == [
+        ("extra", "region_0/empty")
+    ]
+
+
+def test_write_tree_digests(tmp_path, source):
+    digests_file = str(tmp_path / "digests.json.gz")
+    write_tree_digests(digests_file, source)
+    assert read_tree_digests(digests_file) == source
+
+
+def test_differing_folders_fail_the_transfer(tmp_path, transfer):
+    sizes = dict(files, **{"region_2/fov_3/cells/cell_0.csv": 6})
+    transfer.store_manifest_files["before"]["raw_data"] = make_manifest(
+        tmp_path / "source.tsv.gz", files
+    )
+    transfer.store_manifest_files["after"]["raw_data"] = make_manifest(
+        tmp_path / "destination.tsv.gz", sizes
+    )
+    assert transfer.get_tree_digest_summary("raw_data") == ("", False)
+    transfer.get_tree_digest_diff("raw_data")
+    email_content, error = transfer.get_tree_digest_summary("raw_data")
+    assert error
+    assert "region_2/fov_3/cells (files, 1 files, 5 bytes" in email_content
+
+    transfer.store_manifest_files["after"]["raw_data"] = make_manifest(
+        tmp_path / "destination.tsv.gz", files
+    )
+    transfer.get_tree_digest_diff("raw_data")
+    assert transfer.get_tree_digest_summary("raw_data") == ("", False)
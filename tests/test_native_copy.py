@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the native Python copy engine
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import errno
+
+import pytest
+
+from vizgen_data_transfer import native_copy
+from vizgen_data_transfer.native_copy import copy_file, copy_tree, is_up_to_date
+
+# small reads, so that every method loops over several calls
+buffer_size = 1000
+
+content = bytes(range(256)) * 40
+
+mtime_ns = 1700000000123456789
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.dax"
+    path.write_bytes(content)
+    os.chmod(path, 0o640)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def fail_after(function, error, calls_before):
+    """
+    Replacement of os.copy_file_range or os.sendfile raising OSError(error) once 'calls_before' calls of the real function went through, so a part of the file is already written.
+    """
+    calls = {"n": 0}
+
+    def wrapper(*args):
+        calls["n"] += 1
+        if calls["n"] > calls_before:
+            raise OSError(error, os.strerror(error))
+        return function(*args)
+
+    return wrapper
+
+
+def check_copy(source, destination):
+    with open(destination, "rb") as f:
+        assert f.read() == content
+    st = os.stat(destination)
+    assert st.st_mtime_ns == mtime_ns
+    assert st.st_mode & 0o777 == 0o640
+    assert not os.path.exists(destination + native_copy.partial_suffix)
+
+
+def test_copy_file(tmp_path, source):
+    destination = str(tmp_path / "destination.dax")
+    copied, method = copy_file(source, destination, buffer_size)
+    assert copied == len(content)
+    assert method in ("copy_file_range", "sendfile", "buffered")
+    check_copy(source, destination)
+
+
+def test_copy_empty_file(tmp_path):
+    source = tmp_path / "empty.txt"
+    source.write_bytes(b"")
+    destination = str(tmp_path / "copy.txt")
+    assert copy_file(str(source), destination)[0] == 0
+    assert os.path.getsize(destination) == 0
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "copy_file_range") or not hasattr(os, "sendfile"),
+    reason="copy_file_range or sendfile not available",
+)
+@pytest.mark.parametrize("error", [errno.EXDEV, errno.ENOSYS])
+@pytest.mark.parametrize("calls_before", [0, 2])
+def test_fallback_to_sendfile(tmp_path, source, monkeypatch, error, calls_before):
+    # copy_file_range fails between file systems or on old kernels, possibly
+    # after a part of the file was copied
+    monkeypatch.setattr(
+        os, "copy_file_range", fail_after(os.copy_file_range, error, calls_before)
+    )
+    destination = str(tmp_path / "destination.dax")
+    copied, method = copy_file(source, destination, buffer_size)
+    assert (copied, method) == (len(content), "sendfile")
+    check_copy(source, destination)
+
+
+@pytest.mark.parametrize("calls_before", [0, 2])
+def test_fallback_to_buffered_copy(tmp_path, source, monkeypatch, calls_before):
+    for name in ("copy_file_range", "sendfile"):
+        if hasattr(os, name):
+            monkeypatch.setattr(
+                os, name, fail_after(getattr(os, name), errno.ENOSYS, calls_before)
+            )
+    destination = str(tmp_path / "destination.dax")
+    copied, method = copy_file(source, destination, buffer_size)
+    assert (copied, method) == (len(content), "buffered")
+    check_copy(source, destination)
+
+
+def eof_after(function, calls_before):
+    """
+    Replacement of os.copy_file_range or os.sendfile returning 0, as at the end of the file, once 'calls_before' calls of the real function went through.
+    """
+    calls = {"n": 0}
+
+    def wrapper(*args):
+        calls["n"] += 1
+        if calls["n"] > calls_before:
+            return 0
+        return function(*args)
+
+    return wrapper
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "copy_file_range"), reason="copy_file_range not available"
+)
+@pytest.mark.parametrize("calls_before", [0, 2])
+def test_short_copy_falls_back(tmp_path, source, monkeypatch, calls_before):
+    # copy_file_range returns 0 before the end of the file on some file systems
+    monkeypatch.setattr(
+        os, "copy_file_range", eof_after(os.copy_file_range, calls_before)
+    )
+    destination = str(tmp_path / "destination.dax")
+    copied, method = copy_file(source, destination, buffer_size)
+    assert copied == len(content)
+    assert method in ("sendfile", "buffered")
+    check_copy(source, destination)
+
+    # both kernel calls short, the buffered copy is used
+    if hasattr(os, "sendfile"):
+        monkeypatch.setattr(os, "sendfile", eof_after(os.sendfile, calls_before))
+    os.remove(destination)
+    assert copy_file(source, destination, buffer_size) == (len(content), "buffered")
+    check_copy(source, destination)
+
+
+def test_short_copy_fails(tmp_path, source, monkeypatch):
+    # a file still short after the buffered copy is not renamed in place
+    for name in ("copy_file_range", "sendfile"):
+        monkeypatch.setattr(os, name, lambda *args: 0, raising=False)
+    monkeypatch.setattr(
+        native_copy, "_buffered", lambda fsrc, fdst, buffer_size: os.write(fdst, b"x")
+    )
+    destination = tmp_path / "destination.dax"
+    with pytest.raises(OSError, match="Copied 1 of the"):
+        copy_file(source, str(destination), buffer_size)
+    assert not destination.exists()
+    assert not os.path.exists(str(destination) + native_copy.partial_suffix)
+
+    # and is recorded as failed by copy_tree
+    records = list()
+    totals = copy_tree(
+        os.path.dirname(source),
+        str(tmp_path / "copy"),
+        [os.path.basename(source)],
+        on_record=records.append,
+    )
+    assert totals["failed"] == 1
+    assert records[0]["status"] == "failed"
+    assert not (tmp_path / "copy" / os.path.basename(source)).exists()
+
+
+def test_buffered_copy_without_zero_copy_calls(tmp_path, source, monkeypatch):
+    monkeypatch.delattr(os, "copy_file_range", raising=False)
+    monkeypatch.delattr(os, "sendfile", raising=False)
+    destination = str(tmp_path / "destination.dax")
+    assert copy_file(source, destination, buffer_size) == (len(content), "buffered")
+    check_copy(source, destination)
+
+
+def test_failed_copy_keeps_the_destination(tmp_path, source, monkeypatch):
+    # an error that is not a reason to fall back stops the copy, the
+    # destination is never left half written
+    def fail(*args):
+        raise OSError(errno.EIO, os.strerror(errno.EIO))
+
+    for name in ("copy_file_range", "sendfile"):
+        monkeypatch.setattr(os, name, fail, raising=False)
+    destination = tmp_path / "destination.dax"
+    destination.write_bytes(b"previous copy")
+    with pytest.raises(OSError):
+        copy_file(source, str(destination), buffer_size)
+    assert destination.read_bytes() == b"previous copy"
+    assert not os.path.exists(str(destination) + native_copy.partial_suffix)
+
+
+def test_is_up_to_date(tmp_path, source):
+    destination = str(tmp_path / "destination.dax")
+    assert not is_up_to_date(len(content), mtime_ns, destination)
+    copy_file(source, destination)
+    assert is_up_to_date(len(content), mtime_ns, destination)
+    # same second
+    assert is_up_to_date(len(content), mtime_ns - 100, destination)
+    assert not is_up_to_date(len(content) + 1, mtime_ns, destination)
+    assert not is_up_to_date(len(content), mtime_ns + 10**9, destination)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_copy_tree(tmp_path, workers):
+    source_root = tmp_path / "source"
+    destination_root = tmp_path / "destination"
+    paths = [f"region_{n % 3}/fov_{n}/image.tif" for n in range(10)]
+    for n, path in enumerate(paths):
+        file_path = source_root / path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(b"x" * n)
+    records = list()
+    totals = copy_tree(
+        str(source_root),
+        str(destination_root),
+        iter(paths + ["missing.txt"]),
+        workers=workers,
+        buffer_size=buffer_size,
+        on_record=records.append,
+    )
+    assert totals == {
+        "copied": 10,
+        "skipped": 0,
+        "failed": 1,
+        "size_bytes": sum(range(10)),
+    }
+    for n, path in enumerate(paths):
+        assert (destination_root / path).read_bytes() == b"x" * n
+    assert [x["path"] for x in records if x["status"] == "failed"] == ["missing.txt"]
+
+    # a second copy skips the files already copied
+    totals = copy_tree(str(source_root), str(destination_root), paths, workers=workers)
+    assert totals == {"copied": 0, "skipped": 10, "failed": 0, "size_bytes": 0}
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the transfer policies of the copy types
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import pytest
+
+from vizgen_data_transfer.policy import resolve_copy_policies
+
+
+def write_policies(synthetic_run, policies):
+    """
+    Replace the policy tables of the config of the synthetic run with 'policies', given as TOML text.
+    """
+    with open(synthetic_run.config_file) as f:
+        config = f.read()
+    start = config.find("[tool.options.policy.")
+    if start != -1:
+        config = config[:start]
+    with open(synthetic_run.config_file, "w") as f:
+        f.write(config + policies)
+
+
+def get_policy(synthetic_run, copy_type, *options):
+    transfer = synthetic_run.get_transfer(*options)
+    return transfer.get_copy_policy(copy_type)
+
+
+@pytest.fixture
+def native_raw_data(synthetic_run):
+    write_policies(
+        synthetic_run,
+        """
+[tool.options.policy.raw_data]
+backend = "native"
+threads = "8"
+rsync_shards = 2
+buffer_size = "16M"
+order = "largest_first"
+verify = "checksum"
+""",
+    )
+    return synthetic_run
+
+
+def test_policy_replaces_the_defaults(native_raw_data):
+    policy = get_policy(native_raw_data, "raw_data")
+    assert (policy["backend"], policy["threads"]) == ("native", 8)
+    assert policy["rsync_shards"] == 2
+    assert policy["buffer_size"] == 16 * 1024 * 1024
+    assert policy["order"] == "largest_first"
+    assert policy["verify"] == "checksum"
+    # copy types without a policy use the command line options
+    policy = get_policy(native_raw_data, "analysis")
+    assert (policy["backend"], policy["threads"]) == ("rsync", 1)
+    assert policy["verify"] == "counts"
+
+
+@pytest.mark.parametrize(
+    "options,backend,threads",
+    [
+        # the threads of the command line, even the default value
+        (["--threads", "1"], "native", 1),
+        (["--threads", "8"], "native", 8),
+        (["--threads", "auto"], "native", "auto"),
+        (["--backend", "rsync"], "rsync", 8),
+        (["--backend", "rsync", "--threads", "1"], "rsync", 1),
+    ],
+)
+def test_command_line_wins_over_the_policy(native_raw_data, options, backend, threads):
+    policy = get_policy(native_raw_data, "raw_data", *options)
+    assert (policy["backend"], policy["threads"]) == (backend, threads)
+
+
+def test_command_line_rsync_shards(native_raw_data):
+    assert get_policy(native_raw_data, "raw_data")["rsync_shards"] == 2
+    policy = get_policy(native_raw_data, "raw_data", "--rsync_shards", "1")
+    assert policy["rsync_shards"] == 1
+
+
+def test_auto_threads_of_a_policy(synthetic_run):
+    write_policies(
+        synthetic_run,
+        """
+[tool.options.policy.analysis]
+threads = "auto"
+[tool.options.policy.output]
+backend = "native"
+threads = "auto"
+""",
+    )
+    # adaptive threads need the native copy engine
+    assert get_policy(synthetic_run, "analysis")["threads"] == 1
+    assert get_policy(synthetic_run, "output")["threads"] == "auto"
+
+
+@pytest.mark.parametrize(
+    "policies",
+    [
+        "[tool.options.policy.images]\nthreads = 4\n",
+        "[tool.options.policy.raw_data]\nspeed = 4\n",
+        "[tool.options.policy.raw_data]\nthreads = 0\n",
+        '[tool.options.policy.raw_data]\nthreads = "many"\n',
+        '[tool.options.policy.raw_data]\nbackend = "scp"\n',
+        '[tool.options.policy.raw_data]\nbuffer_size = "16X"\n',
+        '[tool.options.policy.raw_data]\nverify = "everything"\n',
+        '[tool.options.policy.raw_data]\norder = "random"\n',
+        "[tool.options.policy]\nraw_data = 4\n",
+    ],
+)
+def test_invalid_policy(synthetic_run, policies):
+    write_policies(synthetic_run, policies)
+    with pytest.raises(ValueError):
+        synthetic_run.get_transfer()
+
+
+def test_resolve_copy_policies():
+    defaults = {
+        "backend": "auto",
+        "threads": 1,
+        "rsync_shards": 1,
+        "buffer_size": 1024,
+        "order": "path",
+        "checksum": False,
+        "tree_digest": True,
+        "tool_options": "-a",
+    }
+    policies = resolve_copy_policies(
+        {
+            "raw_data": {"threads": "4", "rsync": "-av", "robocopy": "/E"},
+            "analysis": {"threads": 16, "verify": "checksum"},
+        },
+        defaults,
+        explicit=["threads"],
+        tool="rsync",
+    )
+    # threads given on the command line
+    assert policies["raw_data"]["threads"] == 1
+    assert policies["raw_data"]["tool_options"] == "-av"
+    assert policies["analysis"]["threads"] == 1
+    # --tree_digest adds to the verification of the policy
+    assert policies["analysis"]["verify"] == "full"
+    assert policies["output"] == dict(defaults, verify="tree_digest")
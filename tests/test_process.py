@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the commands run with their output streamed to the logger
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import sys
+import shlex
+import logging
+import subprocess
+
+import pytest
+
+from vizgen_data_transfer.process import run_command
+
+
+def python(code):
+    """
+    Shell command running 'code' in a child python process.
+    """
+    if os.name == "nt":
+        return subprocess.list2cmdline([sys.executable, "-c", code])
+    return shlex.join([sys.executable, "-c", code])
+
+
+def messages(caplog, level):
+    return [x.getMessage() for x in caplog.records if x.levelno == level]
+
+
+def test_output_is_streamed_to_the_logger(caplog):
+    caplog.set_level(logging.INFO)
+    result = run_command(
+        python(
+            "import sys\n"
+            "print('line 1')\n"
+            "print()\n"
+            "print('line 2', flush=True)\n"
+            "print('oops', file=sys.stderr)"
+        ),
+        prefix="[raw_data] ",
+    )
+    assert result.returncode == 0
+    assert result.stdout == "line 1\n\nline 2"
+    assert result.stderr == "oops"
+    # empty lines are kept in the tail but not logged
+    assert messages(caplog, logging.INFO) == [
+        "[raw_data] line 1",
+        "[raw_data] line 2",
+    ]
+    assert messages(caplog, logging.WARNING) == ["[raw_data] STDERR: oops"]
+
+
+def test_only_the_tail_is_kept(caplog):
+    caplog.set_level(logging.INFO)
+    result = run_command(
+        python("for n in range(1000): print(n)"), tail_lines=3, prefix="> "
+    )
+    assert result.stdout == "997\n998\n999"
+    # every line is logged as it arrives
+    assert len(messages(caplog, logging.INFO)) == 1000
+
+
+def test_lines_handled_by_on_line_are_not_logged(caplog):
+    caplog.set_level(logging.INFO)
+    seen = list()
+
+    def on_line(line):
+        seen.append(line)
+        return line.startswith("progress")
+
+    result = run_command(
+        python("print('progress 50%'); print('file.dax'); print('progress 100%')"),
+        on_line=on_line,
+    )
+    assert seen == ["progress 50%", "file.dax", "progress 100%"]
+    assert messages(caplog, logging.INFO) == ["file.dax"]
+    # but are kept in the tail
+    assert result.stdout.splitlines()[-1] == "progress 100%"
+
+
+def test_non_zero_exit(caplog):
+    code = (
+        "import sys; print('copied'); print('failed', file=sys.stderr); sys.exit(23)"
+    )
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        run_command(python(code), tail_lines=5)
+    assert error.value.returncode == 23
+    assert error.value.output == "copied"
+    assert error.value.stderr == "failed"
+
+    # without check, the exit code is returned
+    result = run_command(python(code), check=False)
+    assert (result.returncode, result.stdout, result.stderr) == (23, "copied", "failed")
+
+
+def test_heartbeat_of_a_silent_command(caplog):
+    caplog.set_level(logging.INFO)
+    cmd = python("import time; print('start', flush=True); time.sleep(1)")
+    run_command(cmd, heartbeat=0.2, prefix="[output] ")
+    heartbeats = [x for x in messages(caplog, logging.INFO) if "still running" in x]
+    assert heartbeats
+    assert all(x.startswith("[output] Command still running") for x in heartbeats)
+    assert "1 lines of output so far" in heartbeats[-1]
+    assert heartbeats[-1].endswith(cmd)
+
+
+def test_no_heartbeat_while_the_command_writes(caplog):
+    caplog.set_level(logging.INFO)
+    run_command(
+        python(
+            "import time\n"
+            "for n in range(10):\n"
+            "    print(n, flush=True)\n"
+            "    time.sleep(0.05)"
+        ),
+        heartbeat=0.3,
+    )
+    assert not [x for x in messages(caplog, logging.INFO) if "still running" in x]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the memory figures of the stage profiles
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import json
+import threading
+
+import pytest
+
+from vizgen_data_transfer.profiling import StageProfiler
+
+mb = 1024 * 1024
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = StageProfiler(str(tmp_path / "run.profile"))
+    profiler.start(profile_run=False)
+    return profiler
+
+
+def read_memory(profiler):
+    profiler.stop()
+    with open(os.path.join(profiler.profile_dir, "memory.json")) as f:
+        memory = json.load(f)
+    return memory, {(x["stage"], x["copy_type"]): x for x in memory["stages"]}
+
+
+def test_peak_of_nested_stages(profiler):
+    profiler.start_stage("copy", "raw_data")
+    profiler.start_stage("copy_log", "raw_data")
+    data = bytearray(8 * mb)
+    del data
+    profiler.stop_stage("copy_log", "raw_data")
+    profiler.stop_stage("copy", "raw_data")
+    profiler.start_stage("email")
+    profiler.stop_stage("email")
+    memory, stages = read_memory(profiler)
+    # the peak of the inner stage is also the peak of the outer stage
+    assert stages[("copy_log", "raw_data")]["peak_bytes"] >= 8 * mb
+    assert stages[("copy", "raw_data")]["peak_bytes"] >= 8 * mb
+    assert stages[("email", None)]["peak_bytes"] < 8 * mb
+    assert not any(x["overlapped"] for x in stages.values())
+    assert memory["peak_bytes"] >= 8 * mb
+
+
+def test_overlapping_stages_only_have_the_run_peak(profiler):
+    started = threading.Barrier(2)
+    allocated = threading.Event()
+
+    def copy(copy_type, size):
+        profiler.start_stage("copy", copy_type)
+        started.wait()
+        if size:
+            data = bytearray(size)
+            del data
+            allocated.set()
+        else:
+            allocated.wait()
+        profiler.stop_stage("copy", copy_type)
+
+    threads = [
+        threading.Thread(target=copy, args=("raw_data", 8 * mb)),
+        threading.Thread(target=copy, args=("analysis", 0)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    profiler.start_stage("email")
+    profiler.stop_stage("email")
+    memory, stages = read_memory(profiler)
+    for copy_type in ("raw_data", "analysis"):
+        assert stages[("copy", copy_type)]["overlapped"]
+        assert stages[("copy", copy_type)]["peak_bytes"] is None
+    assert not stages[("email", None)]["overlapped"]
+    assert stages[("email", None)]["peak_bytes"] < 8 * mb
+    # the peak of the run is kept
+    assert memory["peak_bytes"] >= 8 * mb
+    with open(os.path.join(profiler.profile_dir, "summary.txt")) as f:
+        assert "only part of the peak of the run" in f.read()
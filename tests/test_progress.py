@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the rsync progress parser and of the progress reports of a copy type
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import sys
+import json
+import shlex
+import logging
+import subprocess
+
+import pytest
+
+from vizgen_data_transfer import progress
+from vizgen_data_transfer.process import run_command
+from vizgen_data_transfer.progress import ProgressReporter, parse_rsync_progress2
+
+mb = 1024 * 1024
+
+# output of 'rsync -a --info=progress2' for a copy of 11 files, the updates of
+# the progress line are separated by carriage returns
+rsync_output = (
+    "sending incremental file list\n"
+    "\r              0   0%    0.00kB/s    0:00:00 (xfr#0, ir-chk=1000/1001)"
+    "\r         32,768   0%   31.25MB/s    0:00:03  "
+    "\r     52,428,800  50%   49.93MB/s    0:00:01 (xfr#3, to-chk=7/11)"
+    "\r    104,857,600 100%   50.12MB/s    0:00:01 (xfr#11, to-chk=0/11)\n"
+    "\n"
+    "sent 104,869,123 bytes  received 229 bytes  41,947,740.80 bytes/sec\n"
+    "total size is 104,857,600  speedup is 1.00\n"
+)
+
+
+# rsync --info=progress2 lines and the bytes and files parsed from them
+progress_lines = [
+    ("              0   0%    0.00kB/s    0:00:00 (xfr#0, ir-chk=1000/1001)", (0, 0)),
+    ("     52,428,800  50%   49.93MB/s    0:00:01 (xfr#3, to-chk=7/11)", (52428800, 3)),
+    # older rsync versions
+    (
+        "  1,238,099,968  45%   56.37MB/s    0:00:20 (xfer#12, to-chk=1/2)",
+        (1238099968, 12),
+    ),
+    # the final line
+    (
+        "    104,857,600 100%   50.12MB/s    0:00:01 (xfr#11, to-chk=0/11)",
+        (104857600, 11),
+    ),
+    # an update without a file count
+    ("         32,768   0%   31.25MB/s    0:00:03  ", (32768, None)),
+    ("sending incremental file list", None),
+    ("raw_data/region_0/stack_0.dax", None),
+    ("sent 104,869,123 bytes  received 229 bytes  41,947,740.80 bytes/sec", None),
+    ("total size is 104,857,600  speedup is 1.00", None),
+    ("", None),
+]
+
+
+@pytest.mark.parametrize("line,expected", progress_lines)
+def test_parse_rsync_progress2(line, expected):
+    assert parse_rsync_progress2(line) == expected
+
+
+def test_carriage_return_separated_updates():
+    # the lines as split by the text mode pipes of run_command
+    updates = [parse_rsync_progress2(line) for line in rsync_output.splitlines()]
+    assert [x for x in updates if x] == [
+        (0, 0),
+        (32768, None),
+        (52428800, 3),
+        (104857600, 11),
+    ]
+
+
+def python(code):
+    if os.name == "nt":
+        return subprocess.list2cmdline([sys.executable, "-c", code])
+    return shlex.join([sys.executable, "-c", code])
+
+
+def test_rsync_output_through_run_command(tmp_path):
+    # the carriage returns are turned into line ends by the text mode pipes
+    output_file = tmp_path / "rsync_output.txt"
+    output_file.write_bytes(rsync_output.encode())
+    reporter = ProgressReporter("RUN", "raw_data", 11, 100 * mb, None, 3600)
+    result = run_command(
+        python(f"import sys; sys.stdout.write(open({str(output_file)!r}).read())"),
+        on_line=reporter.on_rsync_line,
+    )
+    assert (reporter.files_done, reporter.bytes_done) == (11, 100 * mb)
+    assert "xfr#11" in result.stdout
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(progress.time, "perf_counter", clock)
+    return clock
+
+
+@pytest.fixture
+def status_file(tmp_path):
+    return str(tmp_path / "raw_data.progress.json")
+
+
+def read_status(status_file):
+    with open(status_file) as f:
+        return json.load(f)
+
+
+def test_rsync_lines_update_the_status(clock, status_file, caplog):
+    caplog.set_level(logging.INFO)
+    reporter = ProgressReporter("RUN", "raw_data", 11, 100 * mb, status_file, 10)
+    for line in rsync_output.splitlines():
+        clock.now += 1
+        handled = reporter.on_rsync_line(line)
+        assert handled == (parse_rsync_progress2(line) is not None)
+    # the file count of the last line without one is kept
+    assert (reporter.files_done, reporter.bytes_done) == (11, 100 * mb)
+    status = reporter.close()
+    assert status == read_status(status_file)
+    assert status["state"] == "complete"
+    assert status["percent"] == 100
+    assert status["eta_seconds"] == 0
+    assert status["eta"] == "0:00:00"
+    assert "Progress raw_data - Files: 11/11" in caplog.records[-1].getMessage()
+
+
+def test_status_file_with_files_bytes_and_eta(clock, status_file):
+    reporter = ProgressReporter("RUN", "analysis", 100, 100 * mb, status_file, 10)
+    # two native copy workers
+    for part in range(2):
+        reporter.add(files=10, size=10 * mb, part=part)
+    clock.now += 5
+    # not reported before the interval
+    reporter.add(files=5, size=5 * mb, part=1)
+    with pytest.raises(FileNotFoundError):
+        read_status(status_file)
+
+    clock.now += 5
+    reporter.add(size=5 * mb, part=0)
+    status = read_status(status_file)
+    assert (status["files_done"], status["files_total"]) == (25, 100)
+    assert (status["bytes_done"], status["bytes_total"]) == (30 * mb, 100 * mb)
+    assert status["percent"] == 30
+    assert status["current_mb_per_s"] == 3
+    assert status["average_mb_per_s"] == 3
+    # 70 MB left at 3 MB/s
+    assert status["eta_seconds"] == pytest.approx(70 / 3, abs=0.1)
+    assert status["eta"] == "0:00:23"
+    assert status["state"] == "running"
+
+    # the current rate follows a slow down
+    clock.now += 10
+    reporter.add(files=1, size=10 * mb)
+    status = read_status(status_file)
+    assert status["current_mb_per_s"] == 1
+    assert status["average_mb_per_s"] == 2
+    assert status["eta_seconds"] == 60
+
+
+def test_no_progress_yet(clock, status_file):
+    reporter = ProgressReporter("RUN", "output", 10, 10 * mb, status_file, 0)
+    status = reporter.report()
+    assert (status["files_done"], status["bytes_done"], status["percent"]) == (0, 0, 0)
+    assert status["eta_seconds"] is None
+    assert status["eta"] == "unknown"
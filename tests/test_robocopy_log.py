@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the robocopy list log parser on fixture logs written like the robocopy list of get_counts_robocopy
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+
+from vizgen_data_transfer.benchmark.generator import write_robocopy_log
+from vizgen_data_transfer.manifest import read_manifest
+from vizgen_data_transfer.robocopy_log import parse_robocopy_list_log
+
+source = "Z:\\merfish_raw_data\\202310261058_VZGEN1_VMSC10202"
+
+entries = [
+    ("settings.json", 35284),
+    ("data/stack_0_0000.dax", 10485760),
+    ("data/stack_1_0000.dax", 10485761),
+    ("region 0/cell boundaries/feature data 0.hdf5", 2048),
+    ("region 0/tab\tname.csv", 12),
+    ("empty.txt", 0),
+]
+
+
+def parse(log_file, offset=0, root=source):
+    stats = dict()
+    records = list(parse_robocopy_list_log(log_file, root, offset=offset, stats=stats))
+    return records, stats
+
+
+def files(records):
+    return sorted((x.path, x.size) for x in records if x.type == "f")
+
+
+def folders(records):
+    return sorted(x.path for x in records if x.type == "d")
+
+
+def test_files_and_folders(tmp_path):
+    log_file = str(tmp_path / "list.log")
+    write_robocopy_log(log_file, source, "NULL", entries, list_mode=True)
+    records, stats = parse(log_file)
+    assert files(records) == sorted(entries)
+    # the folders of the 'New Dir' lines, without their file counts, and
+    # without the source folder itself
+    assert folders(records) == [
+        "data",
+        "region 0",
+        "region 0/cell boundaries",
+    ]
+    assert stats["files"] == len(entries)
+    assert stats["folders"] == 3
+    assert stats["size_bytes"] == sum(size for _, size in entries)
+
+
+def test_root_level_file(tmp_path):
+    log_file = str(tmp_path / "list.log")
+    write_robocopy_log(log_file, source, "NULL", [("settings.json", 1)], list_mode=True)
+    records, stats = parse(log_file)
+    assert records[0].path == "settings.json"
+    assert (records[0].type, records[0].size) == ("f", 1)
+    assert stats["folders"] == 0
+
+
+def test_new_dir_count_is_not_a_size(tmp_path):
+    log_file = str(tmp_path / "list.log")
+    write_robocopy_log(
+        log_file,
+        source,
+        "NULL",
+        [(f"data/f{n}.dax", n) for n in range(12)],
+        list_mode=True,
+    )
+    with open(log_file, encoding="utf-8") as f:
+        assert any("New Dir" in line and "12\t" in line for line in f)
+    records, stats = parse(log_file)
+    assert folders(records) == ["data"]
+    assert stats["size_bytes"] == sum(range(12))
+
+
+def test_spaces_and_tabs_in_paths(tmp_path):
+    log_file = str(tmp_path / "list.log")
+    write_robocopy_log(log_file, source, "NULL", entries, list_mode=True)
+    paths = [x.path for x in parse(log_file)[0]]
+    assert "region 0/cell boundaries/feature data 0.hdf5" in paths
+    assert "region 0/tab\tname.csv" in paths
+
+
+def test_source_folder_is_not_case_sensitive(tmp_path):
+    log_file = str(tmp_path / "list.log")
+    write_robocopy_log(log_file, source, "NULL", entries, list_mode=True)
+    assert files(parse(log_file, root=source.upper() + "\\")[0]) == sorted(entries)
+
+
+def test_crlf_log(tmp_path):
+    log_file = str(tmp_path / "list.log")
+    write_robocopy_log(log_file, source, "NULL", entries, list_mode=True)
+    with open(log_file, encoding="utf-8") as f:
+        text = f.read()
+    with open(log_file, "w", encoding="utf-8", newline="\r\n") as f:
+        f.write(text)
+    assert files(parse(log_file)[0]) == sorted(entries)
+
+
+def write_unilog(log_file, entries):
+    # robocopy /UNILOG writes the log in UTF-16 with a byte order mark
+    write_robocopy_log(log_file, source, "NULL", entries, list_mode=True)
+    with open(log_file, encoding="utf-8") as f:
+        text = f.read()
+    with open(log_file, "w", encoding="utf-16", newline="\r\n") as f:
+        f.write(text)
+
+
+def test_utf16_log(tmp_path):
+    log_file = str(tmp_path / "list.log")
+    unicode_entries = entries + [("région 1/données.csv", 5)]
+    write_unilog(log_file, unicode_entries)
+    records, stats = parse(log_file)
+    assert files(records) == sorted(unicode_entries)
+    assert "région 1" in folders(records)
+    assert stats["size_bytes"] == sum(size for _, size in unicode_entries)
+
+
+def test_appended_utf16_log_from_offset(tmp_path):
+    log_file = str(tmp_path / "list.log")
+    write_unilog(log_file, entries[:2])
+    offset = os.path.getsize(log_file)
+    # /UNILOG+ appends without a second byte order mark
+    second = str(tmp_path / "second.log")
+    write_robocopy_log(second, source, "NULL", entries, list_mode=True)
+    with open(second, encoding="utf-8") as f:
+        text = f.read()
+    with open(log_file, "ab") as f:
+        f.write(text.replace("\n", "\r\n").encode("utf-16-le"))
+    assert files(parse(log_file, offset=offset)[0]) == sorted(entries)
+    assert parse(log_file)[1]["files"] == 2 + len(entries)
+
+
+def test_appended_log_from_offset(tmp_path):
+    # a list of a previous invocation is followed by the list of this one
+    log_file = str(tmp_path / "list.log")
+    write_robocopy_log(log_file, source, "NULL", entries[:2], list_mode=True)
+    offset = os.path.getsize(log_file)
+    second = str(tmp_path / "second.log")
+    write_robocopy_log(second, source, "NULL", entries, list_mode=True)
+    with open(log_file, "ab") as f, open(second, "rb") as g:
+        f.write(g.read())
+    assert files(parse(log_file, offset=offset)[0]) == sorted(entries)
+    # without the offset the files of both lists are read
+    assert parse(log_file)[1]["files"] == 2 + len(entries)
+
+
+def test_appended_log_of_a_transfer(transfer):
+    # manifest built from the list appended to the log of a previous
+    # invocation, using the offset recorded before the list was written
+    copy_type = "raw_data"
+    location, log_file = transfer.get_robocopy_list_locations(copy_type, "before")
+    write_robocopy_log(log_file, location, "NULL", entries[:2], list_mode=True)
+    transfer.store_robocopy_list_offsets["before"][copy_type] = os.path.getsize(
+        log_file
+    )
+    second = f"{log_file}.second"
+    write_robocopy_log(second, location, "NULL", entries, list_mode=True)
+    with open(log_file, "ab") as f, open(second, "rb") as g:
+        f.write(g.read())
+
+    transfer.os_name = "windows"
+    transfer.check_robocopy_list_logs(state="before", copy_types=[copy_type])
+    transfer.get_counts_robocopy_manifest(state="before", copy_types=[copy_type])
+    manifest = transfer.store_manifest_files["before"][copy_type]
+    assert sorted(
+        (x.path, x.size) for x in read_manifest(manifest) if x.type == "f"
+    ) == sorted(entries)
+    assert transfer.store_python_count_info["before"][copy_type]["files"] == len(
+        entries
+    )
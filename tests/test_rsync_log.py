@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the rsync log parser
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import pytest
+
+from vizgen_data_transfer.benchmark.generator import write_rsync_log
+from vizgen_data_transfer.rsync_log import parse_rsync_log
+
+entries = [
+    ("region_0/fov_0/image.tif", 1000),
+    ("region_0/fov_1/image.tif", 2000),
+    ("region_1/fov_0/image.tif", 3000),
+    ("notes with spaces.txt", 10),
+]
+
+
+def parse(log_file, **options):
+    stats = dict()
+    records = list(parse_rsync_log(log_file, stats=stats, **options))
+    return records, stats
+
+
+def write_shard_logs(tmp_path, shards):
+    """
+    Merged log of one rsync session per shard of 'entries', each with its own process id.
+    """
+    log_file = tmp_path / "raw_data.rsync.log"
+    with open(log_file, "w", encoding="utf-8", newline="\n") as out:
+        for n in range(shards):
+            shard_log = tmp_path / f"shard{n}.log"
+            write_rsync_log(str(shard_log), entries[n::shards], pid=1000 + n)
+            out.write(shard_log.read_text(encoding="utf-8"))
+    return str(log_file)
+
+
+def truncate_session(log_file, pid):
+    # a shard stopped before its session end line
+    with open(log_file, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(log_file, "w", encoding="utf-8", newline="\n") as f:
+        f.writelines(line for line in lines if f"[{pid}] sent " not in line)
+
+
+def test_parse_records(tmp_path):
+    log_file = str(tmp_path / "raw_data.rsync.log")
+    write_rsync_log(log_file, entries)
+    records, stats = parse(log_file)
+    files = {x.path: x.size for x in records if x.type == "f"}
+    assert files == dict(entries)
+    assert {x.path for x in records if x.type == "d"} == {
+        "region_0",
+        "region_0/fov_0",
+        "region_0/fov_1",
+        "region_1",
+        "region_1/fov_0",
+    }
+    assert stats["files"] == 4
+    assert stats["size_bytes"] == 6010
+    assert stats["complete"]
+
+
+def test_truncated_session_is_not_complete(tmp_path):
+    log_file = str(tmp_path / "raw_data.rsync.log")
+    write_rsync_log(log_file, entries, pid=1000)
+    truncate_session(log_file, 1000)
+    _, stats = parse(log_file)
+    assert not stats["complete"]
+
+
+def test_offset_skips_earlier_sessions(tmp_path):
+    log_file = tmp_path / "raw_data.rsync.log"
+    write_rsync_log(str(log_file), entries[:1], pid=1000)
+    offset = log_file.stat().st_size
+    second = tmp_path / "second.log"
+    write_rsync_log(str(second), entries[1:], pid=1001)
+    with open(log_file, "a", encoding="utf-8", newline="\n") as f:
+        f.write(second.read_text(encoding="utf-8"))
+    records, stats = parse(str(log_file), offset=offset)
+    assert stats["files"] == 3
+    assert stats["sessions_ended"] == 1
+    assert stats["complete"]
+
+
+@pytest.mark.parametrize("shards", [2, 3])
+def test_merged_shard_logs(tmp_path, shards):
+    log_file = write_shard_logs(tmp_path, shards)
+    _, stats = parse(log_file, sessions=shards)
+    assert stats["files"] == len(entries)
+    assert stats["sessions_ended"] == shards
+    assert stats["complete"]
+
+
+def test_merged_log_with_a_truncated_shard(tmp_path):
+    log_file = write_shard_logs(tmp_path, 3)
+    truncate_session(log_file, 1001)
+    _, stats = parse(log_file, sessions=3)
+    assert stats["sessions_started"] == 3
+    assert stats["sessions_ended"] == 2
+    # one finished shard does not make the whole copy type complete
+    assert not stats["complete"]
+
+
+def test_merged_log_with_a_missing_shard(tmp_path):
+    # a shard that died before writing anything to its log
+    log_file = write_shard_logs(tmp_path, 2)
+    _, stats = parse(log_file, sessions=3)
+    assert stats["sessions_ended"] == 2
+    assert not stats["complete"]
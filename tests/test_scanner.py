@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the directory tree scanners
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+
+import pytest
+
+from vizgen_data_transfer.scanner import scan_tree, scanners
+
+
+def make_tree(root):
+    for path, size in (
+        ("a.txt", 10),
+        ("d/b.txt", 20),
+        ("d/c.txt", 30),
+        ("d/e/f.txt", 40),
+        ("d/e/g.txt", 0),
+    ):
+        file_path = os.path.join(root, *path.split("/"))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(b"x" * size)
+    os.makedirs(os.path.join(root, "empty"))
+
+
+@pytest.mark.parametrize("scanner", sorted(scanners))
+@pytest.mark.parametrize("workers", [1, 4])
+def test_scanners_agree(tmp_path, scanner, workers):
+    make_tree(tmp_path)
+    files = dict()
+    folders = list()
+    totals = scan_tree(
+        str(tmp_path),
+        scanner=scanner,
+        workers=workers,
+        on_file=lambda path, st: files.update({path: st.st_size}),
+        on_dir=folders.append,
+    )
+    assert totals == {"files": 5, "folders": 3, "size_bytes": 100}
+    assert files == {
+        "a.txt": 10,
+        "d/b.txt": 20,
+        "d/c.txt": 30,
+        "d/e/f.txt": 40,
+        "d/e/g.txt": 0,
+    }
+    assert sorted(folders) == ["d", "d/e", "empty"]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks not available")
+@pytest.mark.parametrize("scanner", sorted(scanners))
+def test_broken_symlink_fails_the_scan(tmp_path, scanner):
+    make_tree(tmp_path)
+    try:
+        os.symlink(
+            os.path.join(tmp_path, "missing"), os.path.join(tmp_path, "d", "link")
+        )
+    except OSError:
+        pytest.skip("unable to create a symlink")
+    # the files of the folder are not silently dropped from the counts
+    with pytest.raises(FileNotFoundError):
+        scan_tree(str(tmp_path), scanner=scanner)
+
+
+def test_missing_root_is_empty(tmp_path):
+    assert scan_tree(str(tmp_path / "missing"), scanner="scandir") == {
+        "files": 0,
+        "folders": 0,
+        "size_bytes": 0,
+    }
+
+
+def test_unknown_scanner(tmp_path):
+    with pytest.raises(ValueError):
+        scan_tree(str(tmp_path), scanner="find")
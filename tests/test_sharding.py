@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the size balanced shards of the parallel rsync workers and of their merged logs
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+
+import pytest
+
+from vizgen_data_transfer.benchmark.generator import write_rsync_log
+from vizgen_data_transfer.rsync_log import parse_rsync_log
+from vizgen_data_transfer.sharding import merge_shard_logs, write_shards
+
+
+def read_shards(shards):
+    paths = list()
+    for shard in shards:
+        with open(shard["file_list"], encoding="utf-8") as f:
+            paths.append(f.read().splitlines())
+    return paths
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_every_file_in_one_shard(tmp_path, streamed):
+    entries = [(f"fov_{n}/image.tif", 1000 + n) for n in range(101)]
+    totals = dict()
+    if streamed:
+        totals = {
+            "total_files": len(entries),
+            "total_size_bytes": sum(size for _, size in entries),
+        }
+    shards = write_shards(
+        iter(entries) if streamed else entries, str(tmp_path / "shard"), 4, **totals
+    )
+    assert len(shards) == 4
+    paths = read_shards(shards)
+    assert sorted(sum(paths, [])) == sorted(path for path, _ in entries)
+    assert [x["files"] for x in shards] == [len(x) for x in paths]
+    assert sum(x["size_bytes"] for x in shards) == sum(size for _, size in entries)
+
+
+def test_balanced_by_bytes(tmp_path):
+    # a few large images and many small files
+    entries = [(f"raw/image_{n}.dax", 1000000) for n in range(8)]
+    entries += [(f"analysis/cell_{n}.csv", 100) for n in range(800)]
+    shards = write_shards(entries, str(tmp_path / "shard"), 4)
+    sizes = [x["size_bytes"] for x in shards]
+    files = [x["files"] for x in shards]
+    assert max(sizes) - min(sizes) <= 1000000
+    assert max(files) - min(files) <= 10
+
+
+def test_one_huge_file(tmp_path):
+    # the shard with the huge file gets the fewest other files
+    entries = [("huge.dax", 10**12)] + [(f"small_{n}.csv", 10) for n in range(99)]
+    shards = write_shards(entries, str(tmp_path / "shard"), 4)
+    huge = next(x for x in shards if "huge.dax" in read_shards([x])[0])
+    others = [x for x in shards if x is not huge]
+    assert huge["size_bytes"] >= 10**12
+    assert all(huge["files"] < x["files"] for x in others)
+    assert sum(x["files"] for x in shards) == 100
+
+
+@pytest.mark.parametrize("entries", [[], [("only.txt", 5)]])
+def test_empty_shards_are_dropped(tmp_path, entries):
+    shards = write_shards(entries, str(tmp_path / "shard"), 4)
+    assert len(shards) == len(entries)
+    # the empty file lists are removed
+    assert len(os.listdir(tmp_path)) == len(entries)
+
+
+def test_merge_shard_logs(tmp_path):
+    log_file = str(tmp_path / "raw_data.rsync.log")
+    with open(log_file, "w", encoding="utf-8") as f:
+        f.write("previous session\n")
+    shard_logs = list()
+    for n in range(3):
+        shard_log = f"{log_file}.shard{n}"
+        write_rsync_log(shard_log, [(f"shard_{n}.tif", n + 1)], pid=1000 + n)
+        shard_logs.append(shard_log)
+    offset = os.path.getsize(log_file)
+    merge_shard_logs(shard_logs + [f"{log_file}.missing"], log_file)
+    assert os.listdir(tmp_path) == ["raw_data.rsync.log"]
+
+    stats = dict()
+    paths = [
+        x.path
+        for x in parse_rsync_log(log_file, offset=offset, stats=stats, sessions=3)
+        if x.type == "f"
+    ]
+    assert paths == ["shard_0.tif", "shard_1.tif", "shard_2.tif"]
+    assert stats["complete"]
+
+
+def test_merged_log_with_a_truncated_shard(tmp_path):
+    log_file = str(tmp_path / "raw_data.rsync.log")
+    shard_logs = list()
+    for n in range(3):
+        shard_log = f"{log_file}.shard{n}"
+        write_rsync_log(shard_log, [(f"shard_{n}.tif", n + 1)], pid=1000 + n)
+        shard_logs.append(shard_log)
+    # the second shard was stopped before the end of its session
+    with open(shard_logs[1], encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(shard_logs[1], "w", encoding="utf-8") as f:
+        f.writelines(lines[:-1])
+    merge_shard_logs(shard_logs, log_file)
+    stats = dict()
+    list(parse_rsync_log(log_file, stats=stats, sessions=3))
+    assert stats["files"] == 3
+    assert not stats["complete"]
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the run state file and of the fingerprint of the source folders
+
+"""
+
+# authorship and License information
+__author__ = "Gemy George Kaithakottil"
+__maintainer__ = "Gemy George Kaithakottil"
+__email__ = "Gemy.Kaithakottil@earlham.ac.uk"
+
+# import libraries
+import os
+import json
+
+import pytest
+
+from vizgen_data_transfer.state import RunState, source_fingerprint
+
+run_id = "202310261058_VZGEN1_VMSC10202"
+
+
+@pytest.fixture
+def source(tmp_path):
+    root = tmp_path / "merfish_raw_data" / run_id
+    (root / "data").mkdir(parents=True)
+    (root / "settings.json").write_text("{}")
+    (root / "data" / "stack_0.dax").write_bytes(b"x" * 100)
+    return root
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / f"{run_id}.state.json")
+
+
+def write_state(state_file, fingerprint, stages=("before_counts", "copy")):
+    state = RunState(state_file, run_id, fingerprint)
+    for stage in stages:
+        state.mark(stage, "raw_data", {"results": [["store", None, 1]]})
+    return state
+
+
+def test_resume_from_the_state_file(source, state_file):
+    fingerprint = source_fingerprint([str(source)])
+    write_state(state_file, fingerprint)
+    state = RunState(state_file, run_id, source_fingerprint([str(source)]))
+    assert state.resume() is None
+    assert state.resumed
+    assert state.is_done("copy", "raw_data")
+    assert not state.is_done("copy", "analysis")
+    assert state.get("before_counts", "raw_data") == {"results": [["store", None, 1]]}
+
+
+@pytest.mark.parametrize("change", ["add", "remove", "resize", "touch_folder"])
+def test_changed_source_invalidates_the_state(source, state_file, change):
+    write_state(state_file, source_fingerprint([str(source)]))
+    if change == "add":
+        (source / "data" / "stack_1.dax").write_bytes(b"y")
+    elif change == "remove":
+        os.remove(source / "settings.json")
+    elif change == "resize":
+        (source / "data" / "stack_0.dax").write_bytes(b"x" * 101)
+    else:
+        st = os.stat(source / "data")
+        os.utime(source / "data", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    state = RunState(state_file, run_id, source_fingerprint([str(source)]))
+    assert "source folders have changed" in state.resume()
+    assert not state.resumed
+    assert not state.is_done("copy", "raw_data")
+
+
+def test_missing_source_folder(tmp_path):
+    missing = str(tmp_path / "missing")
+    assert source_fingerprint([missing]) == source_fingerprint([missing])
+    assert source_fingerprint([missing]) != source_fingerprint([str(tmp_path)])
+
+
+def test_completed_run_starts_again(source, state_file):
+    fingerprint = source_fingerprint([str(source)])
+    write_state(state_file, fingerprint).complete()
+    state = RunState(state_file, run_id, fingerprint)
+    assert "completed" in state.resume()
+    assert not state.is_done("copy", "raw_data")
+
+
+def test_no_state_file(state_file):
+    state = RunState(state_file, run_id, "fingerprint")
+    assert state.resume() == "no state file found"
+
+
+@pytest.mark.parametrize("cut", [1, 10, -2])
+def test_partially_written_state_file_is_ignored(source, state_file, cut):
+    fingerprint = source_fingerprint([str(source)])
+    write_state(state_file, fingerprint)
+    with open(state_file) as f:
+        text = f.read()
+    with open(state_file, "w") as f:
+        f.write(text[:cut])
+    state = RunState(state_file, run_id, fingerprint)
+    assert "could not be read" in state.resume()
+    assert not state.is_done("copy", "raw_data")
+    # the next checkpoint replaces the broken file
+    state.mark("before_counts", "raw_data")
+    with open(state_file) as f:
+        assert json.load(f)["stages"] == {"before_counts": {"raw_data": {}}}
+
+
+@pytest.mark.parametrize("text", ["", "[]", "null"])
+def test_state_file_without_a_state(state_file, text):
+    with open(state_file, "w") as f:
+        f.write(text)
+    assert "could not be read" in RunState(state_file, run_id, "f").resume()
+
+
+def test_other_version_is_not_used(state_file):
+    write_state(state_file, "fingerprint")
+    with open(state_file) as f:
+        state = json.load(f)
+    state["version"] = 0
+    with open(state_file, "w") as f:
+        json.dump(state, f)
+    assert "not supported" in RunState(state_file, run_id, "fingerprint").resume()
+
+
+def test_state_file_is_replaced_atomically(state_file):
+    write_state(state_file, "fingerprint")
+    assert os.listdir(os.path.dirname(state_file)) == [os.path.basename(state_file)]